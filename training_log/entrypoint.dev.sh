@@ -8,6 +8,10 @@ python manage.py collectstatic --noinput
 echo "Apply database migrations"
 python manage.py migrate
 
+# Register the municipalities of the regional map for the coverage totals
+echo "Sync municipalities"
+python manage.py sync_municipalities
+
 # Start server
 echo "Starting server"
 python manage.py runserver 0.0.0.0:5000
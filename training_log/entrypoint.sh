@@ -8,7 +8,11 @@ python manage.py collectstatic --noinput --clear
 echo "Apply database migrations"
 python manage.py migrate
 
+# Register the municipalities of the regional map for the coverage totals
+echo "Sync municipalities"
+python manage.py sync_municipalities
+
 # Start server
 echo "Starting server"
-gunicorn training_log.wsgi:application --threads=2 --bind 0.0.0.0:8000
+gunicorn training_log.wsgi:application --preload --threads=2 --bind 0.0.0.0:8000
 
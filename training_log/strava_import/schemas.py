@@ -84,7 +84,6 @@ class StravaSession(BaseModel):
         ).group(2)
         return pytz.timezone(iana_timezone_identifier)
 
-    @computed_field
     @property
     def polyline(self) -> str | None:
         """Get polyline from map."""
@@ -93,7 +92,6 @@ class StravaSession(BaseModel):
 
         return self.map["polyline"]
 
-    @computed_field
     @property
     def summary_polyline(self) -> str | None:
         """Get polyline from map."""
@@ -6,8 +6,8 @@ from django.conf import settings
 from django.contrib.auth.models import User
 from dotenv import dotenv_values
 from training import maps
-from training.models import (MunicipalityVisits, SessionZones, TrainingSession,
-                             Zone)
+from training.models import (MunicipalityVisits, SessionTrack, SessionZones,
+                             TrainingSession, Zone)
 
 from . import strava_authentication
 from .models import (StravaActivityImport, StravaAuth, StravaRateLimit,
@@ -169,11 +169,27 @@ def import_training_session(strava_session: StravaSession, user: User):
     training_session.user = user
     training_session.discipline = discipline.discipline
     training_session.save()
+    save_session_track(training_session, strava_session)
 
     logger.info(f"Imported session from strava with name {strava_session.name}")
     return training_session
 
 
+def save_session_track(session: TrainingSession, strava_session: StravaSession):
+    """Save the polylines of a strava session as the track of a session."""
+    if not strava_session.polyline and not strava_session.summary_polyline:
+        return None
+
+    track, _ = SessionTrack.objects.update_or_create(
+        session=session,
+        defaults={
+            "polyline": strava_session.polyline,
+            "summary_polyline": strava_session.summary_polyline,
+        },
+    )
+    return track
+
+
 def import_session_zones(strava_id: int, user: User):
     """If zones do not exist, import them from strava and save them to the database."""
     strava_user = StravaUser.objects.filter(user=user).first()
@@ -355,7 +371,8 @@ def parse_activity_data(user_to_parse_for: User):
 
 def update_map(session: TrainingSession, training_map: maps.TrainingMap = None):
     """Update the map of the session."""
-    if not session.summary_polyline:
+    track = SessionTrack.objects.filter(session=session).first()
+    if not track or not track.summary_polyline:
         strava_activity_data = StravaActivityImport.objects.filter(
             strava_id=session.strava_id,
             type=StravaActivityImport.ACTIVITY,
@@ -369,9 +386,7 @@ def update_map(session: TrainingSession, training_map: maps.TrainingMap = None):
         if not strava_session.summary_polyline:
             return
 
-        session.summary_polyline = strava_session.summary_polyline
-        session.polyline = strava_session.polyline
-        session.save()
+        track = save_session_track(session, strava_session)
 
     municipality_visits = (
         MunicipalityVisits.objects.filter(training_session=session).all().count()
@@ -381,16 +396,15 @@ def update_map(session: TrainingSession, training_map: maps.TrainingMap = None):
         if not training_map:
             training_map = maps.TrainingMap()
 
-        munis = training_map.get_municipalities(session.summary_polyline)
+        # The full resolution polyline is used when Strava provided it.
+        visits = training_map.get_municipality_visits(
+            track.polyline or track.summary_polyline, session.moving_duration
+        )
 
-        if not munis:
+        if not visits:
             return
 
-        for mun in munis:
-            municipality_visit = MunicipalityVisits(
-                training_session=session, municipality=mun
-            )
-            municipality_visit.save()
+        maps.save_municipality_visits(session, visits)
 
         logger.info(f"Added municipality visits for session {session.strava_id}")
 
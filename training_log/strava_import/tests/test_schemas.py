@@ -11,6 +11,7 @@ from strava_import.models import StravaEvent
 from strava_import.schemas import (AspectTypeEnum, ObjectTypeEnum,
                                    StravaEventData, StravaSession,
                                    StravaSessionZones)
+from strava_import.strava import save_session_track
 from training.models import Discipline, SessionZones, TrainingSession
 
 
@@ -73,9 +74,10 @@ class StravaSessionTest(TestCase):
         training_session.user = User.objects.create(username="test_user")
         training_session.discipline = Discipline.objects.create(name="test_discipline")
         training_session.save()
+        save_session_track(training_session, strava_session)
 
         self.assertEqual(training_session.strava_id, strava_session.strava_id)
-        self.assertEqual(training_session.polyline, strava_session.polyline)
+        self.assertEqual(training_session.track.polyline, strava_session.polyline)
 
 
 class StravaJSONReaderTest(TestCase):
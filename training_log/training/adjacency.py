@@ -0,0 +1,292 @@
+import logging
+import os
+import threading
+
+import numpy as np
+import shapely
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.functions import Coalesce, Left
+
+from . import coverage, maps, polylines
+from .models import SessionTrack
+
+logger = logging.getLogger(__name__)
+
+GRAPH_PATH = os.path.join(
+    settings.BASE_DIR,
+    "training",
+    "map_data",
+    "gemeente_graph.npz",
+)
+
+# Start points are grouped on about a kilometer.
+START_DECIMALS = 2
+SUGGESTION_COUNT = 5
+START_POINT_CACHE_KEY = "training:start_point:{user_id}"
+
+_municipality_graph = None
+_municipality_graph_lock = threading.Lock()
+
+
+class MunicipalityGraph:
+    """The municipalities that share a boundary, as compressed sparse rows where
+    the neighbours of municipality i are neighbors[indptr[i]:indptr[i + 1]], with
+    the centroid of every municipality."""
+
+    def __init__(self, names, indptr, neighbors, centroids, version):
+        self.names = list(names)
+        self.indptr = indptr
+        self.neighbors = neighbors
+        self.centroids = centroids
+        self.version = str(version)
+        self.indices = {name: index for index, name in enumerate(self.names)}
+
+    @classmethod
+    def build(cls, regional_map):
+        """Build the graph of a regional map.
+
+        :param regional_map: A GeoDataFrame with the municipality geometries
+
+        """
+        geometries = regional_map.geometry.to_numpy()
+        first, second = regional_map.sindex.query(geometries, predicate="intersects")
+        pairs = first < second
+        first, second = first[pairs], second[pairs]
+
+        # Neighbours share a line or, with small overlaps, an area and not just a
+        # corner.
+        shared = shapely.intersection(geometries[first], geometries[second])
+        neighbours = (~shapely.is_empty(shared)) & (shapely.get_dimensions(shared) > 0)
+        rows = np.concatenate([first[neighbours], second[neighbours]])
+        columns = np.concatenate([second[neighbours], first[neighbours]])
+
+        order = np.lexsort((columns, rows))
+        indptr = np.searchsorted(rows[order], np.arange(len(geometries) + 1))
+        centroids = shapely.get_coordinates(shapely.centroid(geometries))[:, ::-1]
+
+        logger.info(
+            f"Built municipality graph of {len(geometries)} municipalities and "
+            f"{len(order) // 2} shared boundaries"
+        )
+        return cls(
+            regional_map["GM_NAAM"],
+            indptr.astype(np.int32),
+            columns[order].astype(np.int32),
+            centroids,
+            maps.get_dataset_version(regional_map),
+        )
+
+    def save(self, path=GRAPH_PATH):
+        """Save the graph as plain NumPy arrays."""
+        np.savez(
+            path,
+            names=np.array(self.names, dtype=str),
+            indptr=self.indptr,
+            neighbors=self.neighbors,
+            centroids=self.centroids,
+            version=self.version,
+        )
+
+    @classmethod
+    def load(cls, path=GRAPH_PATH):
+        """Load a saved graph."""
+        with np.load(path) as arrays:
+            return cls(
+                arrays["names"],
+                arrays["indptr"],
+                arrays["neighbors"],
+                arrays["centroids"],
+                arrays["version"],
+            )
+
+    def get_neighbors(self, indices):
+        """Get the municipalities that share a boundary with any of the
+        municipalities, but are not one of them."""
+        indices = np.asarray(indices, dtype=int)
+        starts, ends = self.indptr[indices], self.indptr[indices + 1]
+        lengths = ends - starts
+
+        # Gather all neighbour slices at once.
+        positions = np.repeat(ends - np.cumsum(lengths), lengths) + np.arange(
+            lengths.sum()
+        )
+        return np.setdiff1d(self.neighbors[positions], indices)
+
+    def get_distances(self, indices, point):
+        """Get the distance in meters from a (latitude, longitude) point to the
+        centroids of municipalities."""
+        offsets = self.centroids[indices] - point
+        offsets[:, 1] *= np.cos(np.radians(point[0]))
+        return np.hypot(offsets[:, 0], offsets[:, 1]) * maps.METERS_PER_DEGREE
+
+    def get_unvisited_neighbors(self, visited, point, count=SUGGESTION_COUNT):
+        """Get the unvisited municipalities that border the visited ones, nearest
+        to a point first.
+
+        :param visited: The names of the visited municipalities
+        :param point: A (latitude, longitude) point
+        :param count: The number of municipalities to get (Default value =
+        SUGGESTION_COUNT)
+        :returns: A list of municipality names and their distances in meters
+
+        """
+        candidates = self.get_neighbors(
+            [self.indices[name] for name in visited if name in self.indices]
+        )
+        distances = self.get_distances(candidates, point)
+
+        nearest = np.argsort(distances, kind="stable")[:count]
+        return [
+            (self.names[candidates[index]], float(distances[index]))
+            for index in nearest
+        ]
+
+
+def get_municipality_graph():
+    """Get the municipality graph of this process. It is loaded from disk when it
+    was built for the current regional map, but never built during a request.
+
+    :returns: The graph, or None if it has not been built for the regional map
+
+    """
+    global _municipality_graph
+
+    if _municipality_graph is None and os.path.exists(GRAPH_PATH):
+        with _municipality_graph_lock:
+            if _municipality_graph is None:
+                graph = MunicipalityGraph.load(GRAPH_PATH)
+                if graph.version == maps.get_regional_map_version():
+                    _municipality_graph = graph
+                else:
+                    logger.warning(f"{GRAPH_PATH} was built for another regional map")
+
+    return _municipality_graph
+
+
+def build_municipality_graph():
+    """Build and save the municipality graph, unless the saved graph was built for
+    the current regional map.
+
+    :returns: The graph, or None if the regional map is not available
+
+    """
+    global _municipality_graph
+
+    regional_map = maps.get_regional_map()
+    if regional_map is None:
+        return None
+
+    graph = get_municipality_graph()
+    if graph is None:
+        logger.info("Building the municipality graph")
+        graph = MunicipalityGraph.build(regional_map)
+        graph.save(GRAPH_PATH)
+        with _municipality_graph_lock:
+            _municipality_graph = graph
+
+    return graph
+
+
+def get_start_point(user_id):
+    """Get the start point of a user from the cache or calculate it. It is cached
+    until the tracks of the user change.
+
+    :returns: The (latitude, longitude) of the start point, or None if the user
+    has no tracks
+
+    """
+    key = START_POINT_CACHE_KEY.format(user_id=user_id)
+    start_point = cache.get(key)
+    if start_point is None:
+        start_point = calculate_start_point(user_id)
+        # Users without tracks are cached as an empty start point.
+        start_point = () if start_point is None else tuple(map(float, start_point))
+        cache.set(key, start_point, timeout=None)
+
+    return start_point or None
+
+
+def invalidate_start_point_on_commit(user_id):
+    """Remove the cached start point of a user once the current transaction
+    commits, so it is not cached again from the old tracks."""
+    key = START_POINT_CACHE_KEY.format(user_id=user_id)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def calculate_start_point(user_id):
+    """Get the most frequent start point of the tracks of a user, rounded to
+    START_DECIMALS. Only the first characters of the polylines are read.
+
+    :returns: The (latitude, longitude) of the start point, or None if the user
+    has no tracks
+
+    """
+    prefixes = (
+        SessionTrack.objects.filter(session__user_id=user_id)
+        .annotate(
+            start=Left(Coalesce("summary_polyline", "polyline"), polylines.START_LENGTH)
+        )
+        .filter(start__gt="")
+        .values_list("start", flat=True)
+    )
+
+    starts = []
+    for prefix in prefixes:
+        try:
+            starts.append(polylines.decode_start(prefix))
+        except ValueError:
+            logger.warning(f"Invalid start of polyline of user {user_id}")
+    if not starts:
+        return None
+
+    points, counts = np.unique(
+        np.round(starts, START_DECIMALS), axis=0, return_counts=True
+    )
+    return points[np.argmax(counts)]
+
+
+def get_suggestions(users, discipline_ids=None, graph=None):
+    """Get per user the unvisited municipalities next to the ones they visited,
+    nearest to where they usually start first. Users without tracks get them
+    nearest to the middle of their visited municipalities.
+
+    :param users: The users to get the suggestions of
+    :param discipline_ids: The disciplines to include, all if None (Default value =
+    None)
+    :param graph: The municipality graph, the one of this process if None (Default
+    value = None)
+    :returns: A dictionary with a list of municipality names and distances per
+    username
+
+    """
+    graph = graph or get_municipality_graph()
+    if graph is None:
+        return {}
+
+    user_bitsets = coverage.get_user_bitsets(
+        [user.id for user in users], discipline_ids
+    )
+
+    suggestions = {}
+    for user in users:
+        visited = coverage.get_municipality_names(user_bitsets[user.id])
+        if not visited:
+            continue
+
+        visited_indices = [
+            graph.indices[name] for name in visited if name in graph.indices
+        ]
+        if not visited_indices:
+            continue
+
+        point = get_start_point(user.id)
+        if point is None:
+            point = graph.centroids[visited_indices].mean(axis=0)
+
+        suggestions[user.username.capitalize()] = graph.get_unvisited_neighbors(
+            visited, point
+        )
+
+    return suggestions
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import (Discipline, MunicipalityVisits, SessionZones,
+from .models import (DailyTrainingRollup, Discipline, MunicipalityVisits,
+                     PersonalRecord, SessionTrack, SessionZones, TrainingLoad,
                      TrainingSession, TrainingType, Zone)
 
 
@@ -18,6 +19,10 @@ class SessionZonesInline(admin.StackedInline):
     show_change_link = True
 
 
+class SessionTrackInline(admin.StackedInline):
+    model = SessionTrack
+
+
 class SessionZonesAdmin(admin.ModelAdmin):
     inlines = [
         ZonesInline,
@@ -29,11 +34,23 @@ class TrainingSessionAdmin(admin.ModelAdmin):
 
     inlines = [
         SessionZonesInline,
+        SessionTrackInline,
     ]
 
 
+class DailyTrainingRollupAdmin(admin.ModelAdmin):
+    list_filter = ["date", "discipline", "user"]
+
+
+class PersonalRecordAdmin(admin.ModelAdmin):
+    list_filter = ["record", "discipline", "user"]
+
+
 admin.site.register(Discipline)
 admin.site.register(TrainingSession, TrainingSessionAdmin)
 admin.site.register(TrainingType)
 admin.site.register(SessionZones, SessionZonesAdmin)
 admin.site.register(MunicipalityVisits)
+admin.site.register(DailyTrainingRollup, DailyTrainingRollupAdmin)
+admin.site.register(TrainingLoad)
+admin.site.register(PersonalRecord, PersonalRecordAdmin)
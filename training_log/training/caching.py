@@ -0,0 +1,90 @@
+import logging
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+DATA_VERSION_KEY = "training:data_version"
+VISITS_VERSION_KEY = "training:visits_version"
+RESULT_TIMEOUT = 24 * 60 * 60
+LOCK_TIMEOUT = 60
+LOCK_POLL_INTERVAL = 0.1
+
+
+def get_data_version(version_key=DATA_VERSION_KEY):
+    """Get the current version of the training data.
+
+    :param version_key: The key of the version, to version other data than the
+    training sessions (Default value = DATA_VERSION_KEY)
+
+    """
+    version = cache.get(version_key)
+    if version is None:
+        # Start from the current time so that a lost counter never reuses the
+        # version of results that might still be cached.
+        cache.add(version_key, time.time_ns(), timeout=None)
+        version = cache.get(version_key)
+    return version
+
+
+def increment_data_version(version_key=DATA_VERSION_KEY):
+    """Increase the version of the training data, so all results that depend on
+    it will be recomputed."""
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        get_data_version(version_key)
+
+
+def bump_data_version(version_key=DATA_VERSION_KEY):
+    """Increase the version of the training data once the current transaction
+    commits. Readers then cannot cache results of the old data under the new
+    version, and changes that are rolled back keep the version."""
+    transaction.on_commit(lambda: increment_data_version(version_key))
+
+
+def get_versioned_key(name, *parts, version_key=DATA_VERSION_KEY):
+    """Create a cache key that is only valid for the current data version."""
+    return ":".join(
+        ["training", name, str(get_data_version(version_key)), *map(str, parts)]
+    )
+
+
+def get_or_compute(key, compute, timeout=RESULT_TIMEOUT):
+    """Get a result from the cache or compute it. Only a single process computes
+    a missing result, concurrent requests wait for it to be cached.
+
+    :param key: The cache key of the result
+    :param compute: A function without arguments that computes the result
+    :param timeout: How long the result is cached (Default value = RESULT_TIMEOUT)
+
+    """
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, True, timeout=LOCK_TIMEOUT):
+        try:
+            result = compute()
+            cache.set(key, result, timeout=timeout)
+        finally:
+            cache.delete(lock_key)
+        return result
+
+    logger.info(f"Waiting for {key} to be computed")
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+
+        result = cache.get(key)
+        if result is not None:
+            return result
+
+        if cache.get(lock_key) is None:
+            break
+
+    logger.warning(f"No cached result for {key}, computing it anyway")
+    return compute()
@@ -0,0 +1,214 @@
+import logging
+
+import numpy as np
+from django.db import transaction
+
+from .models import Municipality, MunicipalityVisits, VisitedMunicipalities
+
+logger = logging.getLogger(__name__)
+
+WORD_BITS = 64
+WORD_DTYPE = np.dtype("<u8")
+
+
+def to_bitset(municipality_ids):
+    """Create a bitset with the bits of municipality ids set."""
+    municipality_ids = np.asarray(list(municipality_ids), dtype=np.int64)
+    bitset = np.zeros(
+        municipality_ids.max(initial=-1) // WORD_BITS + 1, dtype=WORD_DTYPE
+    )
+    np.bitwise_or.at(
+        bitset,
+        municipality_ids // WORD_BITS,
+        np.left_shift(
+            WORD_DTYPE.type(1), (municipality_ids % WORD_BITS).astype(WORD_DTYPE)
+        ),
+    )
+    return bitset
+
+
+def from_bytes(bits):
+    """Get the bitset stored in a binary field."""
+    return np.frombuffer(bytes(bits), dtype=WORD_DTYPE)
+
+
+def pad(bitsets):
+    """Pad bitsets with zero words to the same length.
+
+    :returns: An array with a row per bitset
+
+    """
+    length = max((len(bitset) for bitset in bitsets), default=0)
+    padded = np.zeros((len(bitsets), length), dtype=WORD_DTYPE)
+    for row, bitset in enumerate(bitsets):
+        padded[row, : len(bitset)] = bitset
+    return padded
+
+
+def union(bitsets):
+    """Get the municipalities in any of the bitsets."""
+    return np.bitwise_or.reduce(pad(bitsets), axis=0)
+
+
+def intersection(bitsets):
+    """Get the municipalities in all of the bitsets."""
+    return np.bitwise_and.reduce(pad(bitsets), axis=0)
+
+
+def count(bitset):
+    """Count the municipalities in a bitset."""
+    return int(np.bitwise_count(bitset).sum())
+
+
+def register_municipalities(names):
+    """Register the municipalities of the regional map, so they count in the
+    coverage totals."""
+    Municipality.objects.bulk_create(
+        [Municipality(name=name) for name in set(names)], ignore_conflicts=True
+    )
+
+
+def get_municipality_ids(names):
+    """Get the ids of registered municipalities by name. Other names, like the
+    regions of the region datasets abroad, are left out of the coverage.
+
+    :returns: A dictionary with the id per name
+
+    """
+    return dict(
+        Municipality.objects.filter(name__in=set(names)).values_list("name", "id")
+    )
+
+
+def get_municipality_names(bitset):
+    """Get the names of the municipalities in a bitset."""
+    municipality_ids = np.flatnonzero(
+        np.unpackbits(bitset.view(np.uint8), bitorder="little")
+    )
+    return list(
+        Municipality.objects.filter(id__in=municipality_ids.tolist())
+        .order_by("name")
+        .values_list("name", flat=True)
+    )
+
+
+def add_visits(user_id, discipline_id, municipalities):
+    """Add visited municipalities to the bitset of a user for a discipline."""
+    if not municipalities:
+        return
+
+    new_bitset = to_bitset(get_municipality_ids(municipalities).values())
+
+    with transaction.atomic():
+        visited, _ = VisitedMunicipalities.objects.select_for_update().get_or_create(
+            user_id=user_id, discipline_id=discipline_id
+        )
+        bitset = union([from_bytes(visited.bits), new_bitset])
+        if count(bitset) != count(from_bytes(visited.bits)):
+            visited.bits = bitset.tobytes()
+            visited.save(update_fields=["bits"])
+
+
+def rebuild_visits(user_id, discipline_id):
+    """Recalculate the bitset of a user for a discipline from the visits, for
+    example after visits have been removed."""
+    municipalities = (
+        MunicipalityVisits.objects.filter(
+            training_session__user_id=user_id,
+            training_session__discipline_id=discipline_id,
+        )
+        .order_by()
+        .values_list("municipality", flat=True)
+        .distinct()
+    )
+    bitset = to_bitset(get_municipality_ids(municipalities).values())
+
+    if count(bitset):
+        VisitedMunicipalities.objects.update_or_create(
+            user_id=user_id,
+            discipline_id=discipline_id,
+            defaults={"bits": bitset.tobytes()},
+        )
+    else:
+        VisitedMunicipalities.objects.filter(
+            user_id=user_id, discipline_id=discipline_id
+        ).delete()
+
+
+def rebuild_all_visits():
+    """Recalculate the bitsets of all users and disciplines."""
+    keys = set(
+        MunicipalityVisits.objects.order_by()
+        .values_list("training_session__user_id", "training_session__discipline_id")
+        .distinct()
+    )
+    keys.update(VisitedMunicipalities.objects.values_list("user_id", "discipline_id"))
+
+    for user_id, discipline_id in keys:
+        rebuild_visits(user_id, discipline_id)
+    logger.info(f"Rebuilt {len(keys)} visited municipality bitsets")
+
+
+def get_user_bitsets(user_ids, discipline_ids=None):
+    """Get the municipalities visited by every user, in a single query.
+
+    :param discipline_ids: The disciplines to include, all if None (Default value =
+    None)
+    :returns: A dictionary with the bitset per user id
+
+    """
+    visited = VisitedMunicipalities.objects.filter(user_id__in=user_ids)
+    if discipline_ids is not None:
+        visited = visited.filter(discipline_id__in=discipline_ids)
+
+    user_bitsets = {user_id: [] for user_id in user_ids}
+    for user_id, bits in visited.values_list("user_id", "bits"):
+        user_bitsets[user_id].append(from_bytes(bits))
+
+    return {user_id: union(bitsets) for user_id, bitsets in user_bitsets.items()}
+
+
+def get_all_municipalities():
+    """Get a bitset of all known municipalities."""
+    return to_bitset(Municipality.objects.values_list("id", flat=True))
+
+
+def get_visited_by_nobody(user_ids, discipline_ids=None):
+    """Get the names of the municipalities none of the users visited."""
+    all_municipalities, visited = pad(
+        [
+            get_all_municipalities(),
+            union(list(get_user_bitsets(user_ids, discipline_ids).values())),
+        ]
+    )
+    return get_municipality_names(all_municipalities & ~visited)
+
+
+def get_visited_by_everyone(user_ids, discipline_ids=None):
+    """Get the names of the municipalities all of the users visited."""
+    bitsets = list(get_user_bitsets(user_ids, discipline_ids).values())
+    if not bitsets:
+        return []
+    return get_municipality_names(intersection(bitsets))
+
+
+def get_coverage_leaderboard(users, discipline_ids=None):
+    """Rank users by the number of municipalities they visited.
+
+    :param users: The users to rank
+    :param discipline_ids: The disciplines to include, all if None (Default value =
+    None)
+    :returns: A list with the name, visited count, total count and percentage of
+    every user, most visited first
+
+    """
+    total = Municipality.objects.count()
+    user_bitsets = get_user_bitsets([user.id for user in users], discipline_ids)
+
+    leaderboard = []
+    for user in users:
+        visited = count(user_bitsets[user.id])
+        percentage = round(100 * visited / total, 1) if total else 0
+        leaderboard.append((user.username.capitalize(), visited, total, percentage))
+
+    return sorted(leaderboard, key=lambda row: row[1], reverse=True)
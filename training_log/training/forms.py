@@ -1,9 +1,13 @@
 from datetime import date
 
 from django import forms
+from django.contrib.auth.models import User
 from django.forms import ModelForm
 
-from .models import TrainingSession
+from .graphs import DEFAULT_START_DATE, GRAPH_NAMES, RESOLUTIONS
+from .models import Discipline, TrainingSession
+
+GRAPH_POINTS_STEP = 100
 
 
 class SessionForm(ModelForm):
@@ -30,3 +34,99 @@ class SessionForm(ModelForm):
         widgets = {
             "date": forms.DateInput(attrs={"type": "date", "value": date.today()}),
         }
+
+
+class StatsRangeForm(forms.Form):
+    """A form to select a custom date range for the stats."""
+
+    start = forms.DateField(widget=forms.DateInput(attrs={"type": "date"}))
+    end = forms.DateField(
+        required=False, widget=forms.DateInput(attrs={"type": "date"})
+    )
+
+    def clean(self):
+        """Check that the range does not end before it starts."""
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get("start"), cleaned_data.get("end")
+        if start and end and end < start:
+            raise forms.ValidationError("The end date is before the start date.")
+        return cleaned_data
+
+
+class GraphsDataForm(forms.Form):
+    """A form to select the window and resolution of the graphs data."""
+
+    start = forms.DateField(required=False)
+    end = forms.DateField(required=False)
+    resolution = forms.ChoiceField(
+        required=False, choices=[(resolution, resolution) for resolution in RESOLUTIONS]
+    )
+    points = forms.IntegerField(required=False, min_value=10, max_value=5000)
+    graph = forms.MultipleChoiceField(
+        required=False, choices=[(name, name) for name in GRAPH_NAMES]
+    )
+
+    def clean_points(self):
+        """Round the points up to a multiple of the step, so viewports of about
+        the same size share their cached graphs."""
+        points = self.cleaned_data["points"]
+        if points is None:
+            return None
+        return -(-points // GRAPH_POINTS_STEP) * GRAPH_POINTS_STEP
+
+    def clean(self):
+        """Check that the window does not end before it starts or before the first
+        day of the graphs and that the number of points is given when the points
+        are sampled."""
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get("start"), cleaned_data.get("end")
+        if start and end and end < start:
+            raise forms.ValidationError("The end date is before the start date.")
+        if end and end < DEFAULT_START_DATE.date():
+            raise forms.ValidationError(
+                "The end date is before the first day of the graphs."
+            )
+        if cleaned_data.get("resolution") == "lttb" and not cleaned_data.get("points"):
+            self.add_error("points", "The points are required for this resolution.")
+        return cleaned_data
+
+    def get_graphs_parameters(self):
+        """Get the parameters to create the graphs data with."""
+        return {
+            "start_date": self.cleaned_data["start"],
+            "end_date": self.cleaned_data["end"],
+            "resolution": self.cleaned_data["resolution"] or "day",
+            "max_points": self.cleaned_data["points"],
+            "graph_names": tuple(self.cleaned_data["graph"]) or None,
+        }
+
+
+class TrainingMapForm(forms.Form):
+    """A form to select the users, disciplines and dates of the training map."""
+
+    user_id = forms.ModelMultipleChoiceField(queryset=User.objects.all())
+    discipline = forms.ModelMultipleChoiceField(
+        queryset=Discipline.objects.all(), to_field_name="name", required=False
+    )
+    start_date = forms.DateField()
+    end_date = forms.DateField()
+
+    def get_visits_parameters(self):
+        """Get the parameters to get the visits data with."""
+        return {
+            "user_ids": [user.id for user in self.cleaned_data["user_id"]],
+            "disciplines": [
+                discipline.name for discipline in self.cleaned_data["discipline"]
+            ],
+            "start_date": self.cleaned_data["start_date"],
+            "end_date": self.cleaned_data["end_date"],
+        }
+
+    def get_suggestions_parameters(self):
+        """Get the parameters to get the suggested municipalities with."""
+        return {
+            "users": list(self.cleaned_data["user_id"]),
+            "discipline_ids": [
+                discipline.id for discipline in self.cleaned_data["discipline"]
+            ],
+        }
@@ -1,17 +1,35 @@
 import csv
 import json
 import logging
-from datetime import datetime
+from datetime import date, datetime
 
+import numpy as np
 import pandas as pd
 import webcolors
 from django.contrib.auth.models import User
-from django.db.models import F, Q
-from training.models import TrainingSession
+from django.db.models import F, Sum
+from training import caching, training_load
+from training.models import DailyTrainingRollup, TrainingSession
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_START_DATE = datetime(2023, 5, 1)
+GRAPH_DECIMALS = 3
+RESOLUTIONS = ["auto", "day", "week", "month", "lttb"]
+PERIOD_FREQUENCIES = {"week": "W", "month": "M"}
+DISCIPLINE_WEEK_COUNT = 13
+GRAPH_NAMES = [
+    "total_hours_trained",
+    "total_hours_trained_disciplines",
+    "weekly_hours_trained",
+    "weekly_hours_trained_disciplines",
+    "training_load",
+]
+TRAINING_LOAD_COLORS = {
+    "fitness": "DodgerBlue",
+    "fatigue": "DeepPink",
+    "form": "gold",
+}
 DISCIPLINE_COLORS = {
     "Running": "green",
     "Cycling": "DodgerBlue",
@@ -19,46 +37,170 @@ DISCIPLINE_COLORS = {
 }
 
 
+def lttb_indices(values, threshold):
+    """Select the points of a series that keep its shape with Largest-Triangle-
+    Three-Buckets downsampling. The index of a value is used as its x value.
+
+    :param values: The values of the series
+    :param threshold: The number of points to select
+    :returns: The indices of the selected points
+
+    """
+    count = len(values)
+    if threshold < 3 or threshold >= count:
+        return np.arange(count)
+
+    # The first and last point are always kept, the rest is split in buckets.
+    edges = np.linspace(1, count - 1, threshold - 1).astype(int)
+    indices = [0]
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+        else:
+            next_start, next_end = count - 1, count
+
+        next_x = (next_start + next_end - 1) / 2
+        next_y = values[next_start:next_end].mean()
+        previous = indices[-1]
+
+        areas = np.abs(
+            (previous - next_x) * (values[start:end] - values[previous])
+            - (previous - np.arange(start, end)) * (next_y - values[previous])
+        )
+        indices.append(start + int(np.argmax(areas)))
+
+    indices.append(count - 1)
+    return np.array(indices)
+
+
 class GraphsData:
     """This class generates data to be used by graphs."""
 
-    def __init__(self):
+    def __init__(
+        self,
+        start_date=None,
+        end_date=None,
+        resolution="day",
+        max_points=None,
+        graph_names=None,
+    ):
+        """Create the data of the graphs for a date range.
+
+        :param start_date: The first day of the graphs (Default value = None)
+        :param end_date: The last day of the graphs (Default value = None)
+        :param resolution: One of RESOLUTIONS, auto picks the finest of day, week
+        and month that fits in max points (Default value = "day")
+        :param max_points: The maximum number of points of a series (Default value
+        = None)
+        :param graph_names: The graphs to create, all if None (Default value = None)
+
+        """
         self.data = {}
         self.settings = {}
-        self.week_numbers = None
-        self.start_date = DEFAULT_START_DATE
-        self.datelist = pd.date_range(self.start_date, datetime.today())
-        self.get_week_numbers()
+        self.week_keys = None
+        self.start_date = max(
+            pd.Timestamp(start_date or DEFAULT_START_DATE), DEFAULT_START_DATE
+        )
+        self.end_date = pd.Timestamp(end_date or datetime.today()).normalize()
+        self.datelist = pd.date_range(self.start_date, self.end_date)
+        self.max_points = max_points
+        self.resolution = self.get_resolution(resolution)
+        self.graph_names = graph_names
+        self.get_week_keys()
         self.users = User.objects.all()
+        self.usernames = [user.username for user in self.users]
         self.discipline_colors = {
             discipline: self.color_name_to_hex(color)
             for discipline, color in DISCIPLINE_COLORS.items()
         }
         self.training_sessions = pd.DataFrame()
+        self.previous_hours = pd.DataFrame()
+        self.disciplines = []
+        self.daily_hours = None
+        self.initial_hours = None
+
+        # A window without days, like one starting after today, has no graphs.
+        if self.datelist.empty:
+            return
 
         self.get_training_sessions()
+        self.get_previous_hours()
         self.preprocess_session_data()
+        self.get_daily_hours()
 
         self.load_graph_data()
 
     def load_graph_data(self):
-        """Load all graph data."""
-        disciplines = self.training_sessions["discipline_name"].unique()
-        self.create_total_trained_data_graph()
-        self.create_total_trained_data_graph(disciplines=disciplines)
-        self.create_weekly_trained_data_graph()
-        self.create_weekly_trained_data_graph(disciplines=disciplines)
+        """Load the data of all requested graphs."""
+        graphs = {
+            "total_hours_trained": lambda: self.create_total_trained_data_graph(),
+            "total_hours_trained_disciplines": lambda: (
+                self.create_total_trained_data_graph(disciplines=self.disciplines)
+            ),
+            "weekly_hours_trained": lambda: self.create_weekly_trained_data_graph(),
+            "weekly_hours_trained_disciplines": lambda: (
+                self.create_weekly_trained_data_graph(disciplines=self.disciplines)
+            ),
+            "training_load": lambda: self.create_training_load_graph(),
+        }
+
+        for graph_name, create_graph in graphs.items():
+            if self.graph_names is None or graph_name in self.graph_names:
+                create_graph()
+
+    def get_resolution(self, resolution):
+        """Get the resolution to use, resolving auto to the finest of day, week and
+        month that fits in the maximum number of points."""
+        if resolution != "auto":
+            return resolution
+
+        day_count = len(self.datelist)
+        if self.max_points is None or day_count <= self.max_points:
+            return "day"
+        if -(-day_count // 7) <= self.max_points:
+            return "week"
+        return "month"
 
     def get_training_sessions(self):
         """Get the training sessions ot be used in the stats."""
-        filter_condition = Q(date__gte=self.start_date) & Q(excluded=False)
-
-        django_training_sessions = TrainingSession.objects.filter(
-            filter_condition
-        ).values(user_name=F("user__username"), discipline_name=F("discipline__name"))
+        daily_rollups = DailyTrainingRollup.objects.filter(
+            date__range=(self.start_date.date(), self.end_date.date())
+        ).values(
+            "date",
+            "moving_duration",
+            "total_duration",
+            user_name=F("user__username"),
+            discipline_name=F("discipline__name"),
+        )
 
         self.training_sessions = pd.DataFrame.from_records(
-            django_training_sessions.values()
+            daily_rollups,
+            columns=[
+                "date",
+                "moving_duration",
+                "total_duration",
+                "user_name",
+                "discipline_name",
+            ],
+        )
+
+    def get_previous_hours(self):
+        """Get the hours trained before the start date, which the cumulative graphs
+        start from."""
+        previous_rollups = (
+            DailyTrainingRollup.objects.filter(
+                date__gte=DEFAULT_START_DATE, date__lt=self.start_date.date()
+            )
+            .order_by()
+            .values(
+                user_name=F("user__username"), discipline_name=F("discipline__name")
+            )
+            .annotate(hours=Sum("moving_duration") / 3600.0)
+        )
+
+        self.previous_hours = pd.DataFrame.from_records(
+            previous_rollups, columns=["user_name", "discipline_name", "hours"]
         )
 
     def preprocess_session_data(self):
@@ -75,39 +217,195 @@ class GraphsData:
         # Convert date to a proper datetime
         self.training_sessions["date"] = pd.to_datetime(self.training_sessions["date"])
 
-        # Add a week number to the data
-        self.training_sessions["week_number"] = (
-            self.training_sessions["date"].dt.isocalendar().week
+    def get_daily_hours(self):
+        """Get the hours trained per day, user and discipline in a single pass over
+        the training data, as an array of days x users x disciplines. The hours
+        before the start date are kept apart as the initial hours."""
+        self.disciplines = list(
+            dict.fromkeys(
+                [
+                    *self.training_sessions["discipline_name"],
+                    *self.previous_hours["discipline_name"],
+                ]
+            )
         )
+        user_index = pd.Index(self.usernames)
+        discipline_index = pd.Index(self.disciplines)
 
-    def get_user_data(self, username, discipline=None):
-        """Get data for a user and an optional discipline."""
-        user_data = self.training_sessions.loc[
-            self.training_sessions["user_name"] == username
-        ]
+        day_indices = self.datelist.get_indexer(self.training_sessions["date"])
+        user_indices = user_index.get_indexer(self.training_sessions["user_name"])
+        discipline_indices = discipline_index.get_indexer(
+            self.training_sessions["discipline_name"]
+        )
+        known = (day_indices >= 0) & (user_indices >= 0)
 
-        if discipline:
-            user_data = user_data.loc[user_data["discipline_name"] == discipline]
+        self.daily_hours = np.zeros(
+            (len(self.datelist), len(self.usernames), len(self.disciplines))
+        )
+        np.add.at(
+            self.daily_hours,
+            (day_indices[known], user_indices[known], discipline_indices[known]),
+            self.training_sessions["moving_duration"].to_numpy(dtype=float)[known],
+        )
+
+        self.initial_hours = np.zeros((1, len(self.usernames), len(self.disciplines)))
+        user_indices = user_index.get_indexer(self.previous_hours["user_name"])
+        known = user_indices >= 0
+        np.add.at(
+            self.initial_hours,
+            (
+                0,
+                user_indices[known],
+                discipline_index.get_indexer(self.previous_hours["discipline_name"])[
+                    known
+                ],
+            ),
+            self.previous_hours["hours"].to_numpy(dtype=float)[known],
+        )
 
-        return user_data
+    def get_series_hours(self, hours, disciplines=None):
+        """Get the hours trained for every series of a graph. There is a series per
+        user, or per discipline and user when disciplines are given.
 
-    def add_graph_data(self, graph_name, dates, values, label, color=None):
-        """Add graph data to the data dictionary."""
-        self.data.setdefault(graph_name, {})[label] = json.dumps(
-            {
-                "x_values": dates,
-                "y_values": values,
-                "color": color,
-            }
+        :param hours: An array of days x users x disciplines
+        :param disciplines: The disciplines to split the series by (Default value =
+        None)
+        :returns: An array of days x series with the labels and colors of the series
+
+        """
+        labels = [username.capitalize() for username in self.usernames]
+
+        if disciplines is None:
+            return hours.sum(axis=2), labels, [None] * len(labels)
+
+        discipline_indices = [
+            self.disciplines.index(discipline) for discipline in disciplines
+        ]
+        series_hours = (
+            hours[:, :, discipline_indices].transpose(0, 2, 1).reshape(len(hours), -1)
         )
 
-    def get_week_numbers(self):
-        """Get the week numbers for the training sessions."""
-        self.week_numbers = pd.DataFrame(
-            data=self.datelist.to_series().dt.isocalendar().week.unique(),
-            columns=["week"],
+        return (
+            series_hours,
+            [
+                f"{label} - {discipline}"
+                for discipline in disciplines
+                for label in labels
+            ],
+            [
+                self.get_color(discipline, user_count)
+                for discipline in disciplines
+                for user_count in range(len(labels))
+            ],
         )
 
+    @staticmethod
+    def compact_values(values, decimals=GRAPH_DECIMALS, delta=False):
+        """Round values and optionally store them as differences with the previous
+        value. Whole numbers are stored as integers to keep the JSON small.
+
+        :param values: The values of a series
+        :param decimals: The number of decimals to keep (Default value =
+        GRAPH_DECIMALS)
+        :param delta: Store differences, which are mostly zero for cumulative
+        series (Default value = False)
+
+        """
+        values = np.round(np.asarray(values, dtype=float), decimals)
+        if delta:
+            values = np.round(np.diff(values, prepend=0), decimals)
+
+        # Adding zero turns negative zeros into zeros.
+        return [
+            int(value) if value.is_integer() else float(value) for value in values + 0.0
+        ]
+
+    def add_date_axis(self, graph_name, offsets=None):
+        """Set a date axis for a graph. A daily axis is given by its start and
+        length, other axes by the offsets in days from the start."""
+        x_axis = {"start": self.start_date.date().isoformat()}
+        if offsets is None:
+            x_axis.update(step=1, count=len(self.datelist))
+        else:
+            x_axis["offsets"] = offsets
+
+        self.data.setdefault(graph_name, {"series": []})["x"] = x_axis
+
+    def add_category_axis(self, graph_name, categories):
+        """Set an axis with a label for every value of a graph."""
+        self.data.setdefault(graph_name, {"series": []})["x"] = {"values": categories}
+
+    def add_graph_data(
+        self,
+        graph_name,
+        values,
+        label,
+        color=None,
+        delta=False,
+        decimals=GRAPH_DECIMALS,
+        offsets=None,
+    ):
+        """Add a series to a graph in the data dictionary. Offsets are only given
+        for series with their own points on the date axis."""
+        series = {
+            "label": label,
+            "color": color,
+            "delta": delta,
+            "values": self.compact_values(values, decimals, delta),
+        }
+        if offsets is not None:
+            series["offsets"] = offsets
+
+        self.data.setdefault(graph_name, {"series": []})["series"].append(series)
+
+    def get_sample_offsets(self):
+        """Get the offsets of the last day of every week or month of the graphs,
+        or None when every day is used."""
+        if self.resolution not in PERIOD_FREQUENCIES:
+            return None
+
+        periods = self.datelist.to_period(PERIOD_FREQUENCIES[self.resolution])
+        return np.flatnonzero(np.append(periods[1:] != periods[:-1], True)).tolist()
+
+    def add_time_series(self, graph_name, values, labels, colors, **kwargs):
+        """Add series with a value per day to a graph at the resolution of the
+        graphs. The value at the end of every week or month is used for those
+        resolutions.
+
+        :param values: An array of days x series
+        :param kwargs: Passed on to add_graph_data
+
+        """
+        if self.resolution == "lttb":
+            self.add_date_axis(graph_name)
+            for index, (label, color) in enumerate(zip(labels, colors)):
+                offsets = lttb_indices(values[:, index], self.max_points)
+                self.add_graph_data(
+                    graph_name,
+                    values[offsets, index],
+                    label,
+                    color=color,
+                    offsets=offsets.tolist(),
+                    **kwargs,
+                )
+            return
+
+        offsets = self.get_sample_offsets()
+        self.add_date_axis(graph_name, offsets)
+        if offsets is not None:
+            values = values[offsets]
+
+        for index, (label, color) in enumerate(zip(labels, colors)):
+            self.add_graph_data(graph_name, values[:, index], label, color, **kwargs)
+
+    def get_week_keys(self):
+        """Get the ISO year and week of every day of the graphs as a label."""
+        iso_calendar = self.datelist.isocalendar()
+        self.week_keys = [
+            f"{year}-W{week:02d}"
+            for year, week in zip(iso_calendar["year"], iso_calendar["week"])
+        ]
+
     def write_csv(self):
         """Write the training sessions to a csv file. Intended for debugging."""
         field_names = [field.name for field in TrainingSession._meta.get_fields()]
@@ -119,26 +417,6 @@ class GraphsData:
             for session in self.training_sessions:
                 writer.writerow([getattr(session, field) for field in field_names])
 
-    def get_total_data(self, user, discipline=None):
-        """Get the total trained data for a user and optional discipline."""
-        total_trained_data = self.training_sessions.fillna(0)
-
-        user_data = total_trained_data.loc[
-            total_trained_data["user_name"] == user.username
-        ]
-
-        if discipline:
-            user_data = user_data.loc[user_data["discipline_name"] == discipline]
-
-        trained_data = user_data.groupby("date").moving_duration.sum()
-        trained_data.index = pd.DatetimeIndex(trained_data.index)
-        trained_data = trained_data.reindex(self.datelist, fill_value=0)
-
-        dates = [pd.to_datetime(x).isoformat() for x in trained_data.index.values]
-        values = trained_data.transform(pd.Series.cumsum).values.tolist()
-
-        return dates, values
-
     def create_total_trained_data_graph(self, disciplines=None):
         """Get the total hours trained as a cumulative sum per user."""
 
@@ -147,26 +425,13 @@ class GraphsData:
         else:
             graph_name = "total_hours_trained_disciplines"
 
-        for discipline in [None] if disciplines is None else disciplines:
-            user_count = 0
-            for user in self.users:
-                if discipline:
-                    graph_color = self.get_color(discipline, user_count)
-                    graph_label = f"{user.username.capitalize()} - {discipline}"
-                else:
-                    graph_label = f"{user.username.capitalize()}"
-                    graph_color = None
+        series_hours, labels, colors = self.get_series_hours(
+            self.daily_hours, disciplines
+        )
+        initial_hours, _, _ = self.get_series_hours(self.initial_hours, disciplines)
+        total_hours = np.cumsum(series_hours, axis=0) + initial_hours
 
-                dates, values = self.get_total_data(user, discipline)
-
-                self.add_graph_data(
-                    graph_name,
-                    dates,
-                    values,
-                    graph_label,
-                    color=graph_color,
-                )
-                user_count += 1
+        self.add_time_series(graph_name, total_hours, labels, colors, delta=True)
 
         self.settings[graph_name] = {
             "y_label": "Hours trained",
@@ -202,35 +467,6 @@ class GraphsData:
         except ValueError:
             return None
 
-    def get_weekly_data(self, user, discipline=None):
-        """Get data totals per week."""
-        trained_data = (
-            self.get_user_data(user.username, discipline=discipline)
-            .groupby(["week_number"])
-            .moving_duration.sum()
-        )
-
-        trained_data = (
-            trained_data.reset_index()
-            .merge(
-                self.week_numbers,
-                how="right",
-                left_on="week_number",
-                right_on="week",
-            )
-            .fillna(0)
-        )
-
-        if discipline:
-            trained_data = trained_data.loc[
-                trained_data["week"] >= datetime.today().isocalendar().week - 12
-            ]
-
-        values = trained_data["moving_duration"].to_list()
-        dates = trained_data["week"].to_list()
-
-        return values, dates
-
     def create_weekly_trained_data_graph(self, disciplines=None):
         """Get weekly hours trained per user and optionally per discipline."""
 
@@ -238,27 +474,19 @@ class GraphsData:
             f"weekly_hours_trained{'_disciplines' if disciplines is not None else ''}"
         )
 
-        for discipline in [None] if disciplines is None else disciplines:
-            user_count = 0
-            for user in self.users:
-                if discipline:
-                    graph_color = self.get_color(discipline, user_count)
-                    graph_label = f"{user.username.capitalize()} - {discipline}"
-                else:
-                    graph_label = f"{user.username.capitalize()}"
-                    graph_color = None
-
-                values, dates = self.get_weekly_data(user, discipline)
+        series_hours, labels, colors = self.get_series_hours(
+            self.daily_hours, disciplines
+        )
+        weekly_hours = (
+            pd.DataFrame(series_hours).groupby(self.week_keys, sort=False).sum()
+        )
 
-                self.add_graph_data(
-                    graph_name,
-                    dates,
-                    values,
-                    graph_label,
-                    color=graph_color,
-                )
+        if disciplines is not None:
+            weekly_hours = weekly_hours.iloc[-DISCIPLINE_WEEK_COUNT:]
 
-                user_count += 1
+        self.add_category_axis(graph_name, weekly_hours.index.tolist())
+        for index, (label, color) in enumerate(zip(labels, colors)):
+            self.add_graph_data(graph_name, weekly_hours[index], label, color=color)
 
         self.settings[graph_name] = {
             "y_label": "Hours trained",
@@ -266,5 +494,77 @@ class GraphsData:
             f"{ 'per discipline' if disciplines is not None else ''}",
             "chart_type": "bar",
             "x_type": "category",
-            "x_label": "Week Number",
+            "x_label": "Week",
         }
+
+    def create_training_load_graph(self):
+        """Get the fitness, fatigue and form per user over time."""
+        graph_name = "training_load"
+        users = list(self.users)
+        training_loads = training_load.get_training_loads(
+            [user.id for user in users],
+            start_date=self.start_date.date(),
+            end_date=self.end_date.date(),
+        )
+        training_loads["date"] = pd.DatetimeIndex(training_loads["date"])
+
+        values, labels, colors = [], [], []
+        for user_count, user in enumerate(users):
+            user_loads = (
+                training_loads.loc[training_loads["user_id"] == user.id]
+                .set_index("date")
+                .reindex(self.datelist, fill_value=0)
+            )
+            for field, color in TRAINING_LOAD_COLORS.items():
+                values.append(user_loads[field].to_numpy(dtype=float))
+                labels.append(f"{user.username.capitalize()} - {field.capitalize()}")
+                colors.append(
+                    self.adjust_color(
+                        self.color_name_to_hex(color),
+                        0.8 + user_count / max(len(users) - 1, 1),
+                    )
+                )
+
+        self.add_time_series(
+            graph_name,
+            np.array(values).T.reshape(len(self.datelist), len(labels)),
+            labels,
+            colors,
+            decimals=1,
+        )
+
+        self.settings[graph_name] = {
+            "y_label": "Training load",
+            "title": "Fitness (CTL), fatigue (ATL) and form (TSB)",
+        }
+
+
+def get_graphs_version(*parts):
+    """Get a version of the graphs that changes whenever their data changes.
+
+    :param parts: The parameters the graphs were created with
+
+    """
+    return caching.get_versioned_key("graphs", date.today(), *parts)
+
+
+def get_cached_graphs_json(**parameters):
+    """Get the graph data and settings as JSON from the cache or create them. The
+    JSON is cached, so it is only serialized once per data version.
+
+    :param parameters: Passed on to GraphsData
+
+    """
+
+    def create_graphs_json():
+        graphs_data = GraphsData(**parameters)
+        return json.dumps(
+            {"data": graphs_data.data, "settings": graphs_data.settings},
+            separators=(",", ":"),
+        )
+
+    key_parts = [
+        f"{name}={','.join(value) if isinstance(value, tuple) else value}"
+        for name, value in sorted(parameters.items())
+    ]
+    return caching.get_or_compute(get_graphs_version(*key_parts), create_graphs_json)
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from training import map_grid, maps
+
+
+class Command(BaseCommand):
+    help = "Build the grid used to look up the municipality of GPS points."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--cell-size",
+            type=float,
+            nargs=2,
+            default=map_grid.DEFAULT_CELL_SIZE,
+            metavar=("LONGITUDE", "LATITUDE"),
+            help="The width and height of a grid cell in degrees.",
+        )
+
+    def handle(self, *args, **options):
+        regional_map = maps.get_regional_map()
+        if regional_map is None:
+            raise CommandError("Regional map is not available")
+
+        lookup_grid = map_grid.LookupGrid.build(
+            regional_map, options["cell_size"], maps.get_regional_map_version()
+        )
+        lookup_grid.save()
+
+        boundary_share = (lookup_grid.grid == map_grid.BOUNDARY).mean()
+        self.stdout.write(
+            f"Saved lookup grid of {lookup_grid.grid.shape[0]} x "
+            f"{lookup_grid.grid.shape[1]} cells to {map_grid.GRID_PATH}, "
+            f"{boundary_share:.1%} of the cells cross a boundary"
+        )
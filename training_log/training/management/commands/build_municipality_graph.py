@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from training import adjacency
+
+
+class Command(BaseCommand):
+    help = "Build the graph of neighbouring municipalities used for suggestions."
+
+    def handle(self, *args, **options):
+        graph = adjacency.build_municipality_graph()
+        if graph is None:
+            raise CommandError("Regional map is not available")
+
+        self.stdout.write(
+            f"Saved municipality graph of {len(graph.names)} municipalities to "
+            f"{adjacency.GRAPH_PATH}"
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from training import coverage, maps
+from training.models import Municipality
+
+
+class Command(BaseCommand):
+    help = (
+        "Register the municipalities of the regional map and rebuild the visited "
+        "municipalities of all users."
+    )
+
+    def handle(self, *args, **options):
+        regional_map = maps.get_regional_map()
+        if regional_map is None:
+            raise CommandError("Regional map is not available")
+
+        coverage.register_municipalities(regional_map["GM_NAAM"])
+        coverage.rebuild_all_visits()
+
+        self.stdout.write(
+            f"Synced {Municipality.objects.count()} municipalities and rebuilt the "
+            "visited municipalities"
+        )
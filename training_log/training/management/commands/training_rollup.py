@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from training import rollup
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily training rollup or check it for drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report rollup rows that differ from the training sessions.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["check"]:
+            row_count = rollup.rebuild()
+            self.stdout.write(f"Rebuilt training rollup with {row_count} rows")
+            return
+
+        drift = rollup.find_drift()
+        for user_id, discipline_id, date in drift:
+            self.stdout.write(
+                f"Drift for user {user_id}, discipline {discipline_id} on {date}"
+            )
+
+        if drift:
+            raise CommandError(
+                f"Training rollup has drifted on {len(drift)} day(s). "
+                f"Run without --check to rebuild it."
+            )
+
+        self.stdout.write("Training rollup is up to date")
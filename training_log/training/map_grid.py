@@ -0,0 +1,164 @@
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+import shapely
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+GRID_PATH = os.path.join(
+    settings.BASE_DIR,
+    "training",
+    "map_data",
+    "gemeente_grid.npy",
+)
+
+# Cells of about 100 by 100 meters in the Netherlands, as (longitude, latitude).
+DEFAULT_CELL_SIZE = (0.0015, 0.0009)
+
+NO_MUNICIPALITY = -1
+BOUNDARY = -2
+
+_lookup_grid = None
+_lookup_grid_lock = threading.Lock()
+
+
+def get_metadata_path(path):
+    """Get the path of the metadata that belongs to a grid."""
+    return f"{os.path.splitext(path)[0]}.json"
+
+
+class LookupGrid:
+    """A regular longitude and latitude grid over a regional map, with per cell the
+    index of the municipality that covers it. Cells outside every municipality
+    are NO_MUNICIPALITY and cells that cross a boundary are BOUNDARY, so points in
+    those need an exact test. The version is the dataset version of the regional
+    map the grid was built from."""
+
+    def __init__(self, grid, bounds, cell_size, names, version=None):
+        self.grid = grid
+        self.bounds = tuple(bounds)
+        self.cell_size = tuple(cell_size)
+        self.names = list(names)
+        self.version = version
+
+    @classmethod
+    def build(cls, regional_map, cell_size=DEFAULT_CELL_SIZE, version=None):
+        """Build the grid of a regional map one row of cells at a time.
+
+        :param regional_map: A GeoDataFrame with the municipality geometries
+        :param cell_size: The width and height of a cell in degrees (Default value
+        = DEFAULT_CELL_SIZE)
+        :param version: The dataset version of the regional map (Default value =
+        None)
+
+        """
+        min_lon, min_lat, max_lon, max_lat = regional_map.total_bounds
+        column_count = int(np.ceil((max_lon - min_lon) / cell_size[0]))
+        row_count = int(np.ceil((max_lat - min_lat) / cell_size[1]))
+        grid = np.full((row_count, column_count), NO_MUNICIPALITY, dtype=np.int16)
+
+        column_edges = min_lon + np.arange(column_count + 1) * cell_size[0]
+        for row in range(row_count):
+            row_min_lat = min_lat + row * cell_size[1]
+            cells = shapely.box(
+                column_edges[:-1],
+                row_min_lat,
+                column_edges[1:],
+                row_min_lat + cell_size[1],
+            )
+
+            # Cells that touch a municipality are boundary cells, unless they lie
+            # completely within one.
+            touching = np.unique(
+                regional_map.sindex.query(cells, predicate="intersects")[0]
+            )
+            grid[row, touching] = BOUNDARY
+
+            cell_indices, municipality_indices = regional_map.sindex.query(
+                cells[touching], predicate="within"
+            )
+            grid[row, touching[cell_indices]] = municipality_indices
+
+        logger.info(f"Built lookup grid of {row_count} x {column_count} cells")
+        return cls(
+            grid,
+            (min_lon, min_lat, max_lon, max_lat),
+            cell_size,
+            regional_map["GM_NAAM"],
+            version,
+        )
+
+    def save(self, path=GRID_PATH):
+        """Save the grid as a NumPy array with its metadata next to it."""
+        np.save(path, self.grid)
+        with open(get_metadata_path(path), "w") as metadata_file:
+            json.dump(
+                {
+                    "bounds": [float(bound) for bound in self.bounds],
+                    "cell_size": list(self.cell_size),
+                    "names": self.names,
+                    "version": self.version,
+                },
+                metadata_file,
+            )
+
+    @classmethod
+    def load(cls, path=GRID_PATH):
+        """Load a saved grid. The array is memory mapped, so it is only read from
+        disk where it is used and shared between processes."""
+        with open(get_metadata_path(path)) as metadata_file:
+            metadata = json.load(metadata_file)
+
+        return cls(np.load(path, mmap_mode="r"), **metadata)
+
+    def lookup(self, lons, lats):
+        """Get the municipality index of the cell of every point.
+
+        :returns: An array with the municipality index of every point, or
+        NO_MUNICIPALITY or BOUNDARY
+
+        """
+        min_lon, min_lat = self.bounds[:2]
+        rows = np.floor((np.asarray(lats) - min_lat) / self.cell_size[1]).astype(int)
+        columns = np.floor((np.asarray(lons) - min_lon) / self.cell_size[0]).astype(int)
+
+        inside = (
+            (rows >= 0)
+            & (rows < self.grid.shape[0])
+            & (columns >= 0)
+            & (columns < self.grid.shape[1])
+        )
+        indices = np.full(len(rows), NO_MUNICIPALITY, dtype=int)
+        indices[inside] = self.grid[rows[inside], columns[inside]]
+        return indices
+
+
+def get_lookup_grid(regional_map, version):
+    """Get the lookup grid of this process, or None if it has not been built. A
+    grid that was built from another version of the regional map is rebuilt with
+    the same cell size.
+
+    :param regional_map: The regional map of this process
+    :param version: The dataset version of the regional map
+
+    """
+    global _lookup_grid
+
+    if _lookup_grid is None and regional_map is not None and os.path.exists(GRID_PATH):
+        with _lookup_grid_lock:
+            if _lookup_grid is None:
+                logger.info(f"Loading {GRID_PATH}")
+                lookup_grid = LookupGrid.load(GRID_PATH)
+                if lookup_grid.version != version:
+                    logger.info(f"Rebuilding {GRID_PATH} for the new regional map")
+                    lookup_grid = LookupGrid.build(
+                        regional_map, lookup_grid.cell_size, version
+                    )
+                    lookup_grid.save(GRID_PATH)
+                _lookup_grid = lookup_grid
+
+    return _lookup_grid
@@ -1,17 +1,24 @@
-import datetime
+import hashlib
 import itertools
+import json
 import logging
 import os
+import threading
+from typing import NamedTuple
 
-import folium
 import geopandas as gpd
-import polyline
+import numpy as np
+import pandas as pd
+import shapely
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db import transaction
+from django.db.models import Exists, OuterRef
 from shapely.geometry import Point
 
-from .models import MunicipalityVisits
-from .stats import DEFAULT_START_DATE
+from . import caching, coverage, map_grid, polylines, regions
+from .models import Discipline, MunicipalityVisits
 
 logger = logging.getLogger(__name__)
 
@@ -29,147 +36,433 @@ SHAPEFILE_PATH = os.path.join(
     "gemeente_2022_v1.shp",
 )
 
+GEOMETRY_CACHE_PATH = os.path.join(
+    settings.BASE_DIR,
+    "training",
+    "map_data",
+    "gemeente.npz",
+)
 
-class TrainingMap:
-    """This class is used to create a map of the municipalities
-    visited during training."""
+REGIONAL_MAP_COLUMNS = ["GM_NAAM", "geometry"]
 
-    def __init__(self, gdf=None):
-        if gdf is None:
-            self.regional_map = self.load_regional_dataframe()
-        else:
-            self.regional_map = gdf
-        self.usernames = None
+# Meters per degree of latitude on the mean earth radius.
+METERS_PER_DEGREE = 6371008.8 * np.pi / 180
+# About 5 meters, well below the accuracy of GPS tracks.
+SIMPLIFY_TOLERANCE = 0.00005
 
-    def set_users(self, user_ids):
-        """Set the included user names."""
-        self.usernames = list(
-            User.objects.filter(id__in=user_ids).values_list("username", flat=True)
-        )
 
-    def load_regional_dataframe(self):
-        """Load the regional map. Load from disk if it exists.
-        Otherwise create it from shapefile and save to disk."""
-        if os.path.exists(GDF_OUTPUT_PATH):
-            logger.info(f"Loading {GDF_OUTPUT_PATH}")
-            gdf = gpd.read_file(GDF_OUTPUT_PATH)
-        else:
-            logger.info("Loading regional map")
-            if not os.path.exists(SHAPEFILE_PATH):
-                logger.error(f"{SHAPEFILE_PATH} does not exist")
-                return
-            gdf = gpd.read_file(SHAPEFILE_PATH)
-            gdf = gdf[gdf["H2O"] == "NEE"]
-            logger.info("Converting regional map to EPSG:4326")
-            gdf = gdf.to_crs(4326)
-            logger.info(f"Saving to {GDF_OUTPUT_PATH}")
-            gdf.to_file(filename=GDF_OUTPUT_PATH, driver="GPKG")
-        return gdf
-
-    @property
-    def color_map(self):
-        """Create a color map based on the users that have visited."""
-        colors = ["red", "blue", "green", "yellow", "orange", "teal"]
-        color_cycle = itertools.cycle(colors)
-
-        color_map = {}
-        for user in self.usernames:
-            color_map[user.lower()] = next(color_cycle)
-
-        return color_map
-
-    def style_visited_map(self, feature):
-        """Style regions based on the users that have visited."""
-        fill_opacity = 0.2
-        fill_color = "gray"
-
-        visits = feature["properties"]["visits"]
-
-        if visits:
-            fill_opacity = 0.5
-            if len(visits) >= 2:
-                fill_color = "brown"
-            else:
-                fill_color = self.color_map.get(visits[0].lower())
+class GeometryLevel(NamedTuple):
+    """A level of detail of the municipality boundaries, used up to a zoom level
+    of the map."""
 
-        return {
-            "color": "gray",
-            "fillColor": fill_color,
-            "fillOpacity": fill_opacity,
-            "weight": 1,
-            "tooltip": feature["properties"]["GM_NAAM"],
-        }
+    max_zoom: int | None
+    tolerance: float | None
 
-    @staticmethod
-    def get_users_per_municipality(users, disciplines, start_date, end_date):
-        """Create a dictionary of users visited per municipality."""
-        visits = MunicipalityVisits.objects.select_related(
-            "training_session__user"
-        ).filter(
-            training_session__user__in=users,
-            training_session__discipline__name__in=disciplines,
-            training_session__date__range=(start_date, end_date),
-        )
 
-        municipality_users_dict = {}
+# Tolerances in degrees, the last level has the full geometries.
+GEOMETRY_LEVELS = [
+    GeometryLevel(8, 0.002),
+    GeometryLevel(10, 0.0005),
+    GeometryLevel(12, 0.0001),
+    GeometryLevel(None, None),
+]
 
-        for visit in visits:
-            municipality = visit.municipality
-            username = visit.training_session.user.username.capitalize()
+USER_COLORS = ["red", "blue", "green", "yellow", "orange", "teal"]
+GEOMETRY_DECIMALS = 5
+GEOMETRY_VERSION_LENGTH = 12
 
-            if municipality not in municipality_users_dict:
-                municipality_users_dict[municipality] = []
+_regional_map = None
+_regional_map_version = None
+_regional_map_lock = threading.Lock()
+_geometry_json = {}
 
-            if username not in municipality_users_dict[municipality]:
-                municipality_users_dict[municipality].append(username)
 
-        return municipality_users_dict
+class MunicipalityVisit(NamedTuple):
+    """A municipality a track passes through, with the distance and time spent
+    in it and the order in which it was entered."""
 
-    def create_training_map(
-        self,
-        user_ids,
-        disciplines,
-        start_date=DEFAULT_START_DATE,
-        end_date=datetime.date.today(),
-    ):
-        """Create the training map using folium."""
-        if self.regional_map is None:
-            logger.warning("Regional map is not loaded")
-            return
+    municipality: str
+    distance: float
+    moving_duration: int
+    entry_order: int
 
-        municipality_visits = self.get_users_per_municipality(
-            user_ids, disciplines, start_date, end_date
+
+def get_wkb_arrays(geometries):
+    """Get the WKB of geometries concatenated into a single byte array, with the
+    offsets of every geometry in it."""
+    wkb = shapely.to_wkb(geometries)
+    return np.frombuffer(b"".join(wkb), dtype=np.uint8), np.cumsum([0, *map(len, wkb)])
+
+
+def from_wkb_arrays(wkb, offsets):
+    """Get the geometries from a WKB byte array and its offsets."""
+    wkb = wkb.tobytes()
+    return shapely.from_wkb(
+        [wkb[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+    )
+
+
+def get_dataset_version(regional_map):
+    """Get a version of a regional map that changes when its names or geometries
+    do."""
+    content = hashlib.sha1()
+    content.update("\n".join(regional_map["GM_NAAM"]).encode())
+    content.update(get_wkb_arrays(regional_map.geometry.to_numpy())[0])
+    return content.hexdigest()
+
+
+def simplify_geometries(geometries, tolerance):
+    """Simplify the municipalities as a coverage, so neighbours keep sharing their
+    boundaries without gaps or overlaps."""
+    if tolerance is None:
+        return geometries
+    return shapely.coverage_simplify(geometries, tolerance)
+
+
+def save_geometry_cache(gdf, path=GEOMETRY_CACHE_PATH, version=None):
+    """Save the names and geometries of a regional map as plain NumPy arrays, with
+    the WKB of all geometries concatenated into a single byte array. The
+    simplified geometries of every geometry level are saved next to them.
+
+    :param version: The version of the source file of the regional map (Default
+    value = None)
+
+    """
+    geometries = gdf.geometry.to_numpy()
+    arrays = {"names": gdf["GM_NAAM"].to_numpy(dtype=str)}
+    if version is not None:
+        arrays["version"] = np.array(version)
+    arrays["wkb"], arrays["offsets"] = get_wkb_arrays(geometries)
+
+    for level, geometry_level in enumerate(GEOMETRY_LEVELS):
+        if geometry_level.tolerance is not None:
+            arrays[f"wkb_{level}"], arrays[f"offsets_{level}"] = get_wkb_arrays(
+                simplify_geometries(geometries, geometry_level.tolerance)
+            )
+
+    np.savez(path, **arrays)
+
+
+def load_geometry_cache(path=GEOMETRY_CACHE_PATH, level=None):
+    """Load a regional map saved by save_geometry_cache.
+
+    :param level: The geometry level to load, the full geometries if None
+    (Default value = None)
+
+    """
+    suffix = "" if level is None else f"_{level}"
+    with np.load(path) as arrays:
+        geometries = from_wkb_arrays(arrays[f"wkb{suffix}"], arrays[f"offsets{suffix}"])
+        return gpd.GeoDataFrame(
+            {"GM_NAAM": arrays["names"].astype(object)}, geometry=geometries, crs=4326
         )
-        self.set_users(user_ids)
 
-        self.regional_map["visits"] = self.regional_map["GM_NAAM"].apply(
-            lambda x: municipality_visits.get(x, None)
+
+def get_geometry_cache_version(path=GEOMETRY_CACHE_PATH):
+    """Get the version of the source file a geometry cache was saved from, or None
+    if it was saved without one."""
+    with np.load(path) as arrays:
+        return str(arrays["version"]) if "version" in arrays else None
+
+
+def get_source_version(path):
+    """Get a version of a source file of the regional map that changes when the
+    file or the geometry levels do."""
+    content = hashlib.sha1(repr(GEOMETRY_LEVELS).encode())
+    with open(path, "rb") as source_file:
+        for chunk in iter(lambda: source_file.read(1 << 20), b""):
+            content.update(chunk)
+    return content.hexdigest()
+
+
+def load_regional_dataframe():
+    """Load the regional map. Load from the geometry cache if it was saved from the
+    current source file, otherwise from disk or from the shapefile, and create the
+    cache."""
+    source_path = next(
+        (path for path in (GDF_OUTPUT_PATH, SHAPEFILE_PATH) if os.path.exists(path)),
+        None,
+    )
+    if os.path.exists(GEOMETRY_CACHE_PATH):
+        if source_path is None or get_geometry_cache_version(
+            GEOMETRY_CACHE_PATH
+        ) == get_source_version(source_path):
+            logger.info(f"Loading {GEOMETRY_CACHE_PATH}")
+            return load_geometry_cache(GEOMETRY_CACHE_PATH)
+        logger.info(f"{GEOMETRY_CACHE_PATH} was not saved from {source_path}")
+
+    if source_path == GDF_OUTPUT_PATH:
+        logger.info(f"Loading {GDF_OUTPUT_PATH}")
+        gdf = gpd.read_file(GDF_OUTPUT_PATH)
+    else:
+        logger.info("Loading regional map")
+        if source_path is None:
+            logger.error(f"{SHAPEFILE_PATH} does not exist")
+            return
+        gdf = gpd.read_file(SHAPEFILE_PATH)
+        gdf = gdf[gdf["H2O"] == "NEE"]
+        logger.info("Converting regional map to EPSG:4326")
+        gdf = gdf.to_crs(4326)
+        logger.info(f"Saving to {GDF_OUTPUT_PATH}")
+        gdf.to_file(filename=GDF_OUTPUT_PATH, driver="GPKG")
+
+    gdf = gdf[REGIONAL_MAP_COLUMNS].reset_index(drop=True)
+    logger.info(f"Saving to {GEOMETRY_CACHE_PATH}")
+    save_geometry_cache(
+        gdf, GEOMETRY_CACHE_PATH, version=get_source_version(GDF_OUTPUT_PATH)
+    )
+    return gdf
+
+
+def get_regional_map():
+    """Get the regional map of this process. It is loaded once and shared by all
+    training maps, so it must not be modified."""
+    global _regional_map, _regional_map_version
+
+    if _regional_map is None:
+        with _regional_map_lock:
+            if _regional_map is None:
+                regional_map = load_regional_dataframe()
+                if regional_map is not None:
+                    # Build the spatial index once, before the map is shared.
+                    _ = regional_map.sindex
+                    _regional_map_version = get_dataset_version(regional_map)
+                _regional_map = regional_map
+
+    return _regional_map
+
+
+def get_regional_map_version():
+    """Get the dataset version of the regional map of this process, or None if it
+    is not available."""
+    get_regional_map()
+    return _regional_map_version
+
+
+def create_geometry_json(regional_map):
+    """Create GeoJSON of the municipality boundaries, with the coordinates rounded
+    to about a meter to keep it small."""
+    geometries = shapely.transform(
+        regional_map.geometry.to_numpy(),
+        lambda xy: np.round(xy, GEOMETRY_DECIMALS),
+    )
+    return gpd.GeoDataFrame(
+        {"GM_NAAM": regional_map["GM_NAAM"]}, geometry=geometries, crs=4326
+    ).to_json(drop_id=True, separators=(",", ":"))
+
+
+def get_level_map(level):
+    """Get the regional map with the geometries of a geometry level, from the
+    geometry cache when it holds them."""
+    regional_map = get_regional_map()
+    tolerance = GEOMETRY_LEVELS[level].tolerance
+    if regional_map is None or tolerance is None:
+        return regional_map
+
+    try:
+        return load_geometry_cache(level=level)
+    except (OSError, KeyError):
+        logger.info(f"Simplifying the regional map for geometry level {level}")
+        return regional_map.assign(
+            geometry=simplify_geometries(regional_map.geometry.to_numpy(), tolerance)
         )
-        self.regional_map["visits_string"] = self.regional_map["visits"].apply(
-            lambda x: ", ".join(x or [])
+
+
+def get_geometry_json(level=len(GEOMETRY_LEVELS) - 1):
+    """Get the GeoJSON of the municipality boundaries at a geometry level. It is
+    created once per process.
+
+    :returns: The GeoJSON, or None if the regional map is not available
+
+    """
+    if level not in _geometry_json:
+        level_map = get_level_map(level)
+        if level_map is None:
+            return None
+
+        _geometry_json[level] = create_geometry_json(level_map).encode()
+
+    return _geometry_json[level]
+
+
+def get_geometry_version():
+    """Get a version of the municipality boundaries that changes when the
+    boundaries or the geometry levels do, or None if they are not available."""
+    geometry_json = get_geometry_json()
+    if geometry_json is None:
+        return None
+
+    content = geometry_json + repr(GEOMETRY_LEVELS).encode()
+    return hashlib.sha1(content).hexdigest()[:GEOMETRY_VERSION_LENGTH]
+
+
+def update_discipline_facet(discipline_ids):
+    """Store for disciplines whether they have municipality visits, to show
+    them as filter of the training map."""
+    Discipline.objects.filter(id__in=discipline_ids).update(
+        has_municipality_visits=Exists(
+            MunicipalityVisits.objects.filter(
+                training_session__discipline=OuterRef("pk")
+            )
         )
+    )
+
+
+class RemovedVisits:
+    """The (user, discipline) keys with removed visits of a transaction. It is
+    registered as a callback of the transaction, so it is discarded with the
+    transaction when that is rolled back."""
+
+    def __init__(self):
+        self.keys = set()
+        self.applied = False
+
+    def __call__(self):
+        """Update the discipline facet and visited municipalities of every key."""
+        self.applied = True
+        update_discipline_facet({discipline_id for _, discipline_id in self.keys})
+        for user_id, discipline_id in self.keys:
+            coverage.rebuild_visits(user_id, discipline_id)
+
+
+def update_removed_visits(user_id, discipline_id):
+    """Update the discipline facet and the visited municipalities of a user for a
+    discipline once the current transaction commits, after visits are removed.
+    Every (user, discipline) is updated once, however many visits are removed."""
+    connection = transaction.get_connection()
+    for _, callback, *_ in connection.run_on_commit:
+        if isinstance(callback, RemovedVisits) and not callback.applied:
+            callback.keys.add((user_id, discipline_id))
+            return
 
-        logger.info("Transforming regional map to json")
-        geo_json = self.regional_map.to_json()
+    removed_visits = RemovedVisits()
+    removed_visits.keys.add((user_id, discipline_id))
+    transaction.on_commit(removed_visits)
+
+
+def save_municipality_visits(session, visits):
+    """Store the municipality visits of a session in a single query.
+
+    :param visits: A list of municipality visits
+
+    """
+    MunicipalityVisits.objects.bulk_create(
+        [
+            MunicipalityVisits(training_session=session, **visit._asdict())
+            for visit in visits
+        ]
+    )
+
+    # Bulk creation sends no signals, so the visits version, discipline facet
+    # and visited municipalities are updated here.
+    caching.bump_data_version(caching.VISITS_VERSION_KEY)
+    Discipline.objects.filter(
+        id=session.discipline_id, has_municipality_visits=False
+    ).update(has_municipality_visits=True)
+    coverage.add_visits(
+        session.user_id,
+        session.discipline_id,
+        [visit.municipality for visit in visits],
+    )
+
+
+def get_visits_data(user_ids, disciplines, start_date, end_date):
+    """Get the municipalities visited by users and the color of every user, to
+    style the municipality boundaries with in the browser."""
+    usernames = (
+        User.objects.filter(id__in=user_ids)
+        .order_by("id")
+        .values_list("username", flat=True)
+    )
+    return {
+        "colors": {
+            username.capitalize(): color
+            for username, color in zip(usernames, itertools.cycle(USER_COLORS))
+        },
+        "visits": TrainingMap.get_users_per_municipality(
+            user_ids, disciplines, start_date, end_date
+        ),
+    }
+
+
+def get_cached_visits_json(user_ids, disciplines, start_date, end_date):
+    """Get the visits data as JSON from the cache or create it. It is cached until
+    municipality visits are added or removed."""
+    parameters = {
+        "users": sorted(int(user_id) for user_id in user_ids),
+        "disciplines": sorted(disciplines),
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+    }
+    key = caching.get_versioned_key(
+        "map_visits",
+        hashlib.sha1(json.dumps(parameters, sort_keys=True).encode()).hexdigest(),
+        version_key=caching.VISITS_VERSION_KEY,
+    )
+
+    return caching.get_or_compute(
+        key,
+        lambda: json.dumps(
+            get_visits_data(user_ids, disciplines, start_date, end_date),
+            separators=(",", ":"),
+        ),
+    )
 
-        logger.info("Creating folium")
 
-        m = folium.Map(location=[52.13, 5.29], zoom_start=7, tiles="cartodb positron")
+class TrainingMap:
+    """This class is used to create a map of the municipalities
+    visited during training."""
 
-        logger.info("Adding styles and tooltips")
-        cp = folium.GeoJson(
-            geo_json, name="visits", style_function=self.style_visited_map
-        ).add_to(m)
-        folium.LayerControl().add_to(m)
+    def __init__(self, gdf=None, lookup_grid=None, region_datasets=None):
+        if gdf is None:
+            self.regional_map = get_regional_map()
+            lookup_grid = lookup_grid or map_grid.get_lookup_grid(
+                self.regional_map, get_regional_map_version()
+            )
+            if region_datasets is None:
+                region_datasets = regions.get_datasets()
+        else:
+            self.regional_map = gdf
+        self.lookup_grid = self.check_lookup_grid(lookup_grid)
+        self.region_datasets = region_datasets or []
+
+    def check_lookup_grid(self, lookup_grid):
+        """Only use a lookup grid that was built from the regional map."""
+        if lookup_grid is None or self.regional_map is None:
+            return None
 
-        folium.GeoJsonTooltip(
-            ["GM_NAAM", "visits_string"], aliases=["Gemeente", "Visited by"]
-        ).add_to(cp)
+        if lookup_grid.names != self.regional_map["GM_NAAM"].tolist():
+            logger.warning("Lookup grid does not match the regional map")
+            return None
 
-        logger.info("Converting map to HTML")
-        m = m._repr_html_()
+        return lookup_grid
 
-        return m
+    @staticmethod
+    def get_users_per_municipality(users, disciplines, start_date, end_date):
+        """Create a dictionary of users visited per municipality, with the
+        distinct users of every municipality aggregated in the database."""
+        visitors = (
+            MunicipalityVisits.objects.filter(
+                training_session__user__in=users,
+                training_session__discipline__name__in=disciplines,
+                training_session__date__range=(start_date, end_date),
+            )
+            .order_by()
+            .values("municipality")
+            .annotate(
+                usernames=ArrayAgg(
+                    "training_session__user__username",
+                    distinct=True,
+                    ordering="training_session__user__username",
+                )
+            )
+            .values_list("municipality", "usernames")
+        )
+
+        return {
+            municipality: [username.capitalize() for username in usernames]
+            for municipality, usernames in visitors
+        }
 
     def get_municipalities(self, polyline_string):
         """Get all the municipalities from a polyline."""
@@ -181,43 +474,174 @@ class TrainingMap:
             logger.warning("Regional map is not loaded")
             return
 
-        coordinates = polyline.decode(polyline_string)
-        municipalities = set()
-        muni = None
-        for c in coordinates:
-            muni = self.find_muni(c, previous_match=muni)
+        coordinates = np.unique(polylines.decode(polyline_string), axis=0)
+        municipalities = self.find_municipalities(coordinates)
 
-            if muni:
-                municipalities.add(muni)
+        return list(set(municipalities.dropna()))
 
-        return list(municipalities)
+    def get_municipality_visits(self, polyline_string, moving_duration=None):
+        """Get the municipalities a polyline passes through by intersecting the
+        line with the municipalities, which also finds municipalities between
+        the points of the polyline.
 
-    def check_within_bounds(self, coordinate: Point) -> bool:
-        """Check if a coordinate is within the bounds of the regional map."""
-        min_lon, min_lat, max_lon, max_lat = self.regional_map.total_bounds
-        return min_lat <= coordinate.y <= max_lat and min_lon <= coordinate.x <= max_lon
+        :param polyline_string: The encoded polyline, preferably at full resolution
+        :param moving_duration: The moving duration of the track, which is divided
+        over the municipalities by distance (Default value = None)
+        :returns: A list of municipality visits in the order they were entered
 
-    def find_muni(self, coordinates, previous_match=None):
-        """Find the municipality based on the coordinates."""
-        if self.regional_map is None:
-            logger.warning("Regional map is not loaded")
+        """
+        if not polyline_string:
+            logger.warning("Polyline is None")
             return
 
-        coordinate = Point(coordinates[1], coordinates[0])
-
-        if not self.check_within_bounds(coordinate):
+        if self.regional_map is None and not self.region_datasets:
+            logger.warning("Regional map is not loaded")
             return
 
-        if previous_match:
-            previous_gdf = self.regional_map[
-                self.regional_map["GM_NAAM"] == previous_match
+        coordinates = polylines.decode(polyline_string)
+        if len(np.unique(coordinates, axis=0)) < 2:
+            return [
+                MunicipalityVisit(municipality, 0.0, moving_duration or 0, 0)
+                for municipality in self.get_municipalities(polyline_string) or []
             ]
-            for index, municipality in previous_gdf.iterrows():
-                if coordinate.within(municipality["geometry"]):
-                    return municipality["GM_NAAM"]
 
-        for index, municipality in self.regional_map.iterrows():
-            if coordinate.within(municipality["geometry"]):
-                return municipality["GM_NAAM"]
+        coordinates = polylines.simplify(coordinates, SIMPLIFY_TOLERANCE)
+        line = shapely.linestrings(coordinates[:, 1], coordinates[:, 0])
+        geometries, names = self.get_candidate_regions(line)
+        pieces = shapely.intersection(line, geometries)
+
+        # Measure the pieces in meters on a local equirectangular projection.
+        scale = METERS_PER_DEGREE * np.array(
+            [np.cos(np.radians(coordinates[:, 0].mean())), 1]
+        )
+        distances = shapely.length(shapely.transform(pieces, lambda xy: xy * scale))
+        total_distance = distances.sum()
+
+        # A municipality is entered at the first point of its piece along the line.
+        piece_coordinates, piece_indices = shapely.get_coordinates(
+            pieces, return_index=True
+        )
+        entries = np.full(len(pieces), np.inf)
+        np.minimum.at(
+            entries,
+            piece_indices,
+            shapely.line_locate_point(line, shapely.points(piece_coordinates)),
+        )
+
+        # Municipalities the line only touches are not visited.
+        visited = np.flatnonzero(distances > 0)
+        visits = []
+        for entry_order, index in enumerate(
+            visited[np.argsort(entries[visited], kind="stable")]
+        ):
+            share = distances[index] / total_distance if total_distance else 0
+            visits.append(
+                MunicipalityVisit(
+                    names[index],
+                    float(distances[index]),
+                    round((moving_duration or 0) * share),
+                    entry_order,
+                )
+            )
+
+        return visits
+
+    def get_candidate_regions(self, line):
+        """Get the regions a line may pass through. These are the municipalities
+        of the regional map and, where the line leaves them, the finest
+        regions of the region datasets outside the regional map.
+
+        :returns: An array with the geometries and an array with the names of the
+        regions
+
+        """
+        geometries = [np.empty(0, dtype=object)]
+        names = [np.empty(0, dtype=object)]
+
+        if self.regional_map is not None:
+            candidates = self.regional_map.sindex.query(line, predicate="intersects")
+            geometries.append(self.regional_map.geometry.to_numpy()[candidates])
+            names.append(self.regional_map["GM_NAAM"].to_numpy()[candidates])
+            if not self.region_datasets:
+                return np.concatenate(geometries), np.concatenate(names)
+
+            # The line can leave the municipalities within the bounds of the map,
+            # for example over the sea or across a border. Municipalities do not
+            # overlap, so the length of the pieces within them adds up to the
+            # length of the line when they cover it.
+            covered = shapely.length(shapely.intersection(line, geometries[-1])).sum()
+            if np.isclose(covered, line.length):
+                return np.concatenate(geometries), np.concatenate(names)
+
+        for region_dataset in self.region_datasets:
+            dataset_regions = region_dataset.get_regions(line)
+            if self.regional_map is not None:
+                # Regions that the regional map already covers are skipped.
+                inside = self.regional_map.sindex.query(
+                    dataset_regions.geometry.representative_point(),
+                    predicate="within",
+                )[0]
+                dataset_regions = dataset_regions.drop(index=inside)
+
+            geometries.append(dataset_regions.geometry.to_numpy())
+            names.append(dataset_regions["name"].to_numpy(dtype=object))
+
+        return np.concatenate(geometries), np.concatenate(names)
+
+    def check_within_bounds(self, geometry: Point) -> bool:
+        """Check if a coordinate or other geometry is within the bounds of the
+        regional map."""
+        return shapely.box(*self.regional_map.total_bounds).covers(geometry)
+
+    def find_municipality_indices(self, lons, lats):
+        """Find the index of the municipality of every point in a single query on
+        the spatial index of the regional map.
+
+        :returns: An array with the municipality index of every point, or
+        NO_MUNICIPALITY
+
+        """
+        points = gpd.points_from_xy(lons, lats)
+        point_indices, municipality_indices = self.regional_map.sindex.query(
+            points, predicate="within", sort=True
+        )
+
+        # Municipalities do not overlap, but keep the first one like a scan would.
+        first = np.unique(point_indices, return_index=True)[1]
+        indices = np.full(len(points), map_grid.NO_MUNICIPALITY, dtype=int)
+        indices[point_indices[first]] = municipality_indices[first]
+        return indices
+
+    def find_municipalities(self, coordinates):
+        """Find the municipality of every coordinate. The lookup grid classifies
+        most coordinates, only the ones in boundary cells are tested exactly.
+
+        :param coordinates: A sequence of (latitude, longitude) pairs
+        :returns: A series with the municipality name per coordinate, or None if
+        the coordinate is not in a municipality
+
+        """
+        coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+        lats, lons = coordinates[:, 0], coordinates[:, 1]
+
+        if self.lookup_grid is None:
+            indices = self.find_municipality_indices(lons, lats)
+        else:
+            indices = self.lookup_grid.lookup(lons, lats)
+            boundary = indices == map_grid.BOUNDARY
+            indices[boundary] = self.find_municipality_indices(
+                lons[boundary], lats[boundary]
+            )
+
+        found = indices != map_grid.NO_MUNICIPALITY
+        municipalities = pd.Series([None] * len(indices), dtype=object)
+        municipalities[found] = self.regional_map["GM_NAAM"].to_numpy()[indices[found]]
+        return municipalities
+
+    def find_muni(self, coordinates):
+        """Find the municipality based on the coordinates."""
+        if self.regional_map is None:
+            logger.warning("Regional map is not loaded")
+            return
 
-        return
+        return self.find_municipalities([coordinates]).iloc[0]
@@ -0,0 +1,92 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_daily_training_rollup(apps, schema_editor):
+    TrainingSession = apps.get_model("training", "TrainingSession")
+    DailyTrainingRollup = apps.get_model("training", "DailyTrainingRollup")
+
+    rows = (
+        TrainingSession.objects.filter(excluded=False)
+        .order_by()
+        .values("user_id", "discipline_id", "date")
+        .annotate(
+            rollup_moving_duration=Coalesce(Sum("moving_duration"), Value(0)),
+            rollup_total_duration=Coalesce(Sum("total_duration"), Value(0)),
+            rollup_distance=Coalesce(Sum("distance"), Value(0.0)),
+            rollup_session_count=Count("id"),
+            rollup_max_moving_duration=Max("moving_duration"),
+            rollup_max_distance=Max("distance"),
+        )
+    )
+
+    DailyTrainingRollup.objects.bulk_create(
+        [
+            DailyTrainingRollup(
+                **{field.removeprefix("rollup_"): value for field, value in row.items()}
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("training", "0021_trainingsession_summary_polyline"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyTrainingRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("moving_duration", models.IntegerField(default=0)),
+                ("total_duration", models.IntegerField(default=0)),
+                ("distance", models.FloatField(default=0)),
+                ("session_count", models.IntegerField(default=0)),
+                ("max_moving_duration", models.IntegerField(blank=True, null=True)),
+                ("max_distance", models.FloatField(blank=True, null=True)),
+                (
+                    "discipline",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="training.discipline",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-date"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="dailytrainingrollup",
+            constraint=models.UniqueConstraint(
+                fields=("user", "discipline", "date"), name="unique_daily_rollup"
+            ),
+        ),
+        migrations.RunPython(fill_daily_training_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("training", "0022_dailytrainingrollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrainingLoad",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("load", models.FloatField(default=0)),
+                ("fitness", models.FloatField(default=0)),
+                ("fatigue", models.FloatField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["date"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="trainingload",
+            constraint=models.UniqueConstraint(
+                fields=("user", "date"), name="unique_daily_load"
+            ),
+        ),
+    ]
@@ -0,0 +1,148 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:51
+
+import django.db.models.deletion
+import pandas as pd
+from django.conf import settings
+from django.db import migrations, models
+
+# The records as they were when this migration was written, frozen so that later
+# changes to the records do not change this migration.
+START_DATE = pd.Timestamp(2023, 5, 1)
+LONGEST_COLUMNS = {"longest_time": "moving_duration", "longest_distance": "distance"}
+RECORD_BANDS = {
+    "Swimming": {"fastest_1k": 1000, "fastest_1.9k": 1900, "fastest_3.8k": 3800},
+    "Cycling": {"fastest_40k": 40000, "fastest_90k": 90000, "fastest_180k": 180000},
+    "Running": {
+        "fastest_5k": 5000,
+        "fastest_10k": 10000,
+        "fastest_half_marathon": 21097.5,
+        "fastest_marathon": 42195,
+    },
+}
+SESSION_FIELDS = [
+    "id",
+    "date",
+    "moving_duration",
+    "distance",
+    "user_id",
+    "discipline_id",
+    "discipline__name",
+]
+
+
+def calculate_records(sessions, discipline_name):
+    sessions = sessions.loc[pd.to_datetime(sessions["date"]) >= START_DATE]
+    sessions = sessions.astype({"moving_duration": float, "distance": float})
+    sessions = sessions.assign(
+        speed=sessions["distance"]
+        / sessions["moving_duration"].where(sessions["moving_duration"] > 0)
+    ).sort_values("id")
+
+    candidates = {
+        (record, column): sessions.loc[sessions[column] > 0]
+        for record, column in LONGEST_COLUMNS.items()
+    }
+    for record, distance in RECORD_BANDS.get(discipline_name, {}).items():
+        candidates[record, "speed"] = sessions.loc[
+            (sessions["distance"] >= distance) & sessions["speed"].notna()
+        ]
+
+    records = {}
+    for (record, column), record_sessions in candidates.items():
+        if not record_sessions.empty:
+            best = record_sessions.loc[record_sessions[column].idxmax()]
+            records[record] = (float(best[column]), int(best["id"]))
+    return records
+
+
+def fill_personal_records(apps, schema_editor):
+    TrainingSession = apps.get_model("training", "TrainingSession")
+    PersonalRecord = apps.get_model("training", "PersonalRecord")
+
+    sessions = pd.DataFrame.from_records(
+        TrainingSession.objects.filter(excluded=False)
+        .order_by()
+        .values(*SESSION_FIELDS),
+        columns=SESSION_FIELDS,
+    )
+
+    personal_records = []
+    for (
+        user_id,
+        discipline_id,
+        discipline_name,
+    ), discipline_sessions in sessions.groupby(
+        ["user_id", "discipline_id", "discipline__name"]
+    ):
+        for record, (value, session_id) in calculate_records(
+            discipline_sessions, discipline_name
+        ).items():
+            personal_records.append(
+                PersonalRecord(
+                    user_id=user_id,
+                    discipline_id=discipline_id,
+                    record=record,
+                    value=value,
+                    session_id=session_id,
+                )
+            )
+
+    PersonalRecord.objects.bulk_create(personal_records, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("training", "0023_trainingload"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PersonalRecord",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("record", models.CharField(max_length=50)),
+                ("value", models.FloatField()),
+                (
+                    "discipline",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="training.discipline",
+                    ),
+                ),
+                (
+                    "session",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="training.trainingsession",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["user", "discipline", "record"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="personalrecord",
+            constraint=models.UniqueConstraint(
+                fields=("user", "discipline", "record"), name="unique_personal_record"
+            ),
+        ),
+        migrations.RunPython(fill_personal_records, migrations.RunPython.noop),
+    ]
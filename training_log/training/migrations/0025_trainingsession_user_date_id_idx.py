@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("training", "0024_personalrecord"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="trainingsession",
+            index=models.Index(
+                fields=["user", "-date", "-id"], name="session_user_date_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Q
+
+BATCH_SIZE = 500
+
+
+def copy_tracks(apps, schema_editor):
+    TrainingSession = apps.get_model("training", "TrainingSession")
+    SessionTrack = apps.get_model("training", "SessionTrack")
+
+    sessions = (
+        TrainingSession.objects.filter(
+            Q(polyline__isnull=False) | Q(summary_polyline__isnull=False)
+        )
+        .order_by("id")
+        .values_list("id", "polyline", "summary_polyline")
+    )
+
+    last_id = 0
+    while batch := list(sessions.filter(id__gt=last_id)[:BATCH_SIZE]):
+        SessionTrack.objects.bulk_create(
+            [
+                SessionTrack(
+                    session_id=session_id,
+                    polyline=polyline,
+                    summary_polyline=summary_polyline,
+                )
+                for session_id, polyline, summary_polyline in batch
+            ]
+        )
+        last_id = batch[-1][0]
+
+
+def copy_tracks_back(apps, schema_editor):
+    TrainingSession = apps.get_model("training", "TrainingSession")
+    SessionTrack = apps.get_model("training", "SessionTrack")
+
+    tracks = SessionTrack.objects.order_by("session_id")
+
+    last_id = 0
+    while batch := list(tracks.filter(session_id__gt=last_id)[:BATCH_SIZE]):
+        TrainingSession.objects.bulk_update(
+            [
+                TrainingSession(
+                    id=track.session_id,
+                    polyline=track.polyline,
+                    summary_polyline=track.summary_polyline,
+                )
+                for track in batch
+            ],
+            ["polyline", "summary_polyline"],
+        )
+        last_id = batch[-1].session_id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("training", "0025_trainingsession_user_date_id_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SessionTrack",
+            fields=[
+                (
+                    "session",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="track",
+                        serialize=False,
+                        to="training.trainingsession",
+                    ),
+                ),
+                ("polyline", models.CharField(blank=True, null=True)),
+                ("summary_polyline", models.CharField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(copy_tracks, copy_tracks_back),
+        migrations.RemoveField(
+            model_name="trainingsession",
+            name="polyline",
+        ),
+        migrations.RemoveField(
+            model_name="trainingsession",
+            name="summary_polyline",
+        ),
+    ]
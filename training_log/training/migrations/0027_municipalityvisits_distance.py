@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-17 05:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("training", "0026_sessiontrack"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="municipalityvisits",
+            name="distance",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="municipalityvisits",
+            name="entry_order",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="municipalityvisits",
+            name="moving_duration",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
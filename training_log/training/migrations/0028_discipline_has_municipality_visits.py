@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-17 05:14
+
+from django.db import migrations, models
+
+
+def fill_has_municipality_visits(apps, schema_editor):
+    Discipline = apps.get_model("training", "Discipline")
+    MunicipalityVisits = apps.get_model("training", "MunicipalityVisits")
+
+    Discipline.objects.update(
+        has_municipality_visits=models.Exists(
+            MunicipalityVisits.objects.filter(
+                training_session__discipline=models.OuterRef("pk")
+            )
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("training", "0027_municipalityvisits_distance"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="discipline",
+            name="has_municipality_visits",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(fill_has_municipality_visits, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,117 @@
+# Generated by Django 4.2.30 on 2026-10-17 05:17
+
+import django.db.models.deletion
+import numpy as np
+from django.conf import settings
+from django.db import migrations, models
+
+
+def to_bitset(municipality_ids):
+    """The bitsets as they were when this migration was written, 64 bit little
+    endian words with the bit of every municipality id set."""
+    municipality_ids = np.asarray(list(municipality_ids), dtype=np.int64)
+    bitset = np.zeros(municipality_ids.max(initial=-1) // 64 + 1, dtype="<u8")
+    np.bitwise_or.at(
+        bitset,
+        municipality_ids // 64,
+        np.left_shift(np.uint64(1), (municipality_ids % 64).astype(np.uint64)),
+    )
+    return bitset
+
+
+def fill_visited_municipalities(apps, schema_editor):
+    Municipality = apps.get_model("training", "Municipality")
+    MunicipalityVisits = apps.get_model("training", "MunicipalityVisits")
+    VisitedMunicipalities = apps.get_model("training", "VisitedMunicipalities")
+
+    visits = (
+        MunicipalityVisits.objects.order_by()
+        .values_list(
+            "training_session__user_id",
+            "training_session__discipline_id",
+            "municipality",
+        )
+        .distinct()
+    )
+    Municipality.objects.bulk_create(
+        [Municipality(name=name) for name in {visit[2] for visit in visits}]
+    )
+    municipality_ids = dict(Municipality.objects.values_list("name", "id"))
+
+    visited = {}
+    for user_id, discipline_id, municipality in visits:
+        visited.setdefault((user_id, discipline_id), []).append(
+            municipality_ids[municipality]
+        )
+    VisitedMunicipalities.objects.bulk_create(
+        [
+            VisitedMunicipalities(
+                user_id=user_id,
+                discipline_id=discipline_id,
+                bits=to_bitset(ids).tobytes(),
+            )
+            for (user_id, discipline_id), ids in visited.items()
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("training", "0028_discipline_has_municipality_visits"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Municipality",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=200, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="VisitedMunicipalities",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("bits", models.BinaryField(default=b"")),
+                (
+                    "discipline",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="training.discipline",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="visitedmunicipalities",
+            constraint=models.UniqueConstraint(
+                fields=("user", "discipline"), name="unique_visited_municipalities"
+            ),
+        ),
+        migrations.RunPython(fill_visited_municipalities, migrations.RunPython.noop),
+    ]
@@ -18,6 +18,8 @@ class Discipline(models.Model):
         choices=SpeedType.choices,
         default=SpeedType.KILOMETER_PER_HOUR,
     )
+    # Maintained as municipality visits are written, for the training map filter.
+    has_municipality_visits = models.BooleanField(default=False)
 
     def __str__(self):
         """Return a string representation of the model."""
@@ -53,14 +55,17 @@ class TrainingSession(models.Model):
     max_hr = models.FloatField(blank=True, null=True)
     average_speed = models.FloatField(blank=True, null=True)
     max_speed = models.FloatField(blank=True, null=True)
-    polyline = models.CharField(blank=True, null=True)
-    summary_polyline = models.CharField(blank=True, null=True)
     strava_updated = models.DateTimeField(blank=True, null=True)
     strava_id = models.BigIntegerField(blank=True, null=True)
     excluded = models.BooleanField(default=False)
 
     class Meta:
         ordering = ["-date"]
+        indexes = [
+            models.Index(
+                fields=["user", "-date", "-id"], name="session_user_date_id_idx"
+            )
+        ]
 
     @property
     def formatted_duration(self):
@@ -157,6 +162,24 @@ class TrainingSession(models.Model):
         )
 
 
+class SessionTrack(models.Model):
+    """The GPS track of a training session. Kept apart from the session, so the
+    large polylines are only loaded where a map is needed."""
+
+    session = models.OneToOneField(
+        TrainingSession,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="track",
+    )
+    polyline = models.CharField(blank=True, null=True)
+    summary_polyline = models.CharField(blank=True, null=True)
+
+    def __str__(self):
+        """Return a string representation of the model."""
+        return f"Track of {self.session}"
+
+
 class SessionZones(models.Model):
     """The zones of a training session."""
 
@@ -229,6 +252,10 @@ class MunicipalityVisits(models.Model):
 
     municipality = models.CharField()
     training_session = models.ForeignKey(TrainingSession, on_delete=models.CASCADE)
+    # Only known for visits found by intersecting the track with the municipality.
+    distance = models.FloatField(null=True, blank=True)
+    moving_duration = models.IntegerField(null=True, blank=True)
+    entry_order = models.PositiveIntegerField(null=True, blank=True)
 
     def __str__(self):
         """Return a string representation of the model."""
@@ -237,3 +264,134 @@ class MunicipalityVisits(models.Model):
             f"visited {self.municipality} - "
             f"{self.training_session.discipline} on {self.training_session.date} "
         )
+
+
+class Municipality(models.Model):
+    """A municipality, of which the id is its bit in the visited municipalities
+    bitsets."""
+
+    name = models.CharField(max_length=200, unique=True)
+
+    def __str__(self):
+        """Return a string representation of the model."""
+        return self.name
+
+
+class VisitedMunicipalities(models.Model):
+    """The municipalities visited by a user for a discipline, as a bitset of
+    little-endian 64 bit words over the municipality ids."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    discipline = models.ForeignKey(Discipline, on_delete=models.CASCADE)
+    bits = models.BinaryField(default=b"")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "discipline"], name="unique_visited_municipalities"
+            )
+        ]
+
+    def __str__(self):
+        """Return a string representation of the model."""
+        return f"{self.user.username.capitalize()} - {self.discipline}"
+
+
+class DailyTrainingRollup(models.Model):
+    """The totals of all included training sessions of a user for a discipline
+    on a single day."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    discipline = models.ForeignKey(Discipline, on_delete=models.CASCADE)
+    date = models.DateField()
+    moving_duration = models.IntegerField(default=0)
+    total_duration = models.IntegerField(default=0)
+    distance = models.FloatField(default=0)
+    session_count = models.IntegerField(default=0)
+    max_moving_duration = models.IntegerField(blank=True, null=True)
+    max_distance = models.FloatField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["-date"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "discipline", "date"], name="unique_daily_rollup"
+            )
+        ]
+
+    def __str__(self):
+        """Return a string representation of the model."""
+        return (
+            f"{self.user.username.capitalize()} did {self.session_count} "
+            f"{self.discipline} session(s) on {self.date}"
+        )
+
+
+class TrainingLoad(models.Model):
+    """The training load of a user on a day with the resulting fitness (CTL) and
+    fatigue (ATL). Stored so that new sessions only need a recalculation from
+    their date forward."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    date = models.DateField()
+    load = models.FloatField(default=0)
+    fitness = models.FloatField(default=0)
+    fatigue = models.FloatField(default=0)
+
+    class Meta:
+        ordering = ["date"]
+        constraints = [
+            models.UniqueConstraint(fields=["user", "date"], name="unique_daily_load")
+        ]
+
+    @property
+    def form(self):
+        """The form (TSB) is the difference between fitness and fatigue."""
+        return self.fitness - self.fatigue
+
+    def __str__(self):
+        """Return a string representation of the model."""
+        return (
+            f"{self.user.username.capitalize()} on {self.date}: "
+            f"fitness {self.fitness:.1f}, fatigue {self.fatigue:.1f}"
+        )
+
+
+class PersonalRecord(models.Model):
+    """The best included training session of a user for a discipline on a single
+    record, like the longest time or the fastest 10 km."""
+
+    LONGEST_TIME = "longest_time"
+    LONGEST_DISTANCE = "longest_distance"
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    discipline = models.ForeignKey(Discipline, on_delete=models.CASCADE)
+    record = models.CharField(max_length=50)
+    value = models.FloatField()
+    session = models.ForeignKey(TrainingSession, on_delete=models.CASCADE)
+
+    class Meta:
+        ordering = ["user", "discipline", "record"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "discipline", "record"], name="unique_personal_record"
+            )
+        ]
+
+    @property
+    def formatted_value(self):
+        """Format the value based on the kind of record."""
+        match self.record:
+            case self.LONGEST_TIME:
+                return self.session.formatted_duration
+            case self.LONGEST_DISTANCE:
+                return self.session.formatted_distance
+            case _:
+                return TrainingSession.formatted_speed(self.value, self.discipline)
+
+    def __str__(self):
+        """Return a string representation of the model."""
+        return (
+            f"{self.user.username.capitalize()} {self.discipline} "
+            f"{self.record}: {self.value:.2f}"
+        )
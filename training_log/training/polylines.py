@@ -0,0 +1,127 @@
+import numpy as np
+
+PRECISION = 5
+CHUNK_BITS = 5
+CHUNK_MASK = 0x1F
+CONTINUATION = 0x20
+OFFSET = 63
+# A coordinate of at most 180 degrees with five decimals needs six chunks.
+START_LENGTH = 14
+
+
+def decode(polyline_string, precision=PRECISION):
+    """Decode an encoded polyline into coordinates.
+
+    :param polyline_string: A polyline in the encoded polyline algorithm format
+    :param precision: The number of decimals of the coordinates (Default value =
+    PRECISION)
+    :returns: A contiguous float64 array of (latitude, longitude) rows
+
+    """
+    if not polyline_string:
+        return np.empty((0, 2))
+
+    chunks = np.frombuffer(polyline_string.encode(), dtype=np.uint8).astype(np.int64)
+    chunks -= OFFSET
+    if chunks.min() < 0 or chunks.max() > CHUNK_MASK | CONTINUATION:
+        raise ValueError("Polyline contains invalid characters")
+
+    # Every value is a run of chunks ending with a chunk without continuation bit.
+    ends = chunks < CONTINUATION
+    if not ends[-1]:
+        raise ValueError("Polyline ends in the middle of a value")
+    starts = np.flatnonzero(np.concatenate([[True], ends[:-1]]))
+
+    value_indices = np.cumsum(np.concatenate([[0], ends[:-1]]))
+    shifts = CHUNK_BITS * (np.arange(len(chunks)) - starts[value_indices])
+    values = np.add.reduceat((chunks & CHUNK_MASK) << shifts, starts)
+    if len(values) % 2:
+        raise ValueError("Polyline has a latitude without longitude")
+
+    deltas = np.where(values & 1, ~(values >> 1), values >> 1)
+    return np.cumsum(deltas.reshape(-1, 2), axis=0) / 10**precision
+
+
+def decode_start(polyline_string, precision=PRECISION):
+    """Decode only the first coordinate of an encoded polyline.
+
+    :param polyline_string: A polyline, or the first START_LENGTH characters of
+    one
+    :param precision: The number of decimals of the coordinates (Default value =
+    PRECISION)
+    :returns: The (latitude, longitude) of the first point
+
+    """
+    chunks = np.frombuffer(polyline_string[:START_LENGTH].encode(), dtype=np.uint8)
+    ends = np.flatnonzero(chunks.astype(np.int64) - OFFSET < CONTINUATION)
+    if len(ends) < 2:
+        raise ValueError("Polyline has no complete coordinate")
+
+    return decode(polyline_string[: ends[1] + 1], precision)[0]
+
+
+def encode(coordinates, precision=PRECISION):
+    """Encode coordinates into a polyline.
+
+    :param coordinates: A sequence or array of (latitude, longitude) pairs
+    :param precision: The number of decimals of the coordinates (Default value =
+    PRECISION)
+
+    """
+    coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+    integers = np.round(coordinates * 10**precision).astype(np.int64)
+    deltas = np.diff(integers, axis=0, prepend=0).ravel()
+
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    # Split every value in chunks of five bits, of which only the first and
+    # the ones with bits left are used.
+    chunk_count = max(int(values.max(initial=0)).bit_length() // CHUNK_BITS + 1, 1)
+    shifts = CHUNK_BITS * np.arange(chunk_count)
+    remaining = values[:, np.newaxis] >> shifts
+    used = (remaining > 0) | (shifts == 0)
+    chunks = remaining & CHUNK_MASK
+    chunks[:, :-1] |= np.where(used[:, 1:], CONTINUATION, 0)
+
+    return (chunks[used] + OFFSET).astype(np.uint8).tobytes().decode()
+
+
+def simplify(coordinates, tolerance):
+    """Simplify a line with the Douglas-Peucker algorithm.
+
+    :param coordinates: An array of (latitude, longitude) rows
+    :param tolerance: The maximum distance of a removed point to the simplified
+    line, in degrees
+    :returns: The coordinates of the points that are kept
+
+    """
+    coordinates = np.asarray(coordinates, dtype=float)
+    if len(coordinates) < 3:
+        return coordinates
+
+    keep = np.zeros(len(coordinates), dtype=bool)
+    keep[[0, -1]] = True
+    segments = [(0, len(coordinates) - 1)]
+    while segments:
+        start, end = segments.pop()
+        if end - start < 2:
+            continue
+
+        points = coordinates[start + 1 : end] - coordinates[start]
+        direction = coordinates[end] - coordinates[start]
+        length = np.hypot(*direction)
+        if length == 0:
+            distances = np.hypot(points[:, 0], points[:, 1])
+        else:
+            distances = (
+                np.abs(points[:, 0] * direction[1] - points[:, 1] * direction[0])
+                / length
+            )
+
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            middle = start + 1 + farthest
+            keep[middle] = True
+            segments.extend([(start, middle), (middle, end)])
+
+    return coordinates[keep]
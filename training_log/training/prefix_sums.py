@@ -0,0 +1,160 @@
+import logging
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import DailyTrainingRollup
+
+logger = logging.getLogger(__name__)
+
+PREFIX_SUMS_CACHE_KEY = "training:prefix_sums:{user_id}"
+PREFIX_SUMS_TIMEOUT = 24 * 60 * 60
+PREFIX_SUM_METRICS = ["moving_duration", "total_duration", "distance", "session_count"]
+
+
+class PrefixSums:
+    """Cumulative daily totals of a user per discipline. Row i holds the totals of
+    all days before start_date + i, so the total over any date range is the
+    difference of two rows."""
+
+    def __init__(self, start_date, discipline_ids, sums):
+        self.start_date = start_date
+        self.discipline_ids = list(discipline_ids)
+        self.sums = sums
+
+    @classmethod
+    def from_daily_totals(cls, daily_totals, start_date, end_date):
+        """Create the prefix sums from a dataframe with daily totals.
+
+        :param daily_totals: Dataframe with a date, discipline id and metric columns
+        :param start_date: The first day of the prefix sums
+        :param end_date: The last day of the prefix sums
+
+        """
+        discipline_ids = sorted(int(i) for i in daily_totals["discipline_id"].unique())
+        day_count = (end_date - start_date).days + 1
+
+        days = (
+            pd.to_datetime(daily_totals["date"]) - pd.Timestamp(start_date)
+        ).dt.days.to_numpy(dtype=int)
+        disciplines = np.searchsorted(
+            discipline_ids, daily_totals["discipline_id"].to_numpy(dtype=int)
+        )
+
+        daily = np.zeros((day_count, len(discipline_ids), len(PREFIX_SUM_METRICS)))
+        np.add.at(
+            daily,
+            (days, disciplines),
+            daily_totals[PREFIX_SUM_METRICS].to_numpy(dtype=float),
+        )
+
+        sums = np.zeros((day_count + 1, *daily.shape[1:]))
+        np.cumsum(daily, axis=0, out=sums[1:])
+        return cls(start_date, discipline_ids, sums)
+
+    @property
+    def end_date(self):
+        """The last day covered by the prefix sums."""
+        return self.start_date + timedelta(days=len(self.sums) - 2)
+
+    def get_row(self, day):
+        """Get the row with the totals of all days before a day."""
+        return int(np.clip((day - self.start_date).days, 0, len(self.sums) - 1))
+
+    def total(self, start_date, end_date, metric, discipline_ids=None):
+        """Get the total of a metric over a date range (inclusive).
+
+        :param metric: One of PREFIX_SUM_METRICS
+        :param discipline_ids: The disciplines to include, all if None
+
+        """
+        start_row = self.get_row(start_date)
+        end_row = self.get_row(end_date + timedelta(days=1))
+        if end_row <= start_row:
+            return 0
+
+        metric_index = PREFIX_SUM_METRICS.index(metric)
+        totals = (
+            self.sums[end_row, :, metric_index] - self.sums[start_row, :, metric_index]
+        )
+
+        if discipline_ids is None:
+            return totals.sum()
+
+        return sum(
+            totals[self.discipline_ids.index(discipline_id)]
+            for discipline_id in discipline_ids
+            if discipline_id in self.discipline_ids
+        )
+
+
+def build_prefix_sums(user_ids, start_date):
+    """Build the prefix sums of users from the daily rollup in one query.
+
+    :returns: A dictionary with the prefix sums per user id
+
+    """
+    daily_totals = pd.DataFrame.from_records(
+        DailyTrainingRollup.objects.filter(user_id__in=user_ids)
+        .order_by()
+        .values("user_id", "discipline_id", "date", *PREFIX_SUM_METRICS),
+        columns=["user_id", "discipline_id", "date", *PREFIX_SUM_METRICS],
+    )
+    end_date = max([date.today(), *daily_totals["date"]])
+
+    prefix_sums = {}
+    for user_id in user_ids:
+        user_totals = daily_totals.loc[daily_totals["user_id"] == user_id]
+        user_start_date = min([start_date, *user_totals["date"]])
+        prefix_sums[user_id] = PrefixSums.from_daily_totals(
+            user_totals, user_start_date, end_date
+        )
+
+    return prefix_sums
+
+
+def get_prefix_sums(user_ids, start_date):
+    """Get the prefix sums of users from the cache, building the missing ones.
+
+    :param start_date: The earliest day the prefix sums need to start at
+
+    """
+    keys = {
+        user_id: PREFIX_SUMS_CACHE_KEY.format(user_id=user_id) for user_id in user_ids
+    }
+    cached = cache.get_many(keys.values())
+
+    prefix_sums = {
+        user_id: cached[key]
+        for user_id, key in keys.items()
+        if key in cached and cached[key].start_date <= start_date
+    }
+
+    missing_user_ids = [user_id for user_id in user_ids if user_id not in prefix_sums]
+    if missing_user_ids:
+        built = build_prefix_sums(missing_user_ids, start_date)
+        cache.set_many(
+            {keys[user_id]: built[user_id] for user_id in missing_user_ids},
+            timeout=PREFIX_SUMS_TIMEOUT,
+        )
+        prefix_sums.update(built)
+        logger.info(f"Built prefix sums for {len(missing_user_ids)} users")
+
+    return prefix_sums
+
+
+def invalidate_prefix_sums(user_ids):
+    """Remove the cached prefix sums of users, so they are rebuilt when needed."""
+    cache.delete_many(
+        [PREFIX_SUMS_CACHE_KEY.format(user_id=user_id) for user_id in user_ids]
+    )
+
+
+def invalidate_prefix_sums_on_commit(user_ids):
+    """Remove the cached prefix sums of users once the current transaction
+    commits, so they are rebuilt from the committed rollup."""
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: invalidate_prefix_sums(user_ids))
@@ -0,0 +1,205 @@
+import logging
+from typing import NamedTuple
+
+import pandas as pd
+from django.db import transaction
+
+from .models import Discipline, PersonalRecord, TrainingSession
+from .stats import DEFAULT_START_DATE
+
+logger = logging.getLogger(__name__)
+
+
+class RecordBand(NamedTuple):
+    """A distance band with a fastest average speed record. Every session that
+    is at least as long as the band competes for the record."""
+
+    record: str
+    name: str
+    discipline: str
+    distance: float
+
+
+RECORD_BANDS = [
+    RecordBand("fastest_1k", "Fastest 1 km", "Swimming", 1000),
+    RecordBand("fastest_1.9k", "Fastest 1.9 km", "Swimming", 1900),
+    RecordBand("fastest_3.8k", "Fastest 3.8 km", "Swimming", 3800),
+    RecordBand("fastest_40k", "Fastest 40 km", "Cycling", 40000),
+    RecordBand("fastest_90k", "Fastest 90 km", "Cycling", 90000),
+    RecordBand("fastest_180k", "Fastest 180 km", "Cycling", 180000),
+    RecordBand("fastest_5k", "Fastest 5 km", "Running", 5000),
+    RecordBand("fastest_10k", "Fastest 10 km", "Running", 10000),
+    RecordBand("fastest_half_marathon", "Fastest half marathon", "Running", 21097.5),
+    RecordBand("fastest_marathon", "Fastest marathon", "Running", 42195),
+]
+RECORD_NAMES = {
+    PersonalRecord.LONGEST_TIME: "Longest time",
+    PersonalRecord.LONGEST_DISTANCE: "Longest distance",
+    **{band.record: band.name for band in RECORD_BANDS},
+}
+RECORD_SESSION_FIELDS = ["id", "date", "moving_duration", "distance"]
+
+
+def get_record_bands(discipline_name):
+    """Get the distance bands of a discipline."""
+    return [band for band in RECORD_BANDS if band.discipline == discipline_name]
+
+
+def get_session_values(session: TrainingSession):
+    """Get the value a session has for every record it competes for.
+
+    :returns: A dictionary with the value per record
+
+    """
+    values = {}
+    if session.moving_duration:
+        values[PersonalRecord.LONGEST_TIME] = session.moving_duration
+    if session.distance:
+        values[PersonalRecord.LONGEST_DISTANCE] = session.distance
+
+    if session.moving_duration and session.distance:
+        for band in get_record_bands(session.discipline.name):
+            if session.distance >= band.distance:
+                values[band.record] = session.distance / session.moving_duration
+
+    return values
+
+
+def calculate_records(sessions, discipline_name):
+    """Find the best session for every record. Like the other all time stats, only
+    sessions from DEFAULT_START_DATE count.
+
+    :param sessions: Dataframe with the id, date, moving duration and distance of
+    the sessions of a user for a discipline
+    :param discipline_name: The name of the discipline of the sessions
+    :returns: A dictionary with the value and session id per record
+
+    """
+    sessions = sessions.loc[pd.to_datetime(sessions["date"]) >= DEFAULT_START_DATE]
+    sessions = sessions.astype({"moving_duration": float, "distance": float})
+    sessions = sessions.assign(
+        speed=sessions["distance"]
+        / sessions["moving_duration"].where(sessions["moving_duration"] > 0)
+    )
+
+    candidates = {
+        PersonalRecord.LONGEST_TIME: sessions.loc[sessions["moving_duration"] > 0],
+        PersonalRecord.LONGEST_DISTANCE: sessions.loc[sessions["distance"] > 0],
+    }
+    for band in get_record_bands(discipline_name):
+        candidates[band.record] = sessions.loc[
+            (sessions["distance"] >= band.distance) & sessions["speed"].notna()
+        ]
+
+    columns = {
+        PersonalRecord.LONGEST_TIME: "moving_duration",
+        PersonalRecord.LONGEST_DISTANCE: "distance",
+    }
+
+    records = {}
+    for record, record_sessions in candidates.items():
+        if record_sessions.empty:
+            continue
+
+        column = columns.get(record, "speed")
+        # Sorting by id keeps the earliest session when values are equal.
+        record_sessions = record_sessions.sort_values("id")
+        best = record_sessions.loc[record_sessions[column].idxmax()]
+        records[record] = (float(best[column]), int(best["id"]))
+
+    return records
+
+
+def update_records(session: TrainingSession):
+    """Store a session as record holder of every record it beats."""
+    date = TrainingSession._meta.get_field("date").to_python(session.date)
+    if session.excluded or date < DEFAULT_START_DATE.date():
+        return
+
+    for record, value in get_session_values(session).items():
+        beaten = PersonalRecord.objects.filter(
+            user_id=session.user_id,
+            discipline_id=session.discipline_id,
+            record=record,
+            value__lt=value,
+        ).update(value=value, session=session)
+
+        if not beaten:
+            PersonalRecord.objects.get_or_create(
+                user_id=session.user_id,
+                discipline_id=session.discipline_id,
+                record=record,
+                defaults={"value": value, "session": session},
+            )
+
+
+def rebuild_records(user_id, discipline_id):
+    """Recalculate all records of a user for a discipline from the sessions."""
+    sessions = TrainingSession.objects.filter(
+        user_id=user_id, discipline_id=discipline_id, excluded=False
+    ).order_by()
+    records = calculate_records(
+        pd.DataFrame.from_records(
+            sessions.values(*RECORD_SESSION_FIELDS), columns=RECORD_SESSION_FIELDS
+        ),
+        Discipline.objects.get(id=discipline_id).name,
+    )
+
+    with transaction.atomic():
+        PersonalRecord.objects.filter(
+            user_id=user_id, discipline_id=discipline_id
+        ).delete()
+        PersonalRecord.objects.bulk_create(
+            [
+                PersonalRecord(
+                    user_id=user_id,
+                    discipline_id=discipline_id,
+                    record=record,
+                    value=value,
+                    session_id=session_id,
+                )
+                for record, (value, session_id) in records.items()
+            ]
+        )
+
+    logger.info(
+        f"Rebuilt {len(records)} records for user {user_id}, "
+        f"discipline {discipline_id}"
+    )
+
+
+def get_records_table(users):
+    """Get the records of all users as rows of a table with a column per user,
+    in a single query.
+
+    :returns: A dictionary with per record name a list of the formatted value and
+    session id for every user, or None if the user has no record
+
+    """
+    user_indices = {user.id: index for index, user in enumerate(users)}
+    personal_records = PersonalRecord.objects.filter(
+        user_id__in=user_indices, record__in=RECORD_NAMES
+    ).select_related("discipline", "session")
+
+    record_order = list(RECORD_NAMES)
+    personal_records = sorted(
+        personal_records,
+        key=lambda personal_record: (
+            personal_record.discipline.name,
+            record_order.index(personal_record.record),
+        ),
+    )
+
+    table = {}
+    for personal_record in personal_records:
+        name = (
+            f"{personal_record.discipline.name} - "
+            f"{RECORD_NAMES[personal_record.record]}"
+        )
+        row = table.setdefault(name, [None] * len(user_indices))
+        row[user_indices[personal_record.user_id]] = (
+            personal_record.formatted_value,
+            personal_record.session_id,
+        )
+
+    return table
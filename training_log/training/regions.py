@@ -0,0 +1,193 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Windows are read in whole tiles of degrees, so nearby tracks share them.
+TILE_SIZE = 0.5
+WINDOW_CACHE_SIZE = 16
+
+
+class RegionLevel(NamedTuple):
+    """A level of regions in a GeoPackage, like the countries or provinces of a
+    dataset.
+
+    :param parent_field: The field with the name of the region of the previous
+    level that contains a region, None if the level is not nested
+
+    """
+
+    name: str
+    path: str
+    name_field: str
+    parent_field: str | None = None
+    layer: str | None = None
+
+
+def get_window(bounds, tile_size=TILE_SIZE):
+    """Get the bounds of the tiles that cover bounds, which is at least one tile
+    for a single point."""
+    min_lon, min_lat, max_lon, max_lat = bounds
+    return (
+        float(np.floor(min_lon / tile_size) * tile_size),
+        float(np.floor(min_lat / tile_size) * tile_size),
+        float((np.floor(max_lon / tile_size) + 1) * tile_size),
+        float((np.floor(max_lat / tile_size) + 1) * tile_size),
+    )
+
+
+def get_parent_filter(parent_field, parent_names):
+    """Get an SQL filter that only selects the regions within parent regions."""
+    quoted_names = ", ".join(
+        "'" + name.replace("'", "''") + "'" for name in sorted(parent_names)
+    )
+    return f'"{parent_field}" IN ({quoted_names})'
+
+
+class RegionDataset:
+    """Hierarchical levels of regions, from coarse to fine. Tracks are looked up
+    one level at a time, so the finer levels are only read for the regions a
+    track passes through. Only windows around tracks are read from the
+    GeoPackages and a limited number of them is kept in memory."""
+
+    def __init__(self, name, levels, window_cache_size=WINDOW_CACHE_SIZE):
+        self.name = name
+        self.levels = list(levels)
+        self.window_cache_size = window_cache_size
+        self._windows = OrderedDict()
+        self._windows_lock = threading.Lock()
+
+    def read_window(self, level, window, parent_names=None):
+        """Read the regions of a level within a window.
+
+        :param level: The region level to read
+        :param window: The (min_lon, min_lat, max_lon, max_lat) bounds to read
+        :param parent_names: Only read the regions within these regions of the
+        previous level, if the level is nested (Default value = None)
+        :returns: A GeoDataFrame with the name, parent name and geometry of the
+        regions
+
+        """
+        where = None
+        columns = [level.name_field]
+        if level.parent_field:
+            columns.append(level.parent_field)
+            if parent_names is not None:
+                where = get_parent_filter(level.parent_field, parent_names)
+
+        logger.info(f"Reading the {level.name} regions of {self.name} in {window}")
+        regions = gpd.read_file(
+            level.path,
+            layer=level.layer,
+            bbox=window,
+            where=where,
+            columns=columns,
+        )
+        if regions.crs is not None and not regions.crs.equals(4326):
+            regions = regions.to_crs(4326)
+
+        parents = None
+        if level.parent_field:
+            parents = regions[level.parent_field].to_numpy(dtype=object)
+        return gpd.GeoDataFrame(
+            {
+                "name": regions[level.name_field].to_numpy(dtype=object),
+                "parent": parents,
+            },
+            geometry=regions.geometry.to_numpy(),
+            crs=4326,
+        )
+
+    def get_window_regions(self, level, window, parent_names=None):
+        """Get the regions of a level within a window, from the window cache when
+        it was read recently."""
+        key = (
+            level,
+            window,
+            None if parent_names is None else tuple(sorted(parent_names)),
+        )
+
+        with self._windows_lock:
+            if key in self._windows:
+                self._windows.move_to_end(key)
+                return self._windows[key]
+
+        regions = self.read_window(level, window, parent_names)
+
+        with self._windows_lock:
+            self._windows[key] = regions
+            while len(self._windows) > self.window_cache_size:
+                self._windows.popitem(last=False)
+
+        return regions
+
+    def get_regions(self, geometry):
+        """Get the regions of the finest level a geometry intersects, going from
+        the coarsest level to the finest. Regions without finer regions, like a
+        country without provinces in the dataset, are kept from a coarser level.
+
+        :param geometry: A shapely geometry in longitude and latitude
+        :returns: A GeoDataFrame with the name and geometry of the regions
+
+        """
+        window = get_window(shapely.bounds(geometry))
+        regions = None
+        for level in self.levels:
+            parent_names = None if regions is None else set(regions["name"])
+            level_regions = self.get_window_regions(level, window, parent_names)
+            level_regions = level_regions.iloc[
+                level_regions.sindex.query(geometry, predicate="intersects")
+            ]
+
+            if regions is not None:
+                if level.parent_field:
+                    kept = ~regions["name"].isin(level_regions["parent"])
+                else:
+                    kept = np.full(len(regions), level_regions.empty)
+                if kept.any():
+                    level_regions = pd.concat([level_regions, regions[kept]])
+
+            regions = level_regions
+            if regions.empty:
+                break
+
+        return regions.reset_index(drop=True)
+
+
+def create_dataset(name, levels):
+    """Create a region dataset from its settings.
+
+    :param name: The name of the dataset
+    :param levels: A list of dictionaries with the fields of every region level,
+    from coarse to fine
+
+    """
+    return RegionDataset(name, [RegionLevel(**level) for level in levels])
+
+
+_datasets = None
+_datasets_lock = threading.Lock()
+
+
+def get_datasets():
+    """Get the region datasets of the REGION_DATASETS setting, used for tracks
+    outside the regional map. It maps dataset names to their levels."""
+    global _datasets
+
+    if _datasets is None:
+        with _datasets_lock:
+            if _datasets is None:
+                _datasets = [
+                    create_dataset(name, levels)
+                    for name, levels in getattr(settings, "REGION_DATASETS", {}).items()
+                ]
+
+    return _datasets
@@ -0,0 +1,129 @@
+import logging
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, Max, Sum, Value
+from django.db.models.functions import Coalesce
+
+from . import prefix_sums, stats
+from .models import DailyTrainingRollup, TrainingSession
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_KEY_FIELDS = ["user_id", "discipline_id", "date"]
+ROLLUP_VALUE_FIELDS = [
+    "moving_duration",
+    "total_duration",
+    "distance",
+    "session_count",
+    "max_moving_duration",
+    "max_distance",
+]
+
+
+def get_rollup_aggregates():
+    """Get the aggregates that turn training sessions into rollup values. The
+    aggregates are prefixed as they can't share a name with a session field."""
+    return {
+        "rollup_moving_duration": Coalesce(Sum("moving_duration"), Value(0)),
+        "rollup_total_duration": Coalesce(Sum("total_duration"), Value(0)),
+        "rollup_distance": Coalesce(Sum("distance"), Value(0.0)),
+        "rollup_session_count": Count("id"),
+        "rollup_max_moving_duration": Max("moving_duration"),
+        "rollup_max_distance": Max("distance"),
+    }
+
+
+def get_rollup_values(aggregates):
+    """Convert the result of the rollup aggregates to rollup field values."""
+    return {field: aggregates[f"rollup_{field}"] for field in ROLLUP_VALUE_FIELDS}
+
+
+def get_included_sessions():
+    """Get the training sessions that are counted in the rollup."""
+    return TrainingSession.objects.filter(excluded=False).order_by()
+
+
+def refresh_day(user_id, discipline_id, date):
+    """Recalculate the rollup of a user for a discipline on a single day.
+
+    :returns: The new rollup values of the day
+
+    """
+    totals = get_rollup_values(
+        get_included_sessions()
+        .filter(user_id=user_id, discipline_id=discipline_id, date=date)
+        .aggregate(**get_rollup_aggregates())
+    )
+
+    if totals["session_count"] == 0:
+        DailyTrainingRollup.objects.filter(
+            user_id=user_id, discipline_id=discipline_id, date=date
+        ).delete()
+        return totals
+
+    DailyTrainingRollup.objects.update_or_create(
+        user_id=user_id, discipline_id=discipline_id, date=date, defaults=totals
+    )
+    return totals
+
+
+def calculate_rollup():
+    """Calculate the expected rollup values from all training sessions.
+
+    :returns: A dictionary with the rollup values per (user, discipline, date)
+
+    """
+    rows = (
+        get_included_sessions()
+        .values(*ROLLUP_KEY_FIELDS)
+        .annotate(**get_rollup_aggregates())
+    )
+
+    return {
+        tuple(row[field] for field in ROLLUP_KEY_FIELDS): get_rollup_values(row)
+        for row in rows
+    }
+
+
+def rebuild():
+    """Rebuild the complete rollup from the training sessions."""
+    expected = calculate_rollup()
+
+    with transaction.atomic():
+        DailyTrainingRollup.objects.all().delete()
+        DailyTrainingRollup.objects.bulk_create(
+            [
+                DailyTrainingRollup(**dict(zip(ROLLUP_KEY_FIELDS, key)), **values)
+                for key, values in expected.items()
+            ],
+            batch_size=1000,
+        )
+
+    user_ids = list(User.objects.values_list("id", flat=True))
+    prefix_sums.invalidate_prefix_sums(user_ids)
+    stats.clear_race_days(user_ids)
+    logger.info(f"Rebuilt training rollup with {len(expected)} rows")
+    return len(expected)
+
+
+def find_drift():
+    """Compare the stored rollup with the training sessions.
+
+    :returns: A list of (user, discipline, date) keys that are missing, stale
+    or should not exist
+
+    """
+    expected = calculate_rollup()
+    stored = {
+        tuple(row.pop(field) for field in ROLLUP_KEY_FIELDS): row
+        for row in DailyTrainingRollup.objects.order_by().values(
+            *ROLLUP_KEY_FIELDS, *ROLLUP_VALUE_FIELDS
+        )
+    }
+
+    return sorted(
+        key
+        for key in expected.keys() | stored.keys()
+        if expected.get(key) != stored.get(key)
+    )
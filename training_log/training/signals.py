@@ -0,0 +1,203 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import (adjacency, caching, coverage, maps, prefix_sums, records,
+               rollup, stats, training_load)
+from .models import (Discipline, MunicipalityVisits, PersonalRecord,
+                     SessionTrack, TrainingSession, VisitedMunicipalities)
+
+
+def get_rollup_key(session: TrainingSession):
+    """Get the (user, discipline, date) rollup key of a training session."""
+    date = TrainingSession._meta.get_field("date").to_python(session.date)
+    return session.user_id, session.discipline_id, date
+
+
+@receiver(pre_save, sender=TrainingSession)
+def remember_previous_rollup_key(sender, instance, raw=False, **kwargs):
+    """Remember the rollup key as stored before a session is changed."""
+    instance._previous_rollup_key = None
+    if raw or instance.pk is None:
+        return
+
+    previous = (
+        TrainingSession.objects.filter(pk=instance.pk)
+        .values_list(*rollup.ROLLUP_KEY_FIELDS)
+        .first()
+    )
+    instance._previous_rollup_key = previous
+
+
+@receiver(post_save, sender=TrainingSession)
+def update_rollup_on_save(sender, instance, raw=False, **kwargs):
+    """Update the rollup of the day of a created or updated session."""
+    if raw:
+        return
+
+    keys = {get_rollup_key(instance)}
+    previous_key = getattr(instance, "_previous_rollup_key", None)
+    if previous_key:
+        keys.add(previous_key)
+
+    for key in keys:
+        rollup.refresh_day(*key)
+        prefix_sums.invalidate_prefix_sums_on_commit([key[0]])
+        stats.invalidate_race_days_on_commit(key[0], key[2])
+        training_load.invalidate_training_load(key[0], key[2])
+
+
+@receiver(post_delete, sender=TrainingSession)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    """Update the rollup of the day of a deleted session."""
+    user_id, discipline_id, date = get_rollup_key(instance)
+    rollup.refresh_day(user_id, discipline_id, date)
+    prefix_sums.invalidate_prefix_sums_on_commit([user_id])
+    stats.invalidate_race_days_on_commit(user_id, date)
+    training_load.invalidate_training_load(user_id, date)
+
+
+@receiver(post_save, sender=TrainingSession)
+def update_records_on_save(sender, instance, raw=False, **kwargs):
+    """Store a session that beats a record. When a record holder itself changes,
+    for example when it is excluded, its records are rebuilt."""
+    if raw:
+        return
+
+    if not PersonalRecord.objects.filter(session=instance).exists():
+        records.update_records(instance)
+        return
+
+    keys = {(instance.user_id, instance.discipline_id)}
+    previous_key = getattr(instance, "_previous_rollup_key", None)
+    if previous_key:
+        keys.add(previous_key[:2])
+
+    for user_id, discipline_id in keys:
+        records.rebuild_records(user_id, discipline_id)
+
+
+@receiver(pre_delete, sender=TrainingSession)
+def remember_record_holder(sender, instance, **kwargs):
+    """Remember if a session holds a record, as its records are deleted with it."""
+    instance._holds_record = PersonalRecord.objects.filter(session=instance).exists()
+
+
+@receiver(post_delete, sender=TrainingSession)
+def update_records_on_delete(sender, instance, **kwargs):
+    """Rebuild the records of a deleted record holder."""
+    if getattr(instance, "_holds_record", False):
+        records.rebuild_records(instance.user_id, instance.discipline_id)
+
+
+@receiver([post_save, post_delete], sender=TrainingSession)
+def bump_data_version(sender, raw=False, **kwargs):
+    """Invalidate the cached results that depend on the training sessions."""
+    if raw:
+        return
+
+    caching.bump_data_version()
+
+
+@receiver(post_save, sender=User)
+def bump_data_version_on_new_user(sender, created=False, raw=False, **kwargs):
+    """Invalidate the cached results when a user is added to them."""
+    if created and not raw:
+        caching.bump_data_version()
+
+
+@receiver(post_delete, sender=User)
+def bump_data_version_on_deleted_user(sender, **kwargs):
+    """Invalidate the cached results when a user is removed from them."""
+    caching.bump_data_version()
+
+
+@receiver([post_save, post_delete], sender=MunicipalityVisits)
+def bump_visits_version(sender, raw=False, **kwargs):
+    """Invalidate the cached training maps when visits are added or removed."""
+    if raw:
+        return
+
+    caching.bump_data_version(caching.VISITS_VERSION_KEY)
+
+
+@receiver(post_save, sender=MunicipalityVisits)
+def add_discipline_to_facet(sender, instance, raw=False, **kwargs):
+    """Show the discipline of a new visit as filter of the training map."""
+    if raw:
+        return
+
+    Discipline.objects.filter(
+        id=instance.training_session.discipline_id, has_municipality_visits=False
+    ).update(has_municipality_visits=True)
+
+
+@receiver(post_save, sender=MunicipalityVisits)
+def add_visit_to_coverage(sender, instance, raw=False, **kwargs):
+    """Add the municipality of a new visit to the visited municipalities."""
+    if raw:
+        return
+
+    session = instance.training_session
+    coverage.add_visits(session.user_id, session.discipline_id, [instance.municipality])
+
+
+@receiver(post_delete, sender=MunicipalityVisits)
+def update_discipline_facet_on_delete(sender, instance, **kwargs):
+    """Hide the discipline of a removed visit when it has no visits left and
+    recalculate the visited municipalities without it. A session that is deleted
+    with its visits is updated once, when the deletion commits."""
+    session_key = (
+        TrainingSession.objects.filter(pk=instance.training_session_id)
+        .values_list("user_id", "discipline_id")
+        .first()
+    )
+    if session_key is not None:
+        maps.update_removed_visits(*session_key)
+
+
+@receiver(post_delete, sender=TrainingSession)
+def update_coverage_on_delete(sender, instance, **kwargs):
+    """Recalculate the visited municipalities when a session is removed, as its
+    visits are removed with it."""
+    if VisitedMunicipalities.objects.filter(
+        user_id=instance.user_id, discipline_id=instance.discipline_id
+    ).exists():
+        maps.update_removed_visits(instance.user_id, instance.discipline_id)
+
+
+@receiver(post_save, sender=TrainingSession)
+def bump_visits_version_on_session_change(sender, instance, raw=False, **kwargs):
+    """Invalidate the cached training maps when a session with visits changes, as
+    the maps filter visits by its user, discipline and date."""
+    if raw:
+        return
+
+    if MunicipalityVisits.objects.filter(training_session=instance).exists():
+        caching.bump_data_version(caching.VISITS_VERSION_KEY)
+
+        previous_key = getattr(instance, "_previous_rollup_key", None)
+        if previous_key and previous_key[1] != instance.discipline_id:
+            maps.update_discipline_facet([previous_key[1], instance.discipline_id])
+        if previous_key and previous_key[:2] != (
+            instance.user_id,
+            instance.discipline_id,
+        ):
+            coverage.rebuild_visits(*previous_key[:2])
+            coverage.rebuild_visits(instance.user_id, instance.discipline_id)
+
+
+@receiver([post_save, post_delete], sender=SessionTrack)
+def invalidate_start_point(sender, instance, raw=False, **kwargs):
+    """Calculate the start point of a user again when one of its tracks changes."""
+    if raw:
+        return
+
+    user_id = (
+        TrainingSession.objects.filter(pk=instance.session_id)
+        .values_list("user_id", flat=True)
+        .first()
+    )
+    if user_id is not None:
+        adjacency.invalidate_start_point_on_commit(user_id)
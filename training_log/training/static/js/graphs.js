@@ -1,18 +1,81 @@
-function createChart({canvasId, all_data, settings}) {
-    const isMobile = window.innerWidth <= 768;
-    const displayFormat = isMobile ? 'MMM yy' : 'MMM yyyy';
+function getXOffsets(x) {
+    if ('offsets' in x) {
+        return x.offsets
+    }
+
+    var offsets = []
+    for (var i = 0; i < x.count; i++) {
+        offsets.push(i * x.step)
+    }
+    return offsets
+}
+
+function getDates(start, offsets) {
+    const [year, month, day] = start.split('-').map(Number)
+    return offsets.map(function(offset) {
+        return new Date(year, month - 1, day + offset).getTime()
+    })
+}
 
-    dataSets = []
+function toDateString(timestamp) {
+    const date = new Date(timestamp)
+    return [
+        date.getFullYear(),
+        String(date.getMonth() + 1).padStart(2, '0'),
+        String(date.getDate()).padStart(2, '0'),
+    ].join('-')
+}
+
+function getYValues(series) {
+    if (!series.delta) {
+        return series.values
+    }
+
+    var total = 0
+    return series.values.map(function(value) {
+        total += value
+        return Math.round(total * 1000) / 1000
+    })
+}
+
+function getLabels(graph) {
+    if ('values' in graph.x) {
+        return graph.x.values
+    }
+    return undefined
+}
 
-    for (const [key, json_data] of Object.entries(all_data)) {
-        value = JSON.parse(json_data)
-        if(value.color == null) {
-            dataSets.push({label: key, data: value.y_values})
+function getDataSets(graph) {
+    var dataSets = []
+
+    for (const series of graph.series) {
+        var data = getYValues(series)
+        if (!('values' in graph.x)) {
+            const dates = getDates(graph.x.start, series.offsets || getXOffsets(graph.x))
+            data = data.map(function(value, i) { return {x: dates[i], y: value} })
+        }
+
+        if(series.color == null) {
+            dataSets.push({label: series.label, data: data})
         } else {
-            dataSets.push({label: key, data: value.y_values, borderColor: value.color, backgroundColor: value.color})
+            dataSets.push({label: series.label, data: data, borderColor: series.color, backgroundColor: series.color})
         }
-        labels = value.x_values
     }
+    return dataSets
+}
+
+function updateChart(chart, graph) {
+    chart.data.labels = getLabels(graph)
+    chart.data.datasets = getDataSets(graph)
+    chart.update()
+}
+
+function createChart({canvasId, graph, settings, onZoom}) {
+    const isMobile = window.innerWidth <= 768;
+    const displayFormat = isMobile ? 'MMM yy' : 'MMM yyyy';
+
+    dataSets = getDataSets(graph)
+    labels = getLabels(graph)
 
     if ('title' in settings) {
         title = {
@@ -51,6 +114,18 @@ function createChart({canvasId, all_data, settings}) {
     }
 
 
+    if (onZoom != null && xAxisType == 'time') {
+        zoom = {
+            zoom: {
+                drag: {enabled: true},
+                mode: 'x',
+                onZoomComplete: onZoom,
+            }
+        }
+    } else {
+        zoom = {}
+    }
+
     var ctx = document.getElementById(canvasId).getContext('2d');
     return new Chart(ctx, {
         type: chartType,
@@ -63,7 +138,6 @@ function createChart({canvasId, all_data, settings}) {
                 x: {
                     type: xAxisType,
                     time: {
-                        parser: 'yyyy-MM-dd\'T\'HH:mm:ss',
                         displayFormats: {
                             month: displayFormat
                         }
@@ -82,6 +156,7 @@ function createChart({canvasId, all_data, settings}) {
                     display: true
                 },
                 title: title,
+                zoom: zoom,
             },
             responsive: true,
             maintainAspectRatio: false,
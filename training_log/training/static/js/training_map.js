@@ -0,0 +1,115 @@
+const UNVISITED_STYLE = {color: 'gray', fillColor: 'gray', fillOpacity: 0.2, weight: 1}
+const SHARED_COLOR = 'brown'
+
+function getVisitStyle(visitors, colors) {
+    if (!visitors || visitors.length == 0) {
+        return UNVISITED_STYLE
+    }
+
+    var fillColor = visitors.length >= 2 ? SHARED_COLOR : colors[visitors[0]]
+    return {color: 'gray', fillColor: fillColor, fillOpacity: 0.5, weight: 1}
+}
+
+function getTooltip(name, visitors) {
+    var tooltip = `<b>Gemeente:</b> ${name}`
+    if (visitors && visitors.length > 0) {
+        tooltip += `<br><b>Visited by:</b> ${visitors.join(', ')}`
+    }
+    return tooltip
+}
+
+function getGeometryLevel(geometryLevels, zoom) {
+    return geometryLevels.find(function(level) {
+        return level.max_zoom == null || zoom <= level.max_zoom
+    })
+}
+
+// Show the boundaries with the detail that fits the zoom level. The browser
+// caches the boundaries of every level, so switching back is instant.
+function showGeometryLevel(trainingMap) {
+    const level = getGeometryLevel(trainingMap.geometryLevels, trainingMap.map.getZoom())
+    if (level === trainingMap.level) {
+        return
+    }
+    trainingMap.level = level
+
+    trainingMap.layer = fetch(level.url)
+        .then(function(response) { return response.json() })
+        .then(function(geometry) {
+            if (trainingMap.level !== level) {
+                return trainingMap.layer
+            }
+            const layer = L.geoJSON(geometry, {style: UNVISITED_STYLE})
+            if (trainingMap.visibleLayer) {
+                trainingMap.map.removeLayer(trainingMap.visibleLayer)
+            }
+            trainingMap.visibleLayer = layer.addTo(trainingMap.map)
+            if (trainingMap.visitsData) {
+                styleVisits(layer, trainingMap.visitsData)
+            }
+            return layer
+        })
+}
+
+function createTrainingMap({mapId, geometryLevels}) {
+    const map = L.map(mapId).setView([52.13, 5.29], 7)
+    L.tileLayer('https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png', {
+        attribution: '&copy; OpenStreetMap contributors &copy; CARTO',
+    }).addTo(map)
+
+    const trainingMap = {map: map, geometryLevels: geometryLevels}
+    showGeometryLevel(trainingMap)
+    map.on('zoomend', function() { showGeometryLevel(trainingMap) })
+
+    return trainingMap
+}
+
+function styleVisits(layer, visitsData) {
+    layer.eachLayer(function(municipality) {
+        const name = municipality.feature.properties.GM_NAAM
+        const visitors = visitsData.visits[name]
+        municipality.setStyle(getVisitStyle(visitors, visitsData.colors))
+        municipality.bindTooltip(getTooltip(name, visitors))
+    })
+}
+
+function showVisits(trainingMap, visitsData) {
+    trainingMap.visitsData = visitsData
+    trainingMap.layer.then(function(layer) { styleVisits(layer, visitsData) })
+}
+
+function loadVisits(trainingMap, visitsUrl, form) {
+    const parameters = new URLSearchParams(new FormData(form))
+    return fetch(visitsUrl + '?' + parameters)
+        .then(function(response) { return response.json() })
+        .then(function(visitsData) {
+            if ('errors' in visitsData) {
+                return
+            }
+            showVisits(trainingMap, visitsData)
+        })
+}
+
+function showSuggestions(element, suggestions) {
+    element.replaceChildren()
+    for (const [username, municipalities] of Object.entries(suggestions)) {
+        const item = document.createElement('li')
+        const names = municipalities.map(function(suggestion) {
+            return `${suggestion.municipality} (${(suggestion.distance / 1000).toFixed(1)} km)`
+        })
+        item.textContent = `${username}: ${names.join(', ') || 'no unvisited neighbours'}`
+        element.appendChild(item)
+    }
+}
+
+function loadSuggestions(suggestionsUrl, form, element) {
+    const parameters = new URLSearchParams(new FormData(form))
+    return fetch(suggestionsUrl + '?' + parameters)
+        .then(function(response) { return response.json() })
+        .then(function(suggestionsData) {
+            if ('errors' in suggestionsData) {
+                return
+            }
+            showSuggestions(element, suggestionsData.suggestions)
+        })
+}
@@ -1,15 +1,21 @@
 import logging
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from enum import Enum
+from typing import NamedTuple
 
+import numpy as np
 import pandas as pd
 from dateutil.relativedelta import relativedelta
 from django.contrib.auth.models import User
-from django.db.models import F, Q, Sum
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
 from django.utils import timezone
 from scipy import constants
 
-from .models import TrainingSession
+from . import caching, prefix_sums
+from .models import (DailyTrainingRollup, Discipline, PersonalRecord,
+                     TrainingSession)
 
 logger = logging.getLogger(__name__)
 
@@ -17,14 +23,78 @@ DEFAULT_START_DATE = datetime(2023, 5, 1)
 LONG_SWIM_DURATION = 1 * constants.hour
 LONG_RIDE_DURATION = 3 * constants.hour
 LONG_RUN_DURATION = 1.5 * constants.hour
-
-IRONMAN_SWIMMING_DISTANCE = 3_800
-IRONMAN_CYCLING_DISTANCE = 180_000
-IRONMAN_RUNNING_DISTANCE = 42_195
-
-IRONMAN_SWIMMING_MARGIN = 0.1
-IRONMAN_CYCLING_MARGIN = 0.05
-IRONMAN_RUNNING_MARGIN = 0.05
+LONG_SESSION_DURATIONS = {
+    "Swimming": LONG_SWIM_DURATION,
+    "Cycling": LONG_RIDE_DURATION,
+    "Running": LONG_RUN_DURATION,
+}
+
+
+class TransitionChain(NamedTuple):
+    """Disciplines that follow each other with at most max_gap seconds between
+    the end of one session and the start of the next."""
+
+    stat_name: str
+    disciplines: list[str]
+    max_gap: float
+
+
+TRANSITION_CHAINS = [
+    TransitionChain(
+        stat_name="Number of brick workouts",
+        disciplines=["Cycling", "Running"],
+        max_gap=30 * constants.minute,
+    ),
+    TransitionChain(
+        stat_name="Number of swim-bike transitions",
+        disciplines=["Swimming", "Cycling"],
+        max_gap=30 * constants.minute,
+    ),
+    TransitionChain(
+        stat_name="Number of swim-bike-run workouts",
+        disciplines=["Swimming", "Cycling", "Running"],
+        max_gap=30 * constants.minute,
+    ),
+]
+
+RACE_DISCIPLINES = ["Swimming", "Cycling", "Running"]
+RACE_DAYS_CACHE_KEY = "training:race_days:{user_id}"
+
+
+class RaceTemplate(NamedTuple):
+    """The distances (in meters) and margins per discipline of a race. A day
+    counts as a race day when every distance is covered within its margin."""
+
+    name: str
+    distances: dict[str, float]
+    margins: dict[str, float]
+
+    def minimum_distances(self):
+        """Get the minimum distance per race discipline."""
+        return [
+            self.distances.get(discipline, 0) * (1 - self.margins.get(discipline, 0))
+            for discipline in RACE_DISCIPLINES
+        ]
+
+
+IRONMAN = RaceTemplate(
+    name="Ironman",
+    distances={"Swimming": 3_800, "Cycling": 180_000, "Running": 42_195},
+    margins={"Swimming": 0.1, "Cycling": 0.05, "Running": 0.05},
+)
+RACE_TEMPLATES = [
+    IRONMAN,
+    RaceTemplate(
+        name="Half Ironman",
+        distances={"Swimming": 1_900, "Cycling": 90_000, "Running": 21_097.5},
+        margins={"Swimming": 0.1, "Cycling": 0.05, "Running": 0.05},
+    ),
+    RaceTemplate(
+        name="Olympic",
+        distances={"Swimming": 1_500, "Cycling": 40_000, "Running": 10_000},
+        margins={"Swimming": 0.1, "Cycling": 0.05, "Running": 0.05},
+    ),
+]
 
 
 class StatsPeriod(Enum):
@@ -55,6 +125,19 @@ class StatsPeriod(Enum):
         else:
             return "Last " + self.value.replace("_", " ")
 
+    def get_date_range(self):
+        """Get the start and end date of the period, the end date is None for a
+        period that runs up to now."""
+        match self:
+            case StatsPeriod.WEEK:
+                return datetime.now() - relativedelta(weeks=1), None
+            case StatsPeriod.MONTH:
+                return datetime.now() - relativedelta(months=1), None
+            case StatsPeriod.THREE_MONTHS:
+                return datetime.now() - relativedelta(months=3), None
+            case StatsPeriod.ALL:
+                return DEFAULT_START_DATE, None
+
     @staticmethod
     def options():
         options = []
@@ -68,15 +151,29 @@ class StatsPeriod(Enum):
 class AllPlayerStats:
     """This class has overall statistics for all players."""
 
-    def __init__(self, period: StatsPeriod = StatsPeriod.ALL):
-        self.users = User.objects.all()
+    def __init__(
+        self, period: StatsPeriod = StatsPeriod.ALL, start_date=None, end_date=None
+    ):
+        """Calculate the stats for a period or for a custom date range. A custom
+        range is used when a start date is given.
+
+        :param period: The period to calculate the stats for
+        :param start_date: The first date of a custom range (Default value = None)
+        :param end_date: The last date of a custom range, or None for up to now
+        (Default value = None)
+
+        """
+        self.users = User.objects.order_by("id")
         self.players = [user.username.capitalize() for user in self.users]
         self.stats = {}
+        self.last_training_ends = []
+        self.transitions = {}
         self.training_sessions = []
         self.period = period
-        self.start_date = None
-        self.end_date = None
-        self.get_start_end_dates()
+        self.start_date = start_date
+        self.end_date = end_date
+        if start_date is None:
+            self.get_start_end_dates()
         self.get_training_sessions()
         self.calculate_stats()
 
@@ -92,16 +189,22 @@ class AllPlayerStats:
 
     def get_start_end_dates(self):
         """Get start and end dates based on the period."""
-        self.end_date = None
-        match self.period:
-            case StatsPeriod.WEEK:
-                self.start_date = datetime.now() - relativedelta(weeks=1)
-            case StatsPeriod.MONTH:
-                self.start_date = datetime.now() - relativedelta(months=1)
-            case StatsPeriod.THREE_MONTHS:
-                self.start_date = datetime.now() - relativedelta(months=3)
-            case StatsPeriod.ALL:
-                self.start_date = DEFAULT_START_DATE
+        self.start_date, self.end_date = self.period.get_date_range()
+
+    def get_first_and_last_day(self):
+        """Get the first and last day of the stats as dates."""
+        first_day = pd.Timestamp(self.start_date).date()
+        last_day = pd.Timestamp(self.end_date or datetime.now()).date()
+        return first_day, last_day
+
+    def get_cache_data(self):
+        """Get the calculated stats in a form that can be cached."""
+        return {
+            "user_ids": [user.id for user in self.users],
+            "players": self.players,
+            "stats": self.stats,
+            "last_training_ends": self.last_training_ends,
+        }
 
     def add_stat(self, name, value):
         """Add a stat to the stats dictionary.
@@ -141,167 +244,271 @@ class AllPlayerStats:
 
         return f"{distance/constants.kilo:.2f} km"
 
-    def get_sum(self, field, player, discipline=None):
-        """Get the sum of a field for a player and optional discipline.
+    def get_user_aggregates(self):
+        """Calculate the long session counts and maxima for all users in a single
+        grouped query using conditional aggregation. The all time maxima are read
+        from the personal records instead.
 
-        :param field: The field we want the sum
-        :param player: The player we want to filter on
-        :param discipline: The discipline we want to filter on,
-        optional (Default value = None)
-        :returns: The sum of field for the filtered data
+        :returns: A dictionary with the aggregates per user id
 
         """
-        if discipline:
-            return self.training_sessions.filter(
-                user=player, discipline__name=discipline
-            ).aggregate(Sum(field))[field + "__sum"]
-        else:
-            return self.training_sessions.filter(user=player).aggregate(Sum(field))[
-                field + "__sum"
-            ]
+        aggregates = {}
+        for discipline, long_duration in LONG_SESSION_DURATIONS.items():
+            in_discipline = Q(discipline__name=discipline)
+            prefix = discipline.lower()
 
-    def count_sessions(self, user, discipline=None, min_duration=None):
-        """Count the number of sessions for a user. Optional to filter on
-        discipline and min_duration.
+            aggregates[f"{prefix}_long_count"] = Count(
+                "id", filter=in_discipline & Q(moving_duration__gte=long_duration)
+            )
+            if not self.is_all_time():
+                aggregates[f"{prefix}_moving_duration_max"] = Max(
+                    "moving_duration", filter=in_discipline
+                )
+                aggregates[f"{prefix}_distance_max"] = Max(
+                    "distance", filter=in_discipline
+                )
+
+        user_aggregates = (
+            self.training_sessions.order_by().values("user_id").annotate(**aggregates)
+        )
 
-        :param user: The user to count for
-        :param min_duration: The minimum duration of the sessions (in minutes)
-        (Default value = None)
-        :param discipline: The discipline to filter on (Default value = None)
-        :returns: The number of sessions for the filtered data
+        return {aggregate.pop("user_id"): aggregate for aggregate in user_aggregates}
+
+    def is_all_time(self):
+        """Check if the stats cover all sessions up to now."""
+        return self.start_date == DEFAULT_START_DATE and self.end_date is None
+
+    def get_personal_records(self):
+        """Get the longest time and distance of all users from the personal
+        records in a single query.
+
+        :returns: A dictionary with the maxima per user id
 
         """
-        filtered_sessions = self.training_sessions.filter(user=user)
-        if discipline:
-            filtered_sessions = filtered_sessions.filter(discipline__name=discipline)
+        fields = {
+            PersonalRecord.LONGEST_TIME: "moving_duration_max",
+            PersonalRecord.LONGEST_DISTANCE: "distance_max",
+        }
+        personal_records = PersonalRecord.objects.filter(
+            record__in=fields, discipline__name__in=LONG_SESSION_DURATIONS
+        ).values_list("user_id", "discipline__name", "record", "value")
 
-        if min_duration:
-            filtered_sessions = filtered_sessions.filter(
-                moving_duration__gte=min_duration
-            )
+        user_records = {}
+        for user_id, discipline, record, value in personal_records:
+            user_records.setdefault(user_id, {})[
+                f"{discipline.lower()}_{fields[record]}"
+            ] = value
 
-        return filtered_sessions.count()
+        return user_records
 
-    def longest_session(self, user, discipline, field):
-        """Find the longest value for a field for a user and discipline.
+    def get_range_totals(self):
+        """Calculate the totals and counts for all users from their prefix sums,
+        so every total takes two lookups regardless of the length of the range.
+        Totals are None when there are no sessions to sum.
 
-        :param user: The user to filter on
-        :param field: The field we want to find
-        :param discipline: The discipline we want to filter on
-        :returns: The maximum value for the field for the filtered data
+        :returns: A dictionary with the totals per user id
 
         """
-        longest_session = (
-            self.training_sessions.filter(user=user, discipline__name=discipline)
-            .exclude(**{field: None})
-            .order_by(field)
-            .reverse()
-            .first()
+        first_day, last_day = self.get_first_and_last_day()
+        discipline_ids = {}
+        for name, discipline_id in Discipline.objects.filter(
+            name__in=LONG_SESSION_DURATIONS
+        ).values_list("name", "id"):
+            discipline_ids.setdefault(name, []).append(discipline_id)
+
+        user_prefix_sums = prefix_sums.get_prefix_sums(
+            [user.id for user in self.users], first_day
         )
 
-        if longest_session is None:
-            return None
+        range_totals = {}
+        for user_id, sums in user_prefix_sums.items():
+            session_count = sums.total(first_day, last_day, "session_count")
+            totals = {
+                "moving_duration_sum": (
+                    sums.total(first_day, last_day, "moving_duration")
+                    if session_count
+                    else None
+                )
+            }
+
+            for discipline in LONG_SESSION_DURATIONS:
+                ids = discipline_ids.get(discipline, [])
+                prefix = discipline.lower()
+                count = int(sums.total(first_day, last_day, "session_count", ids))
+
+                totals[f"{prefix}_count"] = count
+                totals[f"{prefix}_moving_duration_sum"] = (
+                    sums.total(first_day, last_day, "moving_duration", ids)
+                    if count
+                    else None
+                )
 
-        return getattr(longest_session, field)
+            range_totals[user_id] = totals
 
-    def calculate_weekly_hours(self, user):
-        """Calculate the weekly hours for a user.
+        return range_totals
 
-        :param user: The user to filter on
+    def get_last_trainings(self):
+        """Get the start date and total duration of the last training of every
+        user in a single query.
+
+        :returns: A dictionary with the last training per user id
+
+        """
+        last_trainings = (
+            self.training_sessions.filter(start_date__isnull=False)
+            .order_by("user_id", "-start_date")
+            .distinct("user_id")
+            .values("user_id", "start_date", "total_duration")
+        )
+
+        return {
+            last_training.pop("user_id"): last_training
+            for last_training in last_trainings
+        }
+
+    def calculate_weekly_hours(self, total_time):
+        """Calculate the weekly hours based on the total time trained.
+
+        :param total_time: The total time trained in seconds
         :returns: The weekly hours
 
         """
-        total_time = self.get_sum("moving_duration", user)
-        weeks_trained = ((self.end_date or datetime.now()) - self.start_date).days / 7
+        first_day, last_day = self.get_first_and_last_day()
+        weeks_trained = max((last_day - first_day).days, 1) / 7
 
         return (total_time or 0) / weeks_trained
 
-    def time_since_last_training(self, user):
-        """Calculate the time since the last training ended for a user.
+    @staticmethod
+    def get_last_training_end(last_training):
+        """Calculate when the last training ended.
 
-        :param user: The user to filter on
+        :param last_training: The start date and total duration of the last
+        training, or None if there is no training
 
         """
-        last_training = (
-            self.training_sessions.filter(user=user)
-            .order_by(F("start_date").desc(nulls_last=True))
-            .first()
-        )
-        if last_training and last_training.start_date:
-            end_time = last_training.start_date + timedelta(
-                seconds=last_training.total_duration or 0
-            )
-            return self.format_timedelta(timezone.localtime(timezone.now()) - end_time)
-        else:
+        if not last_training:
             return None
 
-    def get_rides_with_end_date(self, user):
-        """Get all rides for a user as a dataframe. Filter out null start dates,
-        calculate end date sort by the end date."""
-        rides = (
-            self.training_sessions.filter(user=user)
-            .filter(discipline__name="Cycling")
-            .filter(start_date__isnull=False)
-            .all()
+        return last_training["start_date"] + timedelta(
+            seconds=last_training["total_duration"] or 0
         )
 
-        if len(rides) == 0:
-            return None
+    @classmethod
+    def time_since_last_training(cls, end_time):
+        """Calculate the time since the last training ended.
 
-        rides_df = pd.DataFrame.from_records(rides.values())
+        :param end_time: The end time of the last training, or None if there is
+        no training
 
-        rides_df["end_date"] = rides_df["start_date"] + pd.to_timedelta(
-            rides_df["total_duration"], unit="s"
+        """
+        if end_time is None:
+            return None
+
+        return cls.format_timedelta(timezone.localtime(timezone.now()) - end_time)
+
+    def get_transition_sessions(self):
+        """Get the sessions of all users that can be part of a transition as a
+        narrow dataframe. Filter out null start dates and calculate the end date."""
+        disciplines = {
+            discipline
+            for chain in TRANSITION_CHAINS
+            for discipline in chain.disciplines
+        }
+        sessions = pd.DataFrame.from_records(
+            self.training_sessions.filter(
+                start_date__isnull=False, discipline__name__in=disciplines
+            )
+            .order_by()
+            .values(
+                "id",
+                "user_id",
+                "start_date",
+                "total_duration",
+                discipline_name=F("discipline__name"),
+            ),
+            columns=[
+                "id",
+                "user_id",
+                "start_date",
+                "total_duration",
+                "discipline_name",
+            ],
         )
-        rides_df.sort_values("end_date", inplace=True)
-        rides_df = rides_df.add_suffix("_ride")
-        return rides_df
-
-    def get_runs_df(self, user):
-        """Get all runs for a user as a dataframe. Filter out null start dates
-        and sort by start date."""
-        runs = (
-            self.training_sessions.filter(user=user)
-            .filter(discipline__name="Running")
-            .filter(start_date__isnull=False)
-            .all()
+
+        sessions["end_date"] = sessions["start_date"] + pd.to_timedelta(
+            sessions["total_duration"].fillna(0), unit="s"
         )
+        return sessions
 
-        if len(runs) == 0:
-            return None
+    @staticmethod
+    def find_transitions(sessions, chain):
+        """Find all sequences of sessions of a user that follow the disciplines of
+        a transition chain with at most the max gap between them.
 
-        runs_df = pd.DataFrame.from_records(runs.values())
-        runs_df.sort_values("start_date", inplace=True)
-        runs_df = runs_df.add_suffix("_run")
-        return runs_df
+        :param sessions: The sessions as created by get_transition_sessions
+        :param chain: The transition chain to look for
+        :returns: A dataframe with the user id and a session id column per step
 
-    def count_brick_sessions(self, user):
-        """Count the number of brick sessions done by the user.
+        """
+        columns = ["user_id"] + [
+            f"session_id_{step}" for step in range(len(chain.disciplines))
+        ]
+
+        matches = sessions.loc[
+            sessions["discipline_name"] == chain.disciplines[0],
+            ["user_id", "id", "end_date"],
+        ].rename(columns={"id": "session_id_0"})
+
+        for step, discipline in enumerate(chain.disciplines[1:], start=1):
+            next_sessions = sessions.loc[
+                sessions["discipline_name"] == discipline,
+                ["user_id", "id", "start_date", "end_date"],
+            ].rename(
+                columns={
+                    "id": f"session_id_{step}",
+                    "start_date": "next_start_date",
+                    "end_date": "next_end_date",
+                }
+            )
 
-        :param user: The user to filter on
+            if matches.empty or next_sessions.empty:
+                return pd.DataFrame(columns=columns)
 
-        """
-        rides = self.get_rides_with_end_date(user)
-        runs = self.get_runs_df(user)
-
-        if rides is None or runs is None:
-            return 0
-
-        results = pd.merge_asof(
-            rides,
-            runs,
-            left_on="end_date_ride",
-            right_on="start_date_run",
-            direction="forward",
-        )
+            matches = pd.merge_asof(
+                matches.sort_values("end_date"),
+                next_sessions.sort_values("next_start_date"),
+                left_on="end_date",
+                right_on="next_start_date",
+                by="user_id",
+                direction="forward",
+            )
 
-        results["time_between"] = (
-            results["start_date_run"] - results["end_date_ride"]
-        ).dt.total_seconds() / constants.minute
+            time_between = (
+                matches["next_start_date"] - matches["end_date"]
+            ).dt.total_seconds()
+            matches = matches.loc[time_between <= chain.max_gap]
+            matches = matches.assign(end_date=matches["next_end_date"]).drop(
+                columns=["next_start_date", "next_end_date"]
+            )
+
+        return matches[columns]
+
+    def count_transitions(self):
+        """Count the transitions of every chain for all users.
+
+        :returns: A dictionary with per chain stat name the counts per user id
 
-        results = results.loc[results["time_between"] <= 30]
+        """
+        sessions = self.get_transition_sessions()
+
+        transition_counts = {}
+        for chain in TRANSITION_CHAINS:
+            self.transitions[chain.stat_name] = self.find_transitions(sessions, chain)
+            transition_counts[chain.stat_name] = (
+                self.transitions[chain.stat_name].groupby("user_id").size().to_dict()
+            )
 
-        return len(results.index)
+        return transition_counts
 
     @staticmethod
     def format_timedelta(delta):
@@ -323,144 +530,245 @@ class AllPlayerStats:
 
     def calculate_stats(self):
         """Calculate the stats for all players."""
+        user_aggregates = self.get_user_aggregates()
+        range_totals = self.get_range_totals()
+        user_records = self.get_personal_records() if self.is_all_time() else {}
+        last_trainings = self.get_last_trainings()
+        transition_counts = self.count_transitions()
+
         for user in self.users:
+            aggregates = {
+                **user_aggregates.get(user.id, {}),
+                **range_totals.get(user.id, {}),
+                **user_records.get(user.id, {}),
+            }
+            last_training_end = self.get_last_training_end(last_trainings.get(user.id))
+            self.last_training_ends.append(last_training_end)
+
             self.add_stat(
-                "Time since last training", self.time_since_last_training(user)
+                "Time since last training",
+                self.time_since_last_training(last_training_end),
             )
             self.add_stat(
                 "Total time trained",
-                self.formatted_duration(self.get_sum("moving_duration", user)),
+                self.formatted_duration(aggregates.get("moving_duration_sum")),
             )
             self.add_stat(
                 "Average weekly hours",
-                self.formatted_duration(self.calculate_weekly_hours(user)),
+                self.formatted_duration(
+                    self.calculate_weekly_hours(aggregates.get("moving_duration_sum"))
+                ),
             )
-            self.add_stat("Number of swims", self.count_sessions(user, "Swimming"))
-            self.add_stat("Number of rides", self.count_sessions(user, "Cycling"))
-            self.add_stat("Number of runs", self.count_sessions(user, "Running"))
-            self.add_stat("Number of brick workouts", self.count_brick_sessions(user))
+            self.add_stat("Number of swims", aggregates.get("swimming_count", 0))
+            self.add_stat("Number of rides", aggregates.get("cycling_count", 0))
+            self.add_stat("Number of runs", aggregates.get("running_count", 0))
+            for stat_name, counts in transition_counts.items():
+                self.add_stat(stat_name, counts.get(user.id, 0))
             self.add_stat(
                 "Total swimming time",
-                self.formatted_duration(
-                    self.get_sum("moving_duration", user, "Swimming")
-                ),
+                self.formatted_duration(aggregates.get("swimming_moving_duration_sum")),
             )
             self.add_stat(
                 "Total cycling time",
-                self.formatted_duration(
-                    self.get_sum("moving_duration", user, "Cycling")
-                ),
+                self.formatted_duration(aggregates.get("cycling_moving_duration_sum")),
             )
             self.add_stat(
                 "Total running time",
-                self.formatted_duration(
-                    self.get_sum("moving_duration", user, "Running")
-                ),
+                self.formatted_duration(aggregates.get("running_moving_duration_sum")),
             )
             self.add_stat(
                 "Longest swim (time)",
-                self.formatted_duration(
-                    self.longest_session(user, "Swimming", "moving_duration")
-                ),
+                self.formatted_duration(aggregates.get("swimming_moving_duration_max")),
             )
             self.add_stat(
                 "Longest ride (time)",
-                self.formatted_duration(
-                    self.longest_session(user, "Cycling", "moving_duration")
-                ),
+                self.formatted_duration(aggregates.get("cycling_moving_duration_max")),
             )
             self.add_stat(
                 "Longest run (time)",
-                self.formatted_duration(
-                    self.longest_session(user, "Running", "moving_duration")
-                ),
+                self.formatted_duration(aggregates.get("running_moving_duration_max")),
             )
             self.add_stat(
                 "Longest swim (km)",
-                self.formatted_distance(
-                    self.longest_session(user, "Swimming", "distance")
-                ),
+                self.formatted_distance(aggregates.get("swimming_distance_max")),
             )
             self.add_stat(
                 "Longest ride (km)",
-                self.formatted_distance(
-                    self.longest_session(user, "Cycling", "distance")
-                ),
+                self.formatted_distance(aggregates.get("cycling_distance_max")),
             )
             self.add_stat(
                 "Longest run (km)",
-                self.formatted_distance(
-                    self.longest_session(user, "Running", "distance")
-                ),
+                self.formatted_distance(aggregates.get("running_distance_max")),
             )
             self.add_stat(
                 "Long swims (>"
                 + str(int(LONG_SWIM_DURATION / constants.minute))
                 + " mins)",
-                self.count_sessions(user, "Swimming", LONG_SWIM_DURATION),
+                aggregates.get("swimming_long_count", 0),
             )
             self.add_stat(
                 "Long rides (>"
                 + str(int(LONG_RIDE_DURATION / constants.minute))
                 + " mins)",
-                self.count_sessions(user, "Cycling", LONG_RIDE_DURATION),
+                aggregates.get("cycling_long_count", 0),
             )
             self.add_stat(
                 "Long runs (>"
                 + str(int(LONG_RUN_DURATION / constants.minute))
                 + " mins)",
-                self.count_sessions(user, "Running", LONG_RUN_DURATION),
+                aggregates.get("running_long_count", 0),
             )
 
 
+def get_cached_player_stats(period: StatsPeriod, start_date=None, end_date=None):
+    """Get the stats for all players from the cache or calculate them. The time
+    since the last training is recalculated, so it never gets stale.
+
+    :param period: The period to get the stats for
+    :param start_date: The first date of a custom range (Default value = None)
+    :param end_date: The last date of a custom range (Default value = None)
+
+    """
+    range_parts = [period.value] if start_date is None else [start_date, end_date]
+    player_stats = caching.get_or_compute(
+        caching.get_versioned_key("all_stats", *range_parts, date.today()),
+        lambda: AllPlayerStats(period, start_date, end_date).get_cache_data(),
+    )
+
+    player_stats["stats"]["Time since last training"] = [
+        AllPlayerStats.time_since_last_training(end_time)
+        for end_time in player_stats["last_training_ends"]
+    ]
+
+    return player_stats
+
+
 def is_ironman(user: User) -> bool:
     """Check if the user is an ironman based on discipline distances per day."""
-    training_per_day = get_discipline_distances_per_day(user)
+    return IRONMAN.name in get_first_race_days([user.id])[user.id]
 
-    if training_per_day is None:
-        return False
 
-    ironman_days = training_per_day.loc[
-        (
-            training_per_day["swimming_distance"]
-            >= IRONMAN_SWIMMING_DISTANCE * (1 - IRONMAN_SWIMMING_MARGIN)
-        )
-        & (
-            training_per_day["cycling_distance"]
-            >= IRONMAN_CYCLING_DISTANCE * (1 - IRONMAN_CYCLING_MARGIN)
-        )
-        & (
-            training_per_day["running_distance"]
-            >= IRONMAN_RUNNING_DISTANCE * (1 - IRONMAN_RUNNING_MARGIN)
-        )
-    ]
-    return not ironman_days.empty
+def get_ironman_statuses(user_ids):
+    """Check for each user if they are an ironman."""
+    race_days = get_first_race_days(user_ids)
+    return [IRONMAN.name in race_days[user_id] for user_id in user_ids]
+
+
+def get_first_race_days(user_ids):
+    """Get the first day each race template was completed for a list of users.
+    Users that are not cached are all calculated together.
+
+    :returns: A dictionary with per user id the first day per template name
+
+    """
+    keys = {
+        user_id: RACE_DAYS_CACHE_KEY.format(user_id=user_id) for user_id in user_ids
+    }
+    cached = cache.get_many(keys.values())
 
+    missing_user_ids = [user_id for user_id in user_ids if keys[user_id] not in cached]
+    if missing_user_ids:
+        calculated = calculate_first_race_days(missing_user_ids)
+        new_race_days = {
+            keys[user_id]: calculated.get(user_id, {}) for user_id in missing_user_ids
+        }
+        cache.set_many(new_race_days, timeout=None)
+        cached.update(new_race_days)
 
-def get_discipline_distances_per_day(user: User):
-    """Get the distances per day per discipline for a user."""
-    training_sessions = TrainingSession.objects.filter(user=user).all()
-    if len(training_sessions) == 0:
-        return None
+    return {user_id: cached[keys[user_id]] for user_id in user_ids}
 
-    training_sessions_df = pd.DataFrame.from_records(
-        training_sessions.values(
-            user_name=F("user__username"), discipline_name=F("discipline__name")
-        ).values()
+
+def get_race_distances_per_day(user_ids, date=None):
+    """Get the distance per race discipline per user and day in one grouped query.
+
+    :returns: A dataframe indexed by user id and date with a column per discipline
+
+    """
+    daily_rollups = DailyTrainingRollup.objects.filter(
+        user_id__in=user_ids, discipline__name__in=RACE_DISCIPLINES
+    )
+    if date:
+        daily_rollups = daily_rollups.filter(date=date)
+
+    daily_distances = pd.DataFrame.from_records(
+        daily_rollups.order_by()
+        .values("user_id", "date", discipline_name=F("discipline__name"))
+        .annotate(total_distance=Sum("distance")),
+        columns=["user_id", "date", "discipline_name", "total_distance"],
     )
-    get_discipline_distance(training_sessions_df, "Swimming", "swimming_distance")
-    get_discipline_distance(training_sessions_df, "Cycling", "cycling_distance")
-    get_discipline_distance(training_sessions_df, "Running", "running_distance")
 
-    training_sessions_df = training_sessions_df[
-        ["date", "running_distance", "swimming_distance", "cycling_distance"]
-    ]
+    return daily_distances.pivot_table(
+        index=["user_id", "date"],
+        columns="discipline_name",
+        values="total_distance",
+        aggfunc="sum",
+        fill_value=0,
+    ).reindex(columns=RACE_DISCIPLINES, fill_value=0)
+
+
+def get_qualifying_days(distances_per_day):
+    """Compare every day with every race template at once.
 
-    return training_sessions_df.groupby("date").sum()
+    :returns: A boolean array with a row per day and a column per template
+
+    """
+    minimum_distances = np.array(
+        [template.minimum_distances() for template in RACE_TEMPLATES]
+    )
+    distances = distances_per_day.to_numpy(dtype=float)
+
+    return (distances[:, np.newaxis, :] >= minimum_distances[np.newaxis, :, :]).all(
+        axis=2
+    )
+
+
+def calculate_first_race_days(user_ids):
+    """Calculate the first day each race template was completed for users."""
+    distances_per_day = get_race_distances_per_day(user_ids)
+    qualifying_days = get_qualifying_days(distances_per_day)
+
+    first_race_days = {}
+    for template_index, template in enumerate(RACE_TEMPLATES):
+        race_days = distances_per_day.index[qualifying_days[:, template_index]]
+        first_days = race_days.to_frame(index=False).groupby("user_id")["date"].min()
+
+        for user_id, first_day in first_days.items():
+            first_race_days.setdefault(user_id, {})[template.name] = first_day
+
+    return first_race_days
+
+
+def invalidate_race_days_on_commit(user_id, date):
+    """Invalidate the cached race days of a user once the current transaction
+    commits. The cache does not expire, so readers must not be able to cache
+    race days of the old data after they were removed."""
+    transaction.on_commit(lambda: invalidate_race_days(user_id, date))
+
+
+def clear_race_days(user_ids):
+    """Remove the cached race days of users."""
+    cache.delete_many(
+        [RACE_DAYS_CACHE_KEY.format(user_id=user_id) for user_id in user_ids]
+    )
 
 
-def get_discipline_distance(training_sessions, discipline_name, field_name):
-    """Assign the distance for a discipline to a new column."""
-    training_sessions.loc[
-        training_sessions["discipline_name"] == discipline_name, field_name
-    ] = training_sessions["distance"]
+def invalidate_race_days(user_id, date):
+    """Remove the cached race days of a user if a change on this date could change
+    them. This is the case when it was a first race day or when it is a race day
+    now that comes before the cached first day."""
+    key = RACE_DAYS_CACHE_KEY.format(user_id=user_id)
+    race_days = cache.get(key)
+    if race_days is None:
+        return
+
+    if date in race_days.values():
+        cache.delete(key)
+        return
+
+    qualifying_days = get_qualifying_days(get_race_distances_per_day([user_id], date))
+    for template_index, template in enumerate(RACE_TEMPLATES):
+        if qualifying_days[:, template_index].any() and (
+            template.name not in race_days or date < race_days[template.name]
+        ):
+            cache.delete(key)
+            return
@@ -0,0 +1,139 @@
+import os
+import tempfile
+from datetime import date
+from unittest.mock import patch
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from training import adjacency, coverage, maps, polylines
+from training.models import Discipline, SessionTrack, TrainingSession
+
+
+def create_regional_map():
+    """Create a regional map of three by three square municipalities, named by
+    their row and column."""
+    rows, columns = np.divmod(np.arange(9), 3)
+    return gpd.GeoDataFrame(
+        {"GM_NAAM": [f"{row}{column}" for row, column in zip(rows, columns)]},
+        geometry=shapely.box(
+            columns * 0.1, rows * 0.1, (columns + 1) * 0.1, (rows + 1) * 0.1
+        ),
+        crs=4326,
+    )
+
+
+class MunicipalityGraphTest(SimpleTestCase):
+    def setUp(self):
+        self.graph = adjacency.MunicipalityGraph.build(create_regional_map())
+
+    def test_build(self):
+        """Test if only municipalities with a shared boundary are neighbours."""
+        middle = self.graph.indices["11"]
+        self.assertEqual(
+            [self.graph.names[index] for index in self.graph.get_neighbors([middle])],
+            ["01", "10", "12", "21"],
+        )
+        self.assertEqual(len(self.graph.neighbors), 24)
+        np.testing.assert_allclose(self.graph.centroids[middle], (0.15, 0.15))
+
+    def test_save_and_load(self):
+        """Test if a saved graph loads with the same arrays."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "graph.npz")
+            self.graph.save(path)
+            graph = adjacency.MunicipalityGraph.load(path)
+
+        self.assertEqual(graph.names, self.graph.names)
+        self.assertEqual(graph.version, self.graph.version)
+        np.testing.assert_array_equal(graph.indptr, self.graph.indptr)
+        np.testing.assert_array_equal(graph.neighbors, self.graph.neighbors)
+        np.testing.assert_array_equal(graph.centroids, self.graph.centroids)
+
+    def test_build_municipality_graph(self):
+        """Test if the graph is only built outside requests and loaded when it
+        belongs to the regional map."""
+        regional_map = create_regional_map()
+        version = maps.get_dataset_version(regional_map)
+
+        with (
+            tempfile.TemporaryDirectory() as directory,
+            patch.object(adjacency, "GRAPH_PATH", os.path.join(directory, "g.npz")),
+            patch.object(adjacency, "_municipality_graph", None),
+            patch.object(maps, "get_regional_map", return_value=regional_map),
+            patch.object(maps, "get_regional_map_version", return_value=version),
+        ):
+            self.assertIsNone(adjacency.get_municipality_graph())
+            built_graph = adjacency.build_municipality_graph()
+
+            adjacency._municipality_graph = None
+            loaded_graph = adjacency.get_municipality_graph()
+
+            adjacency._municipality_graph = None
+            with patch.object(maps, "get_regional_map_version", return_value="other"):
+                outdated_graph = adjacency.get_municipality_graph()
+
+        self.assertEqual(built_graph.version, version)
+        self.assertEqual(loaded_graph.names, built_graph.names)
+        self.assertIsNone(outdated_graph)
+
+    def test_get_unvisited_neighbors(self):
+        """Test if the unvisited neighbours are ranked by distance from a point."""
+        suggestions = self.graph.get_unvisited_neighbors(
+            ["00", "01"], np.array([0.05, 0.25])
+        )
+
+        self.assertEqual([name for name, _ in suggestions], ["02", "11", "10"])
+        self.assertAlmostEqual(suggestions[0][1], 0)
+        self.assertAlmostEqual(suggestions[1][1], 0.1 * np.sqrt(2) * 111195, delta=20)
+
+
+class SuggestionsTest(TestCase):
+    def test_get_suggestions(self):
+        """Test if users get the suggestions nearest to their usual start."""
+        user = User.objects.create(username="alice")
+        discipline = Discipline.objects.create(name="run")
+        for start in [(0.25, 0.25), (0.25, 0.25), (0.05, 0.05)]:
+            session = TrainingSession.objects.create(
+                user=user, discipline=discipline, date=date(2024, 1, 1)
+            )
+            SessionTrack.objects.create(
+                session=session, summary_polyline=polylines.encode([start, start])
+            )
+        regional_map = create_regional_map()
+        coverage.register_municipalities(regional_map["GM_NAAM"])
+        coverage.add_visits(user.id, discipline.id, ["11"])
+
+        graph = adjacency.MunicipalityGraph.build(regional_map)
+        suggestions = adjacency.get_suggestions([user], graph=graph)
+
+        np.testing.assert_allclose(adjacency.get_start_point(user.id), (0.25, 0.25))
+        # Longitude degrees are shorter than latitude degrees.
+        self.assertEqual(
+            [name for name, _ in suggestions["Alice"]], ["21", "12", "10", "01"]
+        )
+
+    def test_start_point_cache(self):
+        """Test if the start point is cached until the tracks of the user change."""
+        user = User.objects.create(username="bob")
+        discipline = Discipline.objects.create(name="run")
+        session = TrainingSession.objects.create(
+            user=user, discipline=discipline, date=date(2024, 1, 1)
+        )
+        self.assertIsNone(adjacency.get_start_point(user.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SessionTrack.objects.create(
+                session=session,
+                summary_polyline=polylines.encode([(0.25, 0.25), (0.3, 0.3)]),
+            )
+        np.testing.assert_allclose(adjacency.get_start_point(user.id), (0.25, 0.25))
+
+        with self.assertNumQueries(0):
+            np.testing.assert_allclose(adjacency.get_start_point(user.id), (0.25, 0.25))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            session.delete()
+        self.assertIsNone(adjacency.get_start_point(user.id))
@@ -0,0 +1,92 @@
+from datetime import date, datetime, timedelta
+from threading import Thread
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+from training import caching
+from training.stats import StatsPeriod, get_cached_player_stats
+from training.tests.test_data.stats_tests_data import StatsTestData
+
+
+class CachingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.test_data = StatsTestData(datetime(2023, 9, 1))
+
+    def test_data_version_bumped_on_session_change(self):
+        """Test if changing a training session changes the data version."""
+        version = caching.get_data_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            session = self.test_data.create_session()
+            self.assertEqual(caching.get_data_version(), version)
+        self.assertNotEqual(caching.get_data_version(), version)
+
+        version = caching.get_data_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            session.delete()
+        self.assertNotEqual(caching.get_data_version(), version)
+
+    def test_data_version_kept_on_rollback(self):
+        """Test if a change that is rolled back keeps the data version."""
+        version = caching.get_data_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(ValueError), transaction.atomic():
+                self.test_data.create_session()
+                raise ValueError("Rolled back")
+
+        self.assertEqual(caching.get_data_version(), version)
+
+    def test_get_or_compute_caches_result(self):
+        """Test if a cached result is not computed again."""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return "result"
+
+        self.assertEqual(caching.get_or_compute("test", compute), "result")
+        self.assertEqual(caching.get_or_compute("test", compute), "result")
+        self.assertEqual(len(calls), 1)
+
+    def test_get_or_compute_waits_for_running_computation(self):
+        """Test if a concurrent miss waits for the result instead of computing."""
+        cache.add("test:lock", True)
+        results = []
+        waiting_thread = Thread(
+            target=lambda: results.append(
+                caching.get_or_compute("test", lambda: "computed twice")
+            )
+        )
+        waiting_thread.start()
+
+        cache.set("test", "computed once")
+        cache.delete("test:lock")
+        waiting_thread.join()
+
+        self.assertEqual(results, ["computed once"])
+
+    def test_time_since_last_training_not_cached(self):
+        """Test if time since last training is recalculated for cached stats."""
+        self.test_data.create_session(
+            start_date=timezone.now() - timedelta(hours=2), total_duration=3600
+        )
+        get_cached_player_stats(StatsPeriod.ALL)
+
+        cached_stats = cache.get(
+            caching.get_versioned_key("all_stats", "all", date.today())
+        )
+        cached_stats["last_training_ends"] = [timezone.now() - timedelta(days=1)]
+        cache.set(
+            caching.get_versioned_key("all_stats", "all", date.today()),
+            cached_stats,
+        )
+
+        player_stats = get_cached_player_stats(StatsPeriod.ALL)
+
+        self.assertEqual(
+            player_stats["stats"]["Time since last training"], ["1d 0h 0m"]
+        )
@@ -0,0 +1,135 @@
+import datetime
+from unittest.mock import patch
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.db import DatabaseError, transaction
+from django.test import TestCase
+from training import coverage, maps
+from training.models import (Discipline, Municipality, MunicipalityVisits,
+                             TrainingSession, VisitedMunicipalities)
+
+
+class CoverageTestCase(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create(username=username) for username in ["alice", "bob"]
+        ]
+        self.run = Discipline.objects.create(name="run")
+        self.bike = Discipline.objects.create(name="bike")
+        coverage.register_municipalities(["Utrecht", "Zeist", "Houten", "Bunnik"])
+
+    def create_session(self, user, discipline, municipalities):
+        session = TrainingSession.objects.create(
+            user=user, discipline=discipline, date=datetime.date(2024, 1, 1)
+        )
+        maps.save_municipality_visits(
+            session,
+            [
+                maps.MunicipalityVisit(municipality, None, None, entry_order)
+                for entry_order, municipality in enumerate(municipalities)
+            ],
+        )
+        return session
+
+    def test_bitset_operations(self):
+        """Test the bitsets and set operations on them."""
+        first = coverage.to_bitset([1, 3, 64, 130])
+        second = coverage.to_bitset([3, 64])
+
+        self.assertEqual(len(first), 3)
+        self.assertEqual(coverage.count(first), 4)
+        self.assertEqual(coverage.count(coverage.union([first, second])), 4)
+        self.assertEqual(coverage.count(coverage.intersection([first, second])), 2)
+        np.testing.assert_array_equal(coverage.from_bytes(first.tobytes()), first)
+        self.assertEqual(coverage.count(coverage.union([])), 0)
+
+    def test_add_visits(self):
+        """Test that saved visits are added to the bitsets."""
+        alice, bob = self.users
+        self.create_session(alice, self.run, ["Utrecht", "Zeist"])
+        self.create_session(alice, self.bike, ["Houten", "Utrecht"])
+        # Amersfoort is not registered, like a region abroad.
+        self.create_session(bob, self.run, ["Zeist", "Amersfoort"])
+
+        self.assertEqual(VisitedMunicipalities.objects.count(), 3)
+        self.assertFalse(Municipality.objects.filter(name="Amersfoort").exists())
+
+        bitsets = coverage.get_user_bitsets([alice.id, bob.id])
+        self.assertEqual(
+            coverage.get_municipality_names(bitsets[alice.id]),
+            ["Houten", "Utrecht", "Zeist"],
+        )
+        run_bitsets = coverage.get_user_bitsets([alice.id], [self.run.id])
+        self.assertEqual(coverage.count(run_bitsets[alice.id]), 2)
+
+        self.assertEqual(
+            coverage.get_visited_by_everyone([alice.id, bob.id]), ["Zeist"]
+        )
+        self.assertEqual(coverage.get_visited_by_nobody([alice.id, bob.id]), ["Bunnik"])
+
+        self.assertEqual(
+            coverage.get_coverage_leaderboard(self.users),
+            [("Alice", 3, 4, 75.0), ("Bob", 1, 4, 25.0)],
+        )
+
+    def test_remove_visits(self):
+        """Test that the bitsets are rebuilt when visits are removed."""
+        alice = self.users[0]
+        self.create_session(alice, self.run, ["Utrecht"])
+        session = self.create_session(alice, self.run, ["Utrecht", "Zeist"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MunicipalityVisits.objects.get(
+                training_session=session, municipality="Zeist"
+            ).delete()
+        bitsets = coverage.get_user_bitsets([alice.id])
+        self.assertEqual(
+            coverage.get_municipality_names(bitsets[alice.id]), ["Utrecht"]
+        )
+
+        session.discipline = self.bike
+        session.save()
+        bitsets = coverage.get_user_bitsets([alice.id], [self.bike.id])
+        self.assertEqual(
+            coverage.get_municipality_names(bitsets[alice.id]), ["Utrecht"]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TrainingSession.objects.filter(user=alice).delete()
+        self.assertFalse(VisitedMunicipalities.objects.exists())
+
+    def test_delete_session(self):
+        """Test that deleting a session with many visits updates the visited
+        municipalities and the discipline facet once."""
+        alice = self.users[0]
+        session = self.create_session(
+            alice, self.run, ["Utrecht", "Zeist", "Houten", "Bunnik"]
+        )
+
+        with (
+            patch.object(coverage, "rebuild_visits") as rebuild_visits,
+            patch.object(maps, "update_discipline_facet") as update_discipline_facet,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            session.delete()
+
+        rebuild_visits.assert_called_once_with(alice.id, self.run.id)
+        update_discipline_facet.assert_called_once_with({self.run.id})
+
+    def test_delete_rolled_back(self):
+        """Test that the visits removed in a rolled back transaction are not
+        updated when the next transaction commits."""
+        alice = self.users[0]
+
+        with (
+            patch.object(coverage, "rebuild_visits") as rebuild_visits,
+            patch.object(maps, "update_discipline_facet"),
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            with self.assertRaises(DatabaseError), transaction.atomic():
+                maps.update_removed_visits(alice.id, self.run.id)
+                raise DatabaseError
+            maps.update_removed_visits(alice.id, self.bike.id)
+
+        rebuild_visits.assert_called_once_with(alice.id, self.bike.id)
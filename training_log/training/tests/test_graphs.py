@@ -1,12 +1,16 @@
+import gzip
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import mock
+import numpy as np
 import pandas as pd
 from dateutil.rrule import DAILY, rrule
 from django.test import TestCase
+from django.urls import reverse
 from scipy import constants
-from training.graphs import DEFAULT_START_DATE, GraphsData
+from training.graphs import (DEFAULT_START_DATE, GRAPH_DECIMALS, GraphsData,
+                             lttb_indices)
 from training.tests.test_data.stats_tests_data import StatsTestData
 
 
@@ -21,17 +25,30 @@ class TrainingStatsTest(TestCase):
             mock_datetime.today.return_value = self.datetime_to_test
             self.graph_data = GraphsData()
 
-    def get_x_values(self, graph_name):
-        data = json.loads(
-            self.graph_data.data[graph_name][self.test_data.test_user.capitalize()]
+    def get_series(self, graph_name, label=None):
+        label = label or self.test_data.test_user.capitalize()
+        return next(
+            series
+            for series in self.graph_data.data[graph_name]["series"]
+            if series["label"] == label
         )
-        return data["x_values"]
 
-    def get_values(self, graph_name):
-        data = json.loads(
-            self.graph_data.data[graph_name][self.test_data.test_user.capitalize()]
-        )
-        return data["y_values"]
+    def get_x_values(self, graph_name):
+        x = self.graph_data.data[graph_name]["x"]
+        if "values" in x:
+            return x["values"]
+
+        return [
+            (datetime.fromisoformat(x["start"]) + timedelta(days=day)).isoformat()
+            for day in range(0, x["count"], x["step"])
+        ]
+
+    def get_values(self, graph_name, label=None):
+        series = self.get_series(graph_name, label)
+        if series["delta"]:
+            return np.cumsum(series["values"]).round(GRAPH_DECIMALS).tolist()
+
+        return series["values"]
 
     def test_x_axis_total_hours_trained(self):
         """Test if total time trained is calculated correctly."""
@@ -42,34 +59,167 @@ class TrainingStatsTest(TestCase):
             for x in pd.date_range(DEFAULT_START_DATE, self.datetime_to_test).tolist()
         ]
 
-        self.assertTrue(x_values_test_user, datelist)
+        self.assertEqual(x_values_test_user, datelist)
 
     def test_values_total_hours_trained(self):
         y_values_test_user = self.get_values("total_hours_trained")
 
         self.assertEqual(y_values_test_user[5], 0)
         self.assertEqual(y_values_test_user[121], 25200 / constants.hour)
-        self.assertEqual(y_values_test_user[130], 37810 / constants.hour)
+        self.assertAlmostEqual(
+            y_values_test_user[130], 37810 / constants.hour, places=GRAPH_DECIMALS
+        )
 
     def test_x_axis_weekly_hours_trained(self):
         x_values_test_user = self.get_x_values("weekly_hours_trained")
 
-        expected_week_numbers = sorted(
-            list(
-                set(
-                    date.isocalendar()[1]
-                    for date in rrule(
-                        DAILY, dtstart=DEFAULT_START_DATE, until=self.datetime_to_test
-                    )
+        expected_weeks = list(
+            dict.fromkeys(
+                f"{date.isocalendar()[0]}-W{date.isocalendar()[1]:02d}"
+                for date in rrule(
+                    DAILY, dtstart=DEFAULT_START_DATE, until=self.datetime_to_test
                 )
             )
         )
 
-        self.assertEquals(x_values_test_user, expected_week_numbers)
+        self.assertEqual(x_values_test_user, expected_weeks)
 
     def test_values_weekly_hours_trained(self):
         values_test_user = self.get_values("weekly_hours_trained")
 
         self.assertEqual(values_test_user[0], 0)
         self.assertEqual(values_test_user[14], 5)
-        self.assertEqual(values_test_user[18], 7110 / constants.hour)
+        self.assertAlmostEqual(
+            values_test_user[18], 7110 / constants.hour, places=GRAPH_DECIMALS
+        )
+
+    def test_discipline_totals_add_up(self):
+        """Test if the totals per discipline add up to the total of the user."""
+        user = self.test_data.test_user.capitalize()
+        discipline_totals = [
+            self.get_values("total_hours_trained_disciplines", series["label"])[-1]
+            for series in self.graph_data.data["total_hours_trained_disciplines"][
+                "series"
+            ]
+            if series["label"].startswith(f"{user} - ")
+        ]
+
+        self.assertAlmostEqual(
+            sum(discipline_totals),
+            self.get_values("total_hours_trained")[-1],
+            places=GRAPH_DECIMALS - 1,
+        )
+        self.assertEqual(len(discipline_totals), len(self.graph_data.disciplines))
+
+    def test_window_continues_totals(self):
+        """Test if the totals of a zoomed window continue from the hours trained
+        before it."""
+        window = GraphsData(
+            start_date=datetime(2023, 8, 1),
+            end_date=datetime(2023, 8, 31),
+            graph_names=["total_hours_trained"],
+        )
+        series = next(
+            series
+            for series in window.data["total_hours_trained"]["series"]
+            if series["label"] == self.test_data.test_user.capitalize()
+        )
+        day = (datetime(2023, 8, 31) - DEFAULT_START_DATE).days
+
+        self.assertEqual(window.data["total_hours_trained"]["x"]["count"], 31)
+        self.assertAlmostEqual(
+            np.sum(series["values"]),
+            self.get_values("total_hours_trained")[day],
+            places=GRAPH_DECIMALS - 1,
+        )
+        self.assertEqual(list(window.data), ["total_hours_trained"])
+
+    def test_auto_resolution(self):
+        """Test if auto resolution samples the last day of every week when daily
+        points do not fit."""
+        with mock.patch("training.graphs.datetime") as mock_datetime:
+            mock_datetime.today.return_value = self.datetime_to_test
+            weekly = GraphsData(resolution="auto", max_points=50)
+
+        x_axis = weekly.data["total_hours_trained"]["x"]
+        sampled_days = [
+            DEFAULT_START_DATE + timedelta(days=offset) for offset in x_axis["offsets"]
+        ]
+
+        self.assertEqual(weekly.resolution, "week")
+        self.assertTrue(all(day.weekday() == 6 for day in sampled_days[:-1]))
+        self.assertEqual(sampled_days[-1], self.datetime_to_test)
+        self.assertAlmostEqual(
+            np.sum(self.get_series("total_hours_trained")["values"]),
+            np.sum(
+                next(
+                    series["values"]
+                    for series in weekly.data["total_hours_trained"]["series"]
+                    if series["label"] == self.test_data.test_user.capitalize()
+                )
+            ),
+            places=GRAPH_DECIMALS - 1,
+        )
+
+    def test_lttb_indices(self):
+        """Test if downsampling keeps the ends and the peak of a series."""
+        values = np.zeros(1000)
+        values[437] = 10
+
+        indices = lttb_indices(values, 20)
+
+        self.assertEqual(len(indices), 20)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], 999)
+        self.assertIn(437, indices)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        self.assertEqual(len(lttb_indices(values[:10], 20)), 10)
+
+    def test_graphs_data_view_invalid(self):
+        """Test if an invalid window is rejected."""
+        resp = self.client.get(
+            reverse("graphs-data"), {"start": "2023-09-01", "end": "2023-08-01"}
+        )
+
+        self.assertEqual(resp.status_code, 400)
+
+    def test_graphs_data_view_empty_window(self):
+        """Test if a window without days is rejected or gives empty graphs."""
+        url = reverse("graphs-data")
+
+        early_resp = self.client.get(url, {"end": "2022-01-01"})
+        week_resp = self.client.get(url, {"end": "2022-01-01", "resolution": "week"})
+        future_resp = self.client.get(
+            url, {"start": "2999-01-01", "resolution": "week"}
+        )
+
+        self.assertEqual(early_resp.status_code, 400)
+        self.assertEqual(week_resp.status_code, 400)
+        self.assertEqual(future_resp.status_code, 200)
+        self.assertEqual(future_resp.json(), {"data": {}, "settings": {}})
+
+    def test_graphs_data_view_lttb_points(self):
+        """Test if sampled graphs data needs the number of points."""
+        url = reverse("graphs-data")
+
+        resp = self.client.get(url, {"resolution": "lttb"})
+        sampled_resp = self.client.get(url, {"resolution": "lttb", "points": 100})
+
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("points", resp.json()["errors"])
+        self.assertEqual(sampled_resp.status_code, 200)
+
+    def test_graphs_data_view(self):
+        """Test if the graphs data is served compressed and with an ETag."""
+        url = reverse("graphs-data")
+
+        resp = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        cached_resp = self.client.get(url, HTTP_IF_NONE_MATCH=resp["ETag"])
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Encoding"], "gzip")
+        self.assertEqual(cached_resp.status_code, 304)
+        self.assertIn(
+            "total_hours_trained",
+            json.loads(gzip.decompress(resp.content))["data"],
+        )
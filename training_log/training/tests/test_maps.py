@@ -1,11 +1,19 @@
+import json
 import os
+import tempfile
+from unittest.mock import patch
 
 import geopandas as gpd
-import polyline as pl
+import numpy as np
+import shapely
 from django.conf import settings
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
 from shapely.geometry import Point
-from training.maps import TrainingMap
+from training import map_grid, maps, polylines
+from training.map_grid import BOUNDARY, LookupGrid
+from training.maps import (GEOMETRY_LEVELS, METERS_PER_DEGREE, TrainingMap,
+                           create_geometry_json, load_geometry_cache,
+                           save_geometry_cache)
 
 
 class MunicipalityVisitsTest(TestCase):
@@ -62,7 +70,174 @@ class MunicipalityVisitsTest(TestCase):
     def test_get_municipalities(self):
         """Test if a list of coordinates is correctly mapped to municipalities."""
         coordinates = [(52.36, 4.9), (53.20, 7.05), (48.85, 2.35)]
-        polyline = pl.encode(coordinates)
+        polyline = polylines.encode(coordinates)
 
         municipalities = sorted(self.training_map.get_municipalities(polyline))
         self.assertEqual(municipalities, ["Amsterdam", "Oldambt"])
+
+
+def create_regional_map():
+    """Create a regional map of three by three square municipalities of 0.1
+    degrees, named by their row and column. The sides are split in segments, like
+    the detailed boundaries of real municipalities."""
+    rows, columns = np.divmod(np.arange(9), 3)
+    squares = shapely.box(
+        4.8 + columns * 0.1, 52 + rows * 0.1, 4.9 + columns * 0.1, 52.1 + rows * 0.1
+    )
+    return gpd.GeoDataFrame(
+        {"GM_NAAM": [f"Gemeente {row}{column}" for row, column in zip(rows, columns)]},
+        geometry=shapely.segmentize(squares, 0.01),
+        crs=4326,
+    )
+
+
+class RegionalMapTest(SimpleTestCase):
+    """Test the lookups and caches of a regional map on a synthetic map."""
+
+    def setUp(self):
+        self.training_map = TrainingMap(gdf=create_regional_map())
+
+    def test_find_municipalities(self):
+        """Test if all coordinates are classified in a single bulk lookup."""
+        coordinates = [(52.05, 4.85), (48.85, 2.35), (52.25, 5.05), (52.05, 4.85)]
+
+        municipalities = self.training_map.find_municipalities(coordinates)
+
+        self.assertEqual(
+            municipalities.tolist(),
+            ["Gemeente 00", None, "Gemeente 22", "Gemeente 00"],
+        )
+
+    def test_geometry_cache(self):
+        """Test if the regional map is unchanged after a round trip through the
+        geometry cache."""
+        regional_map = self.training_map.regional_map
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "gemeente.npz")
+            save_geometry_cache(regional_map, path)
+            cached_map = load_geometry_cache(path)
+
+        self.assertEqual(
+            cached_map["GM_NAAM"].tolist(), regional_map["GM_NAAM"].tolist()
+        )
+        self.assertTrue(cached_map.geometry.geom_equals(regional_map.geometry).all())
+
+    def test_geometry_cache_version(self):
+        """Test if the geometry cache is saved again when the source file of the
+        regional map changes."""
+        regional_map = self.training_map.regional_map
+
+        with tempfile.TemporaryDirectory() as directory:
+            gpkg_path = os.path.join(directory, "gemeente.gpkg")
+            cache_path = os.path.join(directory, "gemeente.npz")
+            with (
+                patch.object(maps, "GDF_OUTPUT_PATH", gpkg_path),
+                patch.object(maps, "SHAPEFILE_PATH", os.path.join(directory, "x.shp")),
+                patch.object(maps, "GEOMETRY_CACHE_PATH", cache_path),
+            ):
+                regional_map.to_file(gpkg_path, driver="GPKG")
+                self.assertEqual(len(maps.load_regional_dataframe()), 9)
+                self.assertEqual(
+                    maps.get_geometry_cache_version(cache_path),
+                    maps.get_source_version(gpkg_path),
+                )
+
+                regional_map.iloc[:8].to_file(gpkg_path, driver="GPKG")
+                self.assertEqual(len(maps.load_regional_dataframe()), 8)
+                self.assertEqual(len(maps.load_geometry_cache(cache_path)), 8)
+
+    def test_lookup_grid(self):
+        """Test if the lookup grid finds the same municipalities as the exact
+        lookup, including points in boundary cells."""
+        lookup_grid = LookupGrid.build(
+            self.training_map.regional_map, cell_size=(0.03, 0.03)
+        )
+        grid_map = TrainingMap(
+            gdf=self.training_map.regional_map, lookup_grid=lookup_grid
+        )
+        coordinates = [(52.05, 4.85), (52.25, 5.05), (48.85, 2.35), (52.101, 4.899)]
+
+        self.assertIn(BOUNDARY, lookup_grid.grid)
+        self.assertEqual(
+            grid_map.find_municipalities(coordinates).tolist(),
+            self.training_map.find_municipalities(coordinates).tolist(),
+        )
+
+    def test_lookup_grid_version(self):
+        """Test if a lookup grid of another version of the regional map is rebuilt
+        with the same cell size."""
+        regional_map = self.training_map.regional_map
+
+        with tempfile.TemporaryDirectory() as directory:
+            grid_path = os.path.join(directory, "gemeente_grid.npy")
+            LookupGrid.build(regional_map.iloc[:8], (0.03, 0.03), "old").save(
+                grid_path
+            )
+            with (
+                patch.object(map_grid, "GRID_PATH", grid_path),
+                patch.object(map_grid, "_lookup_grid", None),
+            ):
+                lookup_grid = map_grid.get_lookup_grid(regional_map, "new")
+            saved_version = LookupGrid.load(grid_path).version
+
+        self.assertEqual(lookup_grid.version, "new")
+        self.assertEqual(lookup_grid.cell_size, (0.03, 0.03))
+        self.assertEqual(lookup_grid.names, regional_map["GM_NAAM"].tolist())
+        self.assertEqual(saved_version, "new")
+
+    def test_get_municipality_visits(self):
+        """Test if intersecting the line finds the municipalities between the
+        points, in the order they were entered."""
+        polyline = polylines.encode([(52.05, 5.05), (52.05, 4.85)])
+
+        visits = self.training_map.get_municipality_visits(polyline, 3600)
+
+        self.assertEqual(
+            [visit.municipality for visit in visits],
+            ["Gemeente 02", "Gemeente 01", "Gemeente 00"],
+        )
+        self.assertEqual([visit.entry_order for visit in visits], [0, 1, 2])
+        self.assertEqual([visit.moving_duration for visit in visits], [900, 1800, 900])
+        self.assertAlmostEqual(
+            visits[1].distance,
+            0.1 * np.cos(np.radians(52.05)) * METERS_PER_DEGREE,
+            delta=1,
+        )
+
+    def test_geometry_json(self):
+        """Test if the boundaries are served as GeoJSON named by municipality."""
+        geometry = json.loads(create_geometry_json(self.training_map.regional_map))
+
+        self.assertEqual(
+            [feature["properties"]["GM_NAAM"] for feature in geometry["features"]],
+            self.training_map.regional_map["GM_NAAM"].tolist(),
+        )
+
+    def test_geometry_levels(self):
+        """Test if every geometry level is cached with less detail than the one
+        above it, while the municipalities keep covering the same area."""
+        regional_map = self.training_map.regional_map
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "gemeente.npz")
+            save_geometry_cache(regional_map, path)
+            level_maps = [
+                load_geometry_cache(path, level=level)
+                for level in range(len(GEOMETRY_LEVELS) - 1)
+            ]
+
+        coordinate_counts = [
+            level_map.geometry.count_coordinates().sum() for level_map in level_maps
+        ]
+        self.assertEqual(coordinate_counts, sorted(coordinate_counts))
+        self.assertLess(
+            coordinate_counts[-1], regional_map.geometry.count_coordinates().sum()
+        )
+        for level_map in level_maps:
+            self.assertTrue(level_map.geometry.is_valid.all())
+            self.assertAlmostEqual(
+                level_map.geometry.area.sum() / regional_map.geometry.area.sum(),
+                1,
+                places=2,
+            )
@@ -0,0 +1,57 @@
+import numpy as np
+from django.test import SimpleTestCase
+from training import polylines
+
+
+class PolylinesTest(SimpleTestCase):
+    def setUp(self):
+        self.coordinates = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+        self.encoded = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+    def test_encode(self):
+        """Test if coordinates are encoded like the reference polyline."""
+        self.assertEqual(polylines.encode(self.coordinates), self.encoded)
+        self.assertEqual(polylines.encode([]), "")
+
+    def test_decode(self):
+        """Test if a polyline is decoded into an array of coordinates."""
+        coordinates = polylines.decode(self.encoded)
+
+        self.assertEqual(coordinates.shape, (3, 2))
+        self.assertEqual(coordinates.dtype, np.float64)
+        np.testing.assert_allclose(coordinates, self.coordinates)
+        self.assertEqual(polylines.decode("").shape, (0, 2))
+
+    def test_decode_start(self):
+        """Test if the first coordinate is decoded from the start of a polyline."""
+        np.testing.assert_allclose(
+            polylines.decode_start(self.encoded), self.coordinates[0]
+        )
+        np.testing.assert_allclose(
+            polylines.decode_start(polylines.encode([(-89.99999, -179.99999)] * 2)),
+            (-89.99999, -179.99999),
+        )
+        with self.assertRaises(ValueError):
+            polylines.decode_start(self.encoded[:3])
+
+    def test_round_trip(self):
+        """Test if a long track with large steps survives encoding."""
+        rng = np.random.default_rng(0)
+        coordinates = np.round(rng.uniform(-90, 90, (1000, 2)), polylines.PRECISION)
+
+        np.testing.assert_allclose(
+            polylines.decode(polylines.encode(coordinates)), coordinates
+        )
+
+    def test_decode_invalid(self):
+        """Test if a truncated polyline is rejected."""
+        with self.assertRaises(ValueError):
+            polylines.decode(self.encoded[:-1])
+
+    def test_simplify(self):
+        """Test if only points farther from the line than the tolerance are kept."""
+        coordinates = np.array([[0, 0], [1, 0.52], [2, 1], [3, 0.49], [4, 0]])
+
+        simplified = polylines.simplify(coordinates, tolerance=0.1)
+
+        np.testing.assert_array_equal(simplified, [[0, 0], [2, 1], [4, 0]])
@@ -0,0 +1,69 @@
+from datetime import date, datetime
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase
+from training.prefix_sums import (PREFIX_SUMS_CACHE_KEY, build_prefix_sums,
+                                  get_prefix_sums)
+from training.tests.test_data.stats_tests_data import StatsTestData
+
+
+class PrefixSumsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.test_data = StatsTestData(date=datetime(2023, 9, 1))
+        self.user = self.test_data.get_user(self.test_data.test_user)
+        self.start_date = date(2023, 5, 1)
+
+    def test_range_total(self):
+        """Test if a range total only includes the days within the range."""
+        for day in [date(2023, 6, 1), date(2023, 6, 10), date(2023, 6, 20)]:
+            self.test_data.create_session(
+                discipline="Running", date=day, moving_duration=1000
+            )
+
+        prefix_sums = build_prefix_sums([self.user.id], self.start_date)[self.user.id]
+
+        self.assertEqual(
+            prefix_sums.total(date(2023, 6, 1), date(2023, 6, 10), "moving_duration"),
+            2000,
+        )
+        self.assertEqual(
+            prefix_sums.total(date(2023, 6, 2), date(2023, 6, 19), "session_count"), 1
+        )
+        self.assertEqual(
+            prefix_sums.total(date(2022, 1, 1), date(2030, 1, 1), "session_count"), 3
+        )
+
+    def test_invalidated_on_commit(self):
+        """Test if the cached prefix sums are rebuilt after committed session
+        changes and kept for changes that are rolled back."""
+        self.test_data.create_session(discipline="Running", date=date(2023, 6, 1))
+        get_prefix_sums([self.user.id], self.start_date)
+
+        with self.assertRaises(ValueError), transaction.atomic():
+            self.test_data.create_session(discipline="Running", date=date(2023, 6, 2))
+            raise ValueError("Rolled back")
+        self.assertIsNotNone(
+            cache.get(PREFIX_SUMS_CACHE_KEY.format(user_id=self.user.id))
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            session = self.test_data.create_session(
+                discipline="Swimming", date=date(2023, 7, 1), distance=1500
+            )
+            self.assertIsNotNone(
+                cache.get(PREFIX_SUMS_CACHE_KEY.format(user_id=self.user.id))
+            )
+        self.assertIsNone(cache.get(PREFIX_SUMS_CACHE_KEY.format(user_id=self.user.id)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            session.date = date(2023, 7, 2)
+            session.save()
+
+        cached = get_prefix_sums([self.user.id], self.start_date)[self.user.id]
+        rebuilt = build_prefix_sums([self.user.id], self.start_date)[self.user.id]
+
+        self.assertEqual(cached.discipline_ids, rebuilt.discipline_ids)
+        np.testing.assert_array_equal(cached.sums, rebuilt.sums)
@@ -0,0 +1,133 @@
+from datetime import datetime
+
+from django.test import TestCase
+from django.urls import reverse
+from training import records
+from training.models import PersonalRecord
+from training.records import get_records_table
+from training.tests.test_data.stats_tests_data import StatsTestData
+
+
+class PersonalRecordTest(TestCase):
+    def setUp(self):
+        self.test_data = StatsTestData(date=datetime(2023, 9, 1))
+        self.user = self.test_data.get_user(self.test_data.test_user)
+
+    def get_record(self, record, discipline="Running"):
+        return PersonalRecord.objects.get(
+            user=self.user,
+            discipline=self.test_data.get_discipline(discipline),
+            record=record,
+        )
+
+    def test_record_beaten(self):
+        """Test if only a session that beats a record replaces it."""
+        first = self.test_data.create_session(
+            discipline="Running", distance=10000, moving_duration=3000
+        )
+        self.test_data.create_session(
+            discipline="Running", distance=5000, moving_duration=1800
+        )
+        faster = self.test_data.create_session(
+            discipline="Running", distance=5000, moving_duration=1200
+        )
+
+        self.assertEqual(
+            self.get_record(PersonalRecord.LONGEST_DISTANCE).session, first
+        )
+        self.assertEqual(self.get_record("fastest_5k").session, faster)
+        self.assertEqual(self.get_record("fastest_10k").session, first)
+        self.assertAlmostEqual(self.get_record("fastest_10k").value, 10000 / 3000)
+
+    def test_record_before_start_date(self):
+        """Test if sessions before the start of the stats hold no records, like
+        they do not count for the other all time stats."""
+        longest = self.test_data.create_session(
+            discipline="Cycling", distance=50000, date="2023-08-01"
+        )
+        self.test_data.create_session(
+            discipline="Cycling", distance=200000, date="2022-08-01"
+        )
+
+        self.assertEqual(
+            self.get_record(PersonalRecord.LONGEST_DISTANCE, "Cycling").session,
+            longest,
+        )
+
+        records.rebuild_records(self.user.id, longest.discipline_id)
+        self.assertEqual(
+            self.get_record(PersonalRecord.LONGEST_DISTANCE, "Cycling").session,
+            longest,
+        )
+
+    def test_record_holder_excluded(self):
+        """Test if excluding a record holder gives the record to the next best."""
+        longest = self.test_data.create_session(
+            discipline="Cycling", moving_duration=7200
+        )
+        second = self.test_data.create_session(
+            discipline="Cycling", moving_duration=3600
+        )
+
+        longest.excluded = True
+        longest.save()
+
+        self.assertEqual(
+            self.get_record(PersonalRecord.LONGEST_TIME, "Cycling").session, second
+        )
+
+    def test_record_holder_included_again(self):
+        """Test if a session excluded and included again through the view gets its
+        records back."""
+        self.client.force_login(self.user)
+        longest = self.test_data.create_session(
+            discipline="Cycling", moving_duration=7200
+        )
+        second = self.test_data.create_session(
+            discipline="Cycling", moving_duration=3600
+        )
+
+        self.client.post(
+            reverse("exclude-session"), {"session_id": longest.id, "excluded": "True"}
+        )
+        self.assertEqual(
+            self.get_record(PersonalRecord.LONGEST_TIME, "Cycling").session, second
+        )
+
+        self.client.post(
+            reverse("exclude-session"), {"session_id": longest.id, "excluded": "False"}
+        )
+        longest.refresh_from_db()
+        self.assertFalse(longest.excluded)
+        self.assertEqual(
+            self.get_record(PersonalRecord.LONGEST_TIME, "Cycling").session, longest
+        )
+
+    def test_record_holder_deleted(self):
+        """Test if deleting the only session removes its records."""
+        session = self.test_data.create_session(discipline="Swimming", distance=1500)
+
+        session.delete()
+
+        self.assertFalse(PersonalRecord.objects.exists())
+
+    def test_records_table(self):
+        """Test if the records table has a column for every user."""
+        self.test_data.create_session(
+            discipline="Running", distance=5000, moving_duration=1500
+        )
+        other_user = self.test_data.get_user("testuser_2")
+
+        with self.assertNumQueries(1):
+            table = get_records_table([self.user, other_user])
+
+        self.assertEqual(table["Running - Fastest 5 km"][0][0], "12.0 km/h")
+        self.assertIsNone(table["Running - Fastest 5 km"][1])
+
+    def test_personal_records_view(self):
+        self.test_data.create_session(discipline="Running")
+
+        resp = self.client.get(reverse("personal-records"))
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("Running - Longest time", resp.context["records"])
@@ -0,0 +1,119 @@
+import os
+import tempfile
+
+import geopandas as gpd
+import shapely
+from django.test import SimpleTestCase
+from training import polylines, regions
+from training.maps import TrainingMap
+
+
+class RegionDatasetTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "regions.gpkg")
+
+        # Two countries of two provinces each, next to each other, and a country
+        # without provinces north of them.
+        gpd.GeoDataFrame(
+            {"country": ["West", "East", "North"]},
+            geometry=[
+                shapely.box(0, 0, 2, 1),
+                shapely.box(2, 0, 4, 1),
+                shapely.box(0, 1, 4, 2),
+            ],
+            crs=4326,
+        ).to_file(self.path, layer="countries")
+        gpd.GeoDataFrame(
+            {
+                "province": ["W1", "W2", "E1", "E2"],
+                "country": ["West", "West", "East", "East"],
+            },
+            geometry=[shapely.box(x, 0, x + 1, 1) for x in range(4)],
+            crs=4326,
+        ).to_file(self.path, layer="provinces")
+
+        self.dataset = regions.RegionDataset(
+            "test",
+            [
+                regions.RegionLevel("country", self.path, "country", layer="countries"),
+                regions.RegionLevel(
+                    "province", self.path, "province", "country", layer="provinces"
+                ),
+            ],
+            window_cache_size=2,
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_window(self):
+        """Test if windows are aligned on whole tiles."""
+        self.assertEqual(regions.get_window((0.1, 0.6, 1.2, 0.7)), (0.0, 0.5, 1.5, 1.0))
+
+    def test_get_regions(self):
+        """Test if only the provinces of countries a line touches are read."""
+        line = shapely.linestrings([(0.5, 0.5), (1.5, 0.6)])
+
+        provinces = self.dataset.get_regions(line)
+
+        self.assertEqual(sorted(provinces["name"]), ["W1", "W2"])
+        province_windows = [
+            window
+            for window in self.dataset._windows.values()
+            if "W1" in set(window["name"])
+        ]
+        self.assertEqual(len(province_windows), 1)
+        self.assertNotIn("E1", set(province_windows[0]["name"]))
+
+    def test_get_regions_without_provinces(self):
+        """Test if a country without provinces is kept next to the provinces of
+        the other countries a line passes through."""
+        line = shapely.linestrings([(0.5, 0.5), (0.5, 1.5)])
+
+        self.assertEqual(
+            sorted(self.dataset.get_regions(line)["name"]), ["North", "W1"]
+        )
+        self.assertEqual(
+            self.dataset.get_regions(shapely.points(2.5, 1.5))["name"].tolist(),
+            ["North"],
+        )
+
+    def test_window_cache(self):
+        """Test if the number of windows in memory is limited."""
+        for x in [0.5, 2.5, 3.5]:
+            self.dataset.get_regions(shapely.points(x, 0.5))
+
+        self.assertEqual(len(self.dataset._windows), 2)
+
+    def test_training_map_abroad(self):
+        """Test if a track leaving the regional map continues in a dataset."""
+        regional_map = gpd.GeoDataFrame(
+            {"GM_NAAM": ["Home"]}, geometry=[shapely.box(-1, 0, 0, 1)], crs=4326
+        )
+        training_map = TrainingMap(gdf=regional_map, region_datasets=[self.dataset])
+
+        visits = training_map.get_municipality_visits(
+            polylines.encode([(0.5, -0.5), (0.5, 1.5)]), 300
+        )
+
+        self.assertEqual([visit.municipality for visit in visits], ["Home", "W1", "W2"])
+        self.assertEqual([visit.entry_order for visit in visits], [0, 1, 2])
+        self.assertEqual(sum(visit.moving_duration for visit in visits), 300)
+
+    def test_training_map_border(self):
+        """Test if a track leaving the municipalities within the bounds of the
+        regional map continues in a dataset."""
+        regional_map = gpd.GeoDataFrame(
+            {"GM_NAAM": ["Home", "Far"]},
+            geometry=[shapely.box(-1, 0, 0, 1), shapely.box(1, 2, 2, 3)],
+            crs=4326,
+        )
+        training_map = TrainingMap(gdf=regional_map, region_datasets=[self.dataset])
+
+        visits = training_map.get_municipality_visits(
+            polylines.encode([(0.5, -0.5), (0.5, 1.5)]), 300
+        )
+
+        self.assertTrue(training_map.check_within_bounds(shapely.points(1.5, 0.5)))
+        self.assertEqual([visit.municipality for visit in visits], ["Home", "W1", "W2"])
@@ -0,0 +1,90 @@
+from datetime import date, datetime
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from training import rollup
+from training.models import DailyTrainingRollup, TrainingSession
+from training.tests.test_data.stats_tests_data import StatsTestData
+
+
+class DailyTrainingRollupTest(TestCase):
+    def setUp(self):
+        self.test_data = StatsTestData(date=datetime(2023, 9, 1))
+        self.day = date(2023, 8, 23)
+
+    def get_rollup(self, discipline="Running", day=None):
+        return DailyTrainingRollup.objects.get(
+            user=self.test_data.get_user(self.test_data.test_user),
+            discipline=self.test_data.get_discipline(discipline),
+            date=day or self.day,
+        )
+
+    def test_rollup_on_create(self):
+        """Test if creating sessions adds them to the rollup of their day."""
+        self.test_data.create_session(
+            discipline="Running", date=self.day, moving_duration=1000, distance=5000
+        )
+        self.test_data.create_session(
+            discipline="Running", date=self.day, moving_duration=3000, distance=8000
+        )
+
+        daily_rollup = self.get_rollup()
+
+        self.assertEqual(daily_rollup.session_count, 2)
+        self.assertEqual(daily_rollup.moving_duration, 4000)
+        self.assertEqual(daily_rollup.distance, 13000)
+        self.assertEqual(daily_rollup.max_moving_duration, 3000)
+        self.assertEqual(daily_rollup.max_distance, 8000)
+
+    def test_rollup_on_update(self):
+        """Test if moving a session to another day updates both days."""
+        session = self.test_data.create_session(discipline="Running", date=self.day)
+        self.test_data.create_session(discipline="Running", date=self.day)
+
+        session.date = date(2023, 8, 24)
+        session.distance = 2500
+        session.save()
+
+        self.assertEqual(self.get_rollup().session_count, 1)
+        self.assertEqual(self.get_rollup(day=date(2023, 8, 24)).distance, 2500)
+
+    def test_rollup_on_exclude(self):
+        """Test if excluding a session removes it from the rollup."""
+        session = self.test_data.create_session(discipline="Swimming", date=self.day)
+
+        session.excluded = True
+        session.save()
+
+        self.assertFalse(DailyTrainingRollup.objects.exists())
+
+        session.excluded = False
+        session.save()
+
+        self.assertEqual(self.get_rollup("Swimming").session_count, 1)
+
+    def test_rollup_on_delete(self):
+        """Test if deleting a session recalculates the maximum of its day."""
+        session = self.test_data.create_session(
+            discipline="Cycling", date=self.day, distance=90000
+        )
+        self.test_data.create_session(
+            discipline="Cycling", date=self.day, distance=40000
+        )
+
+        session.delete()
+
+        self.assertEqual(self.get_rollup("Cycling").max_distance, 40000)
+
+    def test_rebuild_and_check(self):
+        """Test if drift is detected by the check and fixed by a rebuild."""
+        self.test_data.load_regular_data()
+        TrainingSession.objects.filter(discipline__name="Running").update(distance=1)
+
+        self.assertTrue(rollup.find_drift())
+        with self.assertRaises(CommandError):
+            call_command("training_rollup", "--check", stdout=StringIO())
+
+        call_command("training_rollup", stdout=StringIO())
+
+        self.assertEqual(rollup.find_drift(), [])
@@ -1,9 +1,14 @@
 from datetime import datetime, timedelta
 
 import mock
+from dateutil.relativedelta import relativedelta
+from django.core.cache import cache
 from django.test import TestCase
-from training.stats import (DEFAULT_START_DATE, AllPlayerStats, StatsPeriod,
-                            is_ironman)
+from training import rollup
+from training.models import TrainingSession
+from training.stats import (DEFAULT_START_DATE, RACE_DAYS_CACHE_KEY,
+                            AllPlayerStats, StatsPeriod,
+                            calculate_first_race_days, is_ironman)
 from training.tests.test_data.stats_tests_data import StatsTestData
 
 
@@ -249,6 +254,22 @@ class TrainingStatsTest(TestCase):
 
         self.assertEqual(len(self.all_player_stats.training_sessions), 7)
 
+    def test_custom_date_range(self):
+        """Test if a custom range gives the same stats as the matching preset."""
+        self.update_all_player_stats(period=StatsPeriod.MONTH)
+        month_stats = self.all_player_stats.stats
+
+        self.all_player_stats = AllPlayerStats(
+            start_date=(self.datetime_to_test - relativedelta(months=1)).date(),
+            end_date=self.datetime_to_test.date(),
+        )
+
+        for stat_name in ["Total time trained", "Average weekly hours"]:
+            self.assertEqual(
+                self.all_player_stats.stats[stat_name], month_stats[stat_name]
+            )
+        self.assertEqual(len(self.all_player_stats.training_sessions), 6)
+
     def test_brick_count(self):
         """Test if brick session count is calculated correctly."""
         self.test_data.add_brick_test_data()
@@ -270,3 +291,92 @@ class TrainingStatsTest(TestCase):
         self.test_data.load_is_not_ironman_data()
 
         self.assertFalse(is_ironman(self.test_data.get_user(self.test_data.test_user)))
+
+    def test_user_aggregates_single_query(self):
+        """Test if the aggregates for all users are calculated in one query."""
+        self.test_data.add_brick_test_data()
+
+        with self.assertNumQueries(1):
+            user_aggregates = self.all_player_stats.get_user_aggregates()
+
+        self.assertEqual(len(user_aggregates), 2)
+
+    def test_first_race_days(self):
+        """Test if the first day of every race template is found for all users."""
+        self.test_data.load_is_ironman_data()
+        user = self.test_data.get_user(self.test_data.test_user)
+        other_user = self.test_data.get_user("testuser_2")
+        race_day = (self.datetime_to_test - timedelta(days=2)).date()
+
+        with self.assertNumQueries(1):
+            race_days = calculate_first_race_days([user.id, other_user.id])
+
+        self.assertEqual(
+            race_days[user.id],
+            {"Ironman": race_day, "Half Ironman": race_day, "Olympic": race_day},
+        )
+        self.assertNotIn(other_user.id, race_days)
+
+    def test_race_days_invalidated(self):
+        """Test if cached race days are updated when a race day changes."""
+        self.test_data.load_is_ironman_data()
+        user = self.test_data.get_user(self.test_data.test_user)
+        self.assertTrue(is_ironman(user))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TrainingSession.objects.filter(discipline__name="Cycling").delete()
+
+        self.assertFalse(is_ironman(user))
+
+    def test_race_days_kept_until_commit(self):
+        """Test if cached race days are only invalidated once a change commits,
+        and cleared by a rebuild of the rollup."""
+        self.test_data.load_is_ironman_data()
+        user = self.test_data.get_user(self.test_data.test_user)
+        key = RACE_DAYS_CACHE_KEY.format(user_id=user.id)
+        self.assertTrue(is_ironman(user))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            TrainingSession.objects.filter(discipline__name="Cycling").delete()
+            self.assertIsNotNone(cache.get(key))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(key))
+
+        self.assertFalse(is_ironman(user))
+        rollup.rebuild()
+        self.assertIsNone(cache.get(key))
+
+    def test_swim_bike_run_transitions(self):
+        """Test if a chain of three disciplines is found with its session ids."""
+        TrainingSession.objects.all().delete()
+        swim = self.test_data.create_session(
+            discipline="Swimming",
+            start_date=self.test_data.start_date,
+            total_duration=3600,
+        )
+        ride = self.test_data.create_session(
+            discipline="Cycling",
+            start_date=self.test_data.start_date + timedelta(minutes=70),
+            total_duration=3600,
+        )
+        run = self.test_data.create_session(
+            discipline="Running",
+            start_date=self.test_data.start_date + timedelta(minutes=140),
+            total_duration=3600,
+        )
+        self.update_all_player_stats()
+
+        transitions = self.all_player_stats.transitions[
+            "Number of swim-bike-run workouts"
+        ]
+
+        self.assertEqual(
+            transitions.iloc[0].tolist(), [swim.user_id, swim.id, ride.id, run.id]
+        )
+        self.assertEqual(
+            self.all_player_stats.stats["Number of swim-bike transitions"][0], 1
+        )
+        self.assertEqual(
+            self.all_player_stats.stats["Number of brick workouts"][0], 1
+        )
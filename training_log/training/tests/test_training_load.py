@@ -0,0 +1,68 @@
+from datetime import date, datetime
+
+import numpy as np
+from django.test import TestCase
+from training import training_load
+from training.models import TrainingLoad
+from training.tests.test_data.stats_tests_data import StatsTestData
+
+
+class TrainingLoadTest(TestCase):
+    def setUp(self):
+        self.test_data = StatsTestData(datetime(2023, 9, 1))
+        self.user = self.test_data.get_user(self.test_data.test_user)
+        self.end_date = date(2023, 9, 1)
+
+    def test_exponential_average(self):
+        """Test if the vectorized average matches a day by day calculation."""
+        loads = [60, 0, 0, 120, 30]
+        expected = []
+        average = 10.0
+        for load in loads:
+            average += (load - average) / 7
+            expected.append(average)
+
+        result = training_load.exponential_average(loads, 7, initial=10.0)
+
+        np.testing.assert_allclose(result, expected)
+
+    def test_heart_rate_weighted_load(self):
+        """Test if the load of a session is weighted by its heart rate."""
+        session = self.test_data.create_session(date="2023-08-30", moving_duration=3600)
+        session.average_hr = 75
+        session.save()
+
+        training_loads = training_load.get_training_loads(
+            [self.user.id], end_date=self.end_date
+        ).set_index("date")
+
+        self.assertEqual(training_loads.loc[date(2023, 8, 30), "load"], 30)
+        self.assertEqual(training_loads.index[-1], self.end_date)
+
+    def test_incremental_update(self):
+        """Test if a new session recalculates from its date and gives the same
+        result as a calculation over the full history."""
+        self.test_data.load_regular_data()
+        training_load.get_training_loads([self.user.id], end_date=self.end_date)
+
+        self.test_data.create_session(date="2023-08-25", moving_duration=5400)
+
+        self.assertFalse(
+            TrainingLoad.objects.filter(
+                user=self.user, date__gte=date(2023, 8, 25)
+            ).exists()
+        )
+        self.assertTrue(
+            TrainingLoad.objects.filter(
+                user=self.user, date__lt=date(2023, 8, 25)
+            ).exists()
+        )
+
+        incremental = training_load.get_training_loads(
+            [self.user.id], end_date=self.end_date
+        )
+        TrainingLoad.objects.all().delete()
+        full = training_load.get_training_loads([self.user.id], end_date=self.end_date)
+
+        np.testing.assert_allclose(incremental["fitness"], full["fitness"])
+        np.testing.assert_allclose(incremental["fatigue"], full["fatigue"])
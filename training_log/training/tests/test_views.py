@@ -1,6 +1,12 @@
+from datetime import date, timedelta
+from unittest.mock import patch
+
 from django.contrib.auth.models import User
 from django.test import TestCase
 from django.urls import reverse
+from training import adjacency, maps
+from training.models import Discipline, MunicipalityVisits, TrainingSession
+from training.views import SESSION_PAGE_SIZE
 
 
 class TestViews(TestCase):
@@ -20,6 +26,51 @@ class TestViews(TestCase):
         # TODO: Can we do some tests on content?
         self.assertEqual(resp.status_code, 200)
 
+    def test_session_list_pages(self):
+        discipline = Discipline.objects.create(name="Running")
+        TrainingSession.objects.bulk_create(
+            [
+                TrainingSession(
+                    user=self.user,
+                    discipline=discipline,
+                    date=date(2023, 5, 1) + timedelta(days=day // 2),
+                )
+                for day in range(SESSION_PAGE_SIZE + 10)
+            ]
+        )
+        url = reverse("session-list", kwargs={"username": self.username})
+
+        resp = self.client.get(url)
+        first_page = resp.context["all_sessions"]
+        page_resp = self.client.get(
+            reverse("session-list-page", kwargs={"username": self.username}),
+            {"cursor": resp.context["next_cursor"]},
+        )
+        next_page = page_resp.context["all_sessions"]
+
+        self.assertEqual(len(first_page), SESSION_PAGE_SIZE)
+        self.assertEqual(len(next_page), 10)
+        self.assertIsNone(page_resp.context["next_cursor"])
+        self.assertEqual(
+            {session.id for session in first_page + next_page},
+            set(TrainingSession.objects.values_list("id", flat=True)),
+        )
+        self.assertGreaterEqual(first_page[-1].date, next_page[0].date)
+
+    def test_session_list_queries(self):
+        discipline = Discipline.objects.create(name="Running")
+        for day in range(5):
+            TrainingSession.objects.create(
+                user=self.user, discipline=discipline, date=date(2023, 5, 1 + day)
+            )
+        url = reverse("session-list-page", kwargs={"username": self.username})
+
+        with self.assertNumQueries(2):
+            resp = self.client.get(url)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.context["all_sessions"]), 5)
+
     def test_incorrect_user_list_view(self):
         url = reverse("session-list", kwargs={"username": "incorrect_user"})
         resp = self.client.get(url)
@@ -32,6 +83,107 @@ class TestViews(TestCase):
 
         self.assertEqual(resp.status_code, 404)
 
+    def test_all_stats_view(self):
+        url = reverse("all-stats", kwargs={"period": "all"})
+        resp = self.client.get(url)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context["players"], [self.username.capitalize()])
+
+    def test_all_stats_range_view(self):
+        url = reverse("all-stats", kwargs={"period": "all"})
+        resp = self.client.get(url, {"start": "2023-06-01", "end": "2023-06-30"})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context["period"], "2023-06-01 to 2023-06-30")
+
+    def test_map_visits_view(self):
+        discipline = Discipline.objects.create(name="Running")
+        session = TrainingSession.objects.create(
+            user=self.user, discipline=discipline, date=date(2023, 6, 1)
+        )
+        for municipality in ["Amsterdam", "Amsterdam", "Utrecht"]:
+            MunicipalityVisits.objects.create(
+                training_session=session, municipality=municipality
+            )
+        parameters = {
+            "user_id": self.user.id,
+            "discipline": "Running",
+            "start_date": "2023-05-01",
+            "end_date": "2023-06-30",
+        }
+
+        resp = self.client.get(reverse("map-visits"), parameters)
+        invalid_resp = self.client.get(reverse("map-visits"), {"user_id": 0})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(
+            resp.json(),
+            {
+                "colors": {self.username.capitalize(): "red"},
+                "visits": {
+                    "Amsterdam": [self.username.capitalize()],
+                    "Utrecht": [self.username.capitalize()],
+                },
+            },
+        )
+        self.assertEqual(invalid_resp.status_code, 400)
+
+    def test_map_geometry_view(self):
+        """Test if only the current version of the boundaries is served."""
+        with (
+            patch.object(maps, "get_geometry_version", return_value="current"),
+            patch.object(maps, "get_geometry_json", return_value=b"{}"),
+        ):
+            resp = self.client.get(reverse("map-geometry", args=[0, "current"]))
+            cached_resp = self.client.get(
+                reverse("map-geometry", args=[0, "current"]),
+                HTTP_IF_NONE_MATCH=resp["ETag"],
+            )
+            outdated_resp = self.client.get(
+                reverse("map-geometry", args=[0, "outdated"]),
+                HTTP_IF_NONE_MATCH=resp["ETag"],
+            )
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(cached_resp.status_code, 304)
+        self.assertEqual(outdated_resp.status_code, 404)
+
+    def test_map_suggestions_view(self):
+        """Test if suggestions are empty without a regional map."""
+        parameters = {
+            "user_id": self.user.id,
+            "start_date": "2023-05-01",
+            "end_date": "2023-06-30",
+        }
+
+        with patch.object(adjacency, "get_municipality_graph", return_value=None):
+            resp = self.client.get(reverse("map-suggestions"), parameters)
+        invalid_resp = self.client.get(reverse("map-suggestions"), {"user_id": 0})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json(), {"suggestions": {}})
+        self.assertEqual(invalid_resp.status_code, 400)
+
+    def test_training_map_disciplines(self):
+        """Test if only disciplines with visits are shown as map filter."""
+        running = Discipline.objects.create(name="Running")
+        Discipline.objects.create(name="Cycling")
+        session = TrainingSession.objects.create(
+            user=self.user, discipline=running, date=date(2023, 6, 1)
+        )
+        visit = MunicipalityVisits.objects.create(
+            training_session=session, municipality="Amsterdam"
+        )
+
+        resp = self.client.get(reverse("training-map"))
+        with self.captureOnCommitCallbacks(execute=True):
+            visit.delete()
+        resp_without_visits = self.client.get(reverse("training-map"))
+
+        self.assertEqual(list(resp.context["disciplines"]), ["Running"])
+        self.assertEqual(list(resp_without_visits.context["disciplines"]), [])
+
 
 # TODO: Implement this properly for GitHub Actions
 # class TestSignUp(LiveServerTestCase):
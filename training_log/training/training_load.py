@@ -0,0 +1,145 @@
+import logging
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+from django.db.models import Max
+from scipy import constants
+from scipy.signal import lfilter
+
+from .models import TrainingLoad, TrainingSession
+from .stats import DEFAULT_START_DATE
+
+logger = logging.getLogger(__name__)
+
+FITNESS_DAYS = 42
+FATIGUE_DAYS = 7
+# Heart rate at which a minute of training counts as one point of load.
+REFERENCE_HEART_RATE = 150
+
+
+def exponential_average(loads, days, initial=0.0):
+    """Calculate the exponentially weighted moving average of daily loads,
+    continuing from the average of the day before the first load.
+
+    :param loads: Array with a load per day
+    :param days: The time constant of the average in days
+    :param initial: The average on the day before the first load
+
+    """
+    alpha = 1 / days
+    averages, _ = lfilter(
+        [alpha],
+        [1, alpha - 1],
+        np.asarray(loads, dtype=float),
+        zi=[(1 - alpha) * initial],
+    )
+    return averages
+
+
+def get_daily_loads(user_id, start_date, end_date):
+    """Get the training load per day for a user. The load of a session is its
+    moving duration in minutes weighted by its heart rate relative to the
+    reference heart rate. Sessions without heart rate count as reference.
+
+    :returns: A series with the load for every day from start to end date
+
+    """
+    sessions = pd.DataFrame.from_records(
+        TrainingSession.objects.filter(
+            user_id=user_id,
+            excluded=False,
+            date__range=(start_date, end_date),
+            moving_duration__isnull=False,
+        )
+        .order_by()
+        .values("date", "moving_duration", "average_hr"),
+        columns=["date", "moving_duration", "average_hr"],
+    )
+
+    intensity = (sessions["average_hr"].astype(float) / REFERENCE_HEART_RATE).fillna(1)
+    sessions["load"] = sessions["moving_duration"] / constants.minute * intensity
+
+    daily_loads = sessions.groupby("date")["load"].sum()
+    daily_loads.index = pd.DatetimeIndex(daily_loads.index)
+    return daily_loads.reindex(pd.date_range(start_date, end_date), fill_value=0.0)
+
+
+def extend_training_load(user_id, end_date):
+    """Calculate and store the training load of a user from the last stored day up
+    to the end date."""
+    last_load = TrainingLoad.objects.filter(user_id=user_id).order_by("date").last()
+
+    if last_load is None:
+        start_date = DEFAULT_START_DATE.date()
+        fitness = fatigue = 0.0
+    else:
+        start_date = last_load.date + timedelta(days=1)
+        fitness, fatigue = last_load.fitness, last_load.fatigue
+
+    if start_date > end_date:
+        return
+
+    daily_loads = get_daily_loads(user_id, start_date, end_date)
+    fitness_values = exponential_average(daily_loads.values, FITNESS_DAYS, fitness)
+    fatigue_values = exponential_average(daily_loads.values, FATIGUE_DAYS, fatigue)
+
+    TrainingLoad.objects.bulk_create(
+        [
+            TrainingLoad(
+                user_id=user_id,
+                date=day.date(),
+                load=day_load,
+                fitness=day_fitness,
+                fatigue=day_fatigue,
+            )
+            for day, day_load, day_fitness, day_fatigue in zip(
+                daily_loads.index, daily_loads.values, fitness_values, fatigue_values
+            )
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    logger.info(f"Calculated {len(daily_loads)} days of training load for {user_id}")
+
+
+def invalidate_training_load(user_id, from_date):
+    """Remove the stored training load from a date forward, so it is recalculated
+    from there the next time it is needed."""
+    TrainingLoad.objects.filter(user_id=user_id, date__gte=from_date).delete()
+
+
+def get_training_loads(user_ids, start_date=None, end_date=None):
+    """Get the training load of users up to the end date. Days that are not
+    stored yet are calculated first.
+
+    :param start_date: The first day to get, all stored days if None (Default value
+    = None)
+
+    :returns: A dataframe with the user id, date, load, fitness and fatigue
+
+    """
+    end_date = end_date or date.today()
+
+    last_dates = dict(
+        TrainingLoad.objects.filter(user_id__in=user_ids)
+        .order_by()
+        .values_list("user_id")
+        .annotate(Max("date"))
+    )
+    for user_id in user_ids:
+        if last_dates.get(user_id) is None or last_dates[user_id] < end_date:
+            with transaction.atomic():
+                extend_training_load(user_id, end_date)
+
+    loads = TrainingLoad.objects.filter(user_id__in=user_ids, date__lte=end_date)
+    if start_date is not None:
+        loads = loads.filter(date__gte=start_date)
+
+    training_loads = pd.DataFrame.from_records(
+        loads.values("user_id", "date", "load", "fitness", "fatigue"),
+        columns=["user_id", "date", "load", "fitness", "fatigue"],
+    )
+    training_loads["form"] = training_loads["fitness"] - training_loads["fatigue"]
+    return training_loads
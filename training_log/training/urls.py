@@ -7,15 +7,25 @@ urlpatterns = [
     path("", views.index, name="index"),
     path("new_session/", views.new_session, name="new-session"),
     path("sessions/<str:username>", SessionList.as_view(), name="session-list"),
+    path(
+        "sessions/<str:username>/page",
+        views.session_list_page,
+        name="session-list-page",
+    ),
     path("session/<int:pk>", SessionView.as_view(), name="session-detail"),
     path("session/delete/", views.delete_session, name="delete-session"),
     path("session/exclude/", views.exclude_session, name="exclude-session"),
     path("all_stats/", views.all_stats_total, name="all-stats"),
     path("all_stats/<str:period>", views.all_stats, name="all-stats"),
+    path("records", views.personal_records, name="personal-records"),
     path("graphs", views.graphs, name="graphs"),
+    path("graphs/data", views.graphs_data, name="graphs-data"),
     path("training_map", views.training_map, name="training-map"),
-    path("load_map", views.load_map, name="load-map"),
     path(
-        "check_map_ready/<str:task_id>", views.check_map_ready, name="check-map-ready"
+        "map/geometry/<int:level>/<str:version>",
+        views.map_geometry,
+        name="map-geometry",
     ),
+    path("map/visits", views.map_visits, name="map-visits"),
+    path("map/suggestions", views.map_suggestions, name="map-suggestions"),
 ]
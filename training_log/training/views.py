@@ -5,23 +5,28 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
-from django.http import Http404, HttpResponse, HttpResponseRedirect
+from django.db.models import Q
+from django.http import (Http404, HttpResponse, HttpResponseRedirect,
+                         JsonResponse)
 from django.shortcuts import redirect, render
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.views.decorators.cache import cache_control
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import etag
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import CreateView
 from django.views.generic.list import ListView
-from huey.contrib.djhuey import HUEY
 from strava_import.models import StravaUser
-from training import tasks
 
-from . import stats
-from .forms import SessionForm
-from .graphs import GraphsData
-from .models import MunicipalityVisits, SessionZones, TrainingSession
+from . import adjacency, coverage, maps, records, stats
+from .forms import GraphsDataForm, SessionForm, StatsRangeForm, TrainingMapForm
+from .graphs import get_cached_graphs_json, get_graphs_version
+from .models import Discipline, SessionZones, TrainingSession
 
 logger = logging.getLogger(__name__)
 
+GEOMETRY_MAX_AGE = 365 * 24 * 60 * 60
+
 
 def index(request):
     """The home page for Training Log."""
@@ -40,41 +45,108 @@ class Register(CreateView):
         return HttpResponseRedirect(self.success_url)
 
 
+SESSION_PAGE_SIZE = 50
+SESSION_LIST_FIELDS = [
+    "id",
+    "date",
+    "moving_duration",
+    "distance",
+    "average_speed",
+    "max_speed",
+    "excluded",
+    "discipline__name",
+    "discipline__speed_type",
+    "training_type__name",
+]
+
+
+def get_session_list_user(username):
+    """Get the user of a session list by username."""
+    try:
+        return User.objects.get(username__iexact=username)
+    except User.DoesNotExist:
+        raise Http404("User does not exist")
+
+
+def get_session_page(user, cursor=None):
+    """Get a page of sessions of a user, newest first. Pages are found with the
+    (date, id) of the last session of the previous page, so a page is a single
+    index range scan however far back it is.
+
+    :param user: The user to get the sessions of
+    :param cursor: The cursor returned with the previous page, or None for the
+    first page (Default value = None)
+    :returns: The sessions of the page and the cursor of the next page, which is
+    None on the last page
+
+    """
+    sessions = (
+        TrainingSession.objects.filter(user=user)
+        .select_related("discipline", "training_type")
+        .only(*SESSION_LIST_FIELDS)
+        .order_by("-date", "-id")
+    )
+
+    if cursor:
+        try:
+            cursor_date, cursor_id = cursor.split("_")
+            cursor_date = datetime.date.fromisoformat(cursor_date)
+            cursor_id = int(cursor_id)
+        except ValueError:
+            raise Http404("Page does not exist")
+
+        sessions = sessions.filter(
+            Q(date__lt=cursor_date) | Q(date=cursor_date, id__lt=cursor_id)
+        )
+
+    page = list(sessions[: SESSION_PAGE_SIZE + 1])
+    if len(page) <= SESSION_PAGE_SIZE:
+        return page, None
+
+    page = page[:SESSION_PAGE_SIZE]
+    return page, f"{page[-1].date.isoformat()}_{page[-1].id}"
+
+
 class SessionList(ListView):
-    """A view to show all sessions by a particular user."""
+    """A view to show the first page of sessions by a particular user."""
 
     context_object_name = "all_sessions"
+    template_name = "training/trainingsession_list.html"
 
     def get_queryset(self):
-        username = self.kwargs.get("username")
-
-        try:
-            user = User.objects.get(username__iexact=username)
-        except User.DoesNotExist:
-            raise Http404("User does not exist")
+        self.user = get_session_list_user(self.kwargs.get("username"))
+        sessions, self.next_cursor = get_session_page(self.user)
 
-        return TrainingSession.objects.filter(user=user)
+        return sessions
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        username = self.kwargs.get("username")
 
-        try:
-            user = User.objects.get(username__iexact=username)
-        except User.DoesNotExist:
-            raise Http404("User does not exist")
-
-        try:
-            strava_user = StravaUser.objects.get(user=user)
+        strava_user = StravaUser.objects.filter(user=self.user).first()
+        if strava_user:
             context["strava_user"] = strava_user
-        except StravaUser.DoesNotExist:
-            logger.warning(f"Strava User does not exist for {user}")
+        else:
+            logger.warning(f"Strava User does not exist for {self.user}")
 
-        context["is_ironman"] = stats.is_ironman(user)
+        context["is_ironman"] = stats.is_ironman(self.user)
+        context["next_cursor"] = self.next_cursor
 
         return context
 
 
+def session_list_page(request, username):
+    """Show the rows of the next page of sessions for the infinite scroll of the
+    session list."""
+    user = get_session_list_user(username)
+    sessions, next_cursor = get_session_page(user, request.GET.get("cursor"))
+
+    return render(
+        request,
+        "training/session_rows.html",
+        {"all_sessions": sessions, "next_cursor": next_cursor},
+    )
+
+
 class SessionView(DetailView):
     """View to show a single training session."""
 
@@ -130,47 +202,73 @@ def all_stats(request, period):
     except ValueError:
         return redirect("all-stats", period="all")
 
-    player_stats = stats.AllPlayerStats(period_enum)
-    is_ironman_status = [stats.is_ironman(user) for user in player_stats.users]
+    range_form = StatsRangeForm(request.GET or None)
+    if range_form.is_valid():
+        start_date = range_form.cleaned_data["start"]
+        end_date = range_form.cleaned_data["end"]
+        period_name = f"{start_date} to {end_date or 'now'}"
+    else:
+        start_date = end_date = None
+        period_name = str(period_enum)
+
+    player_stats = stats.get_cached_player_stats(period_enum, start_date, end_date)
+    is_ironman_status = stats.get_ironman_statuses(player_stats["user_ids"])
     context = {
-        "players": player_stats.players,
-        "stats": player_stats.stats,
-        "period": str(period_enum),
+        "players": player_stats["players"],
+        "stats": player_stats["stats"],
+        "period": period_name,
         "period_options": stats.StatsPeriod.options(),
+        "range_form": range_form,
         "is_ironman_status": is_ironman_status,
+        "coverage": coverage.get_coverage_leaderboard(
+            User.objects.filter(id__in=player_stats["user_ids"]).order_by("id")
+        ),
     }
 
     return render(request, "training/all_stats.html", context=context)
 
 
-def graphs(request):
-    """Create graphs with training data."""
-    training_data = TrainingSession.objects.filter(moving_duration__gt=0).all()
-    training_dates = [
-        date.isoformat() for date in list(training_data.values_list("date", flat=True))
-    ]
+def personal_records(request):
+    """Show the personal records of all users."""
+    users = User.objects.all()
+    context = {
+        "players": [user.username.capitalize() for user in users],
+        "records": records.get_records_table(users),
+    }
 
-    graphs_data = GraphsData()
-    training_hours = list(training_data.values_list("moving_duration", flat=True))
+    return render(request, "training/personal_records.html", context=context)
 
-    return render(
-        request,
-        "training/graphs.html",
-        {
-            "labels": training_dates,
-            "data": training_hours,
-            "graph_data": graphs_data.data,
-            "settings": graphs_data.settings,
-        },
+
+def graphs(request):
+    """Show graphs with training data, which are loaded from the graphs data."""
+    return render(request, "training/graphs.html")
+
+
+@gzip_page
+@etag(lambda request: get_graphs_version(request.get_full_path()))
+def graphs_data(request):
+    """Get the data and settings of the graphs as compact JSON, optionally for a
+    window of dates at a resolution that fits the viewport."""
+    form = GraphsDataForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+
+    return HttpResponse(
+        get_cached_graphs_json(**form.get_graphs_parameters()),
+        content_type="application/json",
     )
 
 
 def training_map(request):
     """Create a form for loading a training map."""
     users = User.objects.all()
-    disciplines = MunicipalityVisits.objects.values_list(
-        "training_session__discipline__name", flat=True
-    ).distinct()
+    disciplines = (
+        Discipline.objects.filter(has_municipality_visits=True)
+        .order_by("name")
+        .values_list("name", flat=True)
+    )
+
+    geometry_version = maps.get_geometry_version()
 
     context = {
         "users": users,
@@ -178,24 +276,77 @@ def training_map(request):
         "start_date": stats.DEFAULT_START_DATE,
         "current_date": datetime.date.today(),
     }
+    if geometry_version is not None:
+        context["geometry_levels"] = [
+            {
+                "max_zoom": geometry_level.max_zoom,
+                "url": reverse("map-geometry", args=[level, geometry_version]),
+            }
+            for level, geometry_level in enumerate(maps.GEOMETRY_LEVELS)
+        ]
 
     return render(request, "training/training_map.html", context=context)
 
 
-def load_map(request):
-    """Start the training map loading task."""
-    selected_users = request.POST.getlist("user_id")
-    disciplines = request.POST.getlist("discipline")
-    start_date = request.POST.get("start_date")
-    end_date = request.POST.get("end_date")
+def get_geometry_etag(request, level, version):
+    """Get the ETag of the municipality boundaries, only for the URL of their
+    current version."""
+    geometry_version = maps.get_geometry_version()
+    return geometry_version if version == geometry_version else None
 
-    task = tasks.load_map(selected_users, disciplines, start_date, end_date)
 
-    context = {
-        "task_id": task.id,
-    }
+@gzip_page
+@cache_control(public=True, max_age=GEOMETRY_MAX_AGE)
+@etag(get_geometry_etag)
+def map_geometry(request, level, version):
+    """Get the municipality boundaries of a geometry level as GeoJSON. The URL
+    holds the version of the boundaries, so browsers can cache them long-term.
+    Other versions are not served, so they cannot be cached with the current
+    boundaries."""
+    if version != maps.get_geometry_version():
+        raise Http404("Geometry version does not exist")
+    if level >= len(maps.GEOMETRY_LEVELS):
+        raise Http404("Geometry level does not exist")
+
+    geometry_json = maps.get_geometry_json(level)
+    if geometry_json is None:
+        raise Http404("Regional map is not available")
+
+    return HttpResponse(geometry_json, content_type="application/geo+json")
 
-    return render(request, "training/loading_map.html", context)
+
+def map_visits(request):
+    """Get the municipalities visited by the selected users as JSON."""
+    form = TrainingMapForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+
+    return HttpResponse(
+        maps.get_cached_visits_json(**form.get_visits_parameters()),
+        content_type="application/json",
+    )
+
+
+def map_suggestions(request):
+    """Get per selected user the nearest unvisited municipalities that border the
+    ones they visited, as JSON. These cover all dates of the selected
+    disciplines."""
+    form = TrainingMapForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+
+    suggestions = adjacency.get_suggestions(**form.get_suggestions_parameters())
+    return JsonResponse(
+        {
+            "suggestions": {
+                username: [
+                    {"municipality": municipality, "distance": round(distance)}
+                    for municipality, distance in municipalities
+                ]
+                for username, municipalities in suggestions.items()
+            }
+        }
+    )
 
 
 def delete_session(request):
@@ -224,7 +375,7 @@ def exclude_session(request):
         raise Http404("Method not allowed")
 
     session_id = int(request.POST.get("session_id"))
-    excluded = request.POST.get("excluded")
+    excluded = request.POST.get("excluded") == "True"
 
     logger.info(f"Setting session {session_id} to {excluded}")
 
@@ -236,17 +387,3 @@ def exclude_session(request):
         raise Http404("The session that was being excluded does not exist")
 
     return redirect("session-detail", pk=session_id)
-
-
-def check_map_ready(request, task_id):
-    """Check if the training map is ready."""
-    try:
-        result = HUEY.result(task_id)
-    except Exception as _:
-        return HttpResponse("Something went wrong while loading map.", status=286)
-
-    context = {"task_id": task_id, "reload_delay": 2}
-    if result is not None:
-        context["map"] = result
-
-    return render(request, "training/folium_map.html", context)
@@ -227,6 +227,33 @@ HUEY = {
     },
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": f'redis://{os.getenv("REDIS_HOST", "redis")}:6379/1',
+    }
+}
+
+if test_mode:
+    # Tests should not depend on a running redis server
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Region datasets for tracks outside the municipalities of the regional map. Every
+# dataset has GeoPackage levels from coarse to fine, for example:
+# {
+#     "world": [
+#         {"name": "country", "path": "gadm.gpkg", "name_field": "COUNTRY",
+#          "layer": "ADM_0"},
+#         {"name": "province", "path": "gadm.gpkg", "name_field": "NAME_1",
+#          "parent_field": "COUNTRY", "layer": "ADM_1"},
+#     ]
+# }
+REGION_DATASETS = {}
+
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
 TEST_RUNNER = "django.test.runner.DiscoverRunner"
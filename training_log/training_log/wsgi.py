@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "training_log.settings")
 
 application = get_wsgi_application()
+
+# Load the regional map, lookup grid and municipality graph before gunicorn forks
+# its workers, which then share them copy-on-write when it runs with --preload.
+from training import adjacency, map_grid, maps  # noqa: E402
+
+map_grid.get_lookup_grid(maps.get_regional_map(), maps.get_regional_map_version())
+adjacency.build_municipality_graph()